@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Benchmark: LabReportImageProcessor.preprocess_image, before and after the
+OpenCV-only rewrite.
+
+Runs the previous pipeline (OpenCV -> PIL enhance -> NumPy -> OpenCV, full
+resolution, a new buffer per step) and the current one on a synthetic phone
+photo of a lab report, and prints per-stage wall time and peak traced memory
+(NumPy / OpenCV arrays are tracked by tracemalloc), plus how closely the two
+binarized outputs agree.
+
+Usage:
+    python benchmark_preprocessing.py [image_path] [--repeat N]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image, ImageEnhance
+
+# Add project paths
+current_dir = Path(__file__).parent
+sys.path.append(str(current_dir / "src" / "healthguard" / "tools"))
+
+from lab_report_processor import LabReportImageProcessor, load_image
+
+
+def synthetic_lab_report(width=4032, height=3024):
+    """A 12 MP 'phone photo' of a lab report: text rows on an unevenly lit page, with noise"""
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(170, 235, width, dtype=np.float32)[None, :].repeat(height, axis=0)
+    page = np.dstack([gradient] * 3)
+    page += rng.normal(0, 6, page.shape).astype(np.float32)
+    page = np.clip(page, 0, 255).astype(np.uint8)
+    rows = ["Hemoglobin 13.5 g/dL 12.0-16.0", "Glucose 95 mg/dL 70-100", "Cholesterol 210 mg/dL <200",
+            "WBC 7.2 thousand/uL 4.5-11.0", "Platelets 250 thousand/uL 150-450", "TSH 2.1 mIU/L 0.4-4.0"]
+    for i in range(40):
+        cv2.putText(page, rows[i % len(rows)], (200, 200 + i * 68), cv2.FONT_HERSHEY_SIMPLEX, 1.6, (30, 30, 30), 3)
+    ok, encoded = cv2.imencode('.jpg', page, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def legacy_preprocess(image, profile):
+    """preprocess_image as it was before the rewrite (kept here for comparison only)"""
+    img = load_image(image)
+    profile('decode')
+    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    pil_img = Image.fromarray(img_rgb)
+    profile('to_pil')
+    pil_img = ImageEnhance.Contrast(pil_img).enhance(1.5)
+    profile('contrast')
+    pil_img = ImageEnhance.Sharpness(pil_img).enhance(2.0)
+    profile('sharpen')
+    img_array = np.array(pil_img)
+    gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+    profile('grayscale')
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    profile('blur')
+    thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+    profile('threshold')
+    kernel = np.ones((2, 2), np.uint8)
+    cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+    cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_OPEN, kernel)
+    profile('morphology')
+    return cleaned
+
+
+class StageProfiler:
+    """profile(stage) callback recording wall time and peak traced memory since the previous stage"""
+
+    def __init__(self):
+        self.stages = {}
+        self.overall_peak = 0
+        self._last = None
+
+    def start(self):
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._last = time.perf_counter()
+
+    def __call__(self, name):
+        now = time.perf_counter()
+        _, peak = tracemalloc.get_traced_memory()
+        self.overall_peak = max(self.overall_peak, peak)
+        elapsed, stage_peak = self.stages.get(name, (0.0, 0))
+        self.stages[name] = (elapsed + now - self._last, max(stage_peak, peak))
+        tracemalloc.reset_peak()
+        self._last = time.perf_counter()
+
+    def stop(self):
+        tracemalloc.stop()
+
+
+def run(label, pipeline, data, repeat):
+    profiler = StageProfiler()
+    result = None
+    for _ in range(repeat):
+        profiler.start()
+        result = pipeline(data, profiler)
+        profiler.stop()
+
+    total = sum(elapsed for elapsed, _ in profiler.stages.values()) / repeat
+    print(f"\n{label}  (output {result.shape[1]}x{result.shape[0]})")
+    print(f"  {'stage':<12} {'time ms':>9} {'peak MB':>9}")
+    for name, (elapsed, peak) in profiler.stages.items():
+        print(f"  {name:<12} {elapsed / repeat * 1000:>9.1f} {peak / 2**20:>9.1f}")
+    print(f"  {'total':<12} {total * 1000:>9.1f} {profiler.overall_peak / 2**20:>9.1f}")
+    return result, total, profiler.overall_peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('image', nargs='?', help="Lab report image (default: synthetic 12 MP photo)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = Path(args.image).read_bytes() if args.image else synthetic_lab_report()
+    processor = LabReportImageProcessor()
+    cv2.setNumThreads(1)  # Comparable numbers; OCR workers run one image per core anyway
+
+    before, before_time, before_peak = run("Before: OpenCV + PIL round trip", legacy_preprocess, data, args.repeat)
+    after, after_time, after_peak = run(
+        "After: OpenCV only, downscaled, dst= buffers",
+        lambda image, profile: processor.preprocess_image(image, profile=profile), data, args.repeat
+    )
+
+    # Compare at the output resolution
+    reference = cv2.resize(before, (after.shape[1], after.shape[0]), interpolation=cv2.INTER_AREA)
+    reference = np.where(reference >= 128, 255, 0).astype(np.uint8)
+    agreement = np.mean(reference == after) * 100
+
+    print(f"\nSpeed-up: {before_time / after_time:.1f}x   Peak memory: {before_peak / 2**20:.0f} MB -> {after_peak / 2**20:.0f} MB")
+    print(f"Binarized pixels agreeing with the previous pipeline: {agreement:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Load check: the shared Groq client against the local stub server.
+
+Fires a burst of chat completions at a GroqStubServer that enforces a small
+token quota and fails its first calls with 503. The quota refills over 5
+seconds by default, rather than Groq's minute, to keep the check quick. The
+burst runs first from a thread pool (chat_completion) and then from asyncio
+(achat_completion). Prints how long each burst took against the quota's lower
+bound, how many requests the stub rejected with 429, peak concurrency, and how
+many TCP connections were opened. Keep-alive pooling should mean one
+connection per concurrent caller; the limiter should mean few 429s.
+
+Usage:
+    python check_groq_client.py [--calls N] [--concurrency N] [--tpm N] [--window SECONDS]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add project paths
+current_dir = Path(__file__).parent
+sys.path.append(str(current_dir / "src" / "healthguard" / "tools"))
+
+from groq_client import GroqClient, RateLimiter
+from groq_stub_server import GroqStubServer
+
+
+# What the stub charges per completion; close to PAYLOAD's max_tokens plus its prompt
+TOKENS_PER_REQUEST = 120
+
+PAYLOAD = {
+    "model": "meta-llama/llama-4-scout-17b-16e-instruct",
+    "messages": [
+        {"role": "system", "content": "You are an expert medical AI assistant specializing in lab report analysis."},
+        {"role": "user", "content": "LAB REPORT TEXT:\nHemoglobin: 11.2 g/dL (Normal: 13.5-17.5 g/dL)"}
+    ],
+    "max_tokens": 100,
+    "temperature": 0.1
+}
+
+
+def run_threads(client, calls, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda _: client.chat_completion(PAYLOAD), range(calls)))
+
+
+async def run_async(client, calls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call():
+        async with semaphore:
+            return await client.achat_completion(PAYLOAD)
+
+    return await asyncio.gather(*(call() for _ in range(calls)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rpm', type=int, default=600, help="Stub request quota per window")
+    parser.add_argument('--tpm', type=int, default=2000, help="Stub token quota per window")
+    parser.add_argument('--window', type=float, default=5, help="Seconds for the stub quota to refill (Groq: 60)")
+    parser.add_argument('--latency', type=float, default=0.2, help="Stub seconds per completion")
+    args = parser.parse_args()
+
+    # Calls that fit in the initial quota are free; the rest wait for it to refill
+    bound = max(0, args.calls * TOKENS_PER_REQUEST - args.tpm) / args.tpm * args.window
+    print(f"quota lower bound: {bound:.1f}s")
+    print(f"{'mode':<8} {'calls':>5} {'seconds':>8} {'429s':>5} {'peak in-flight':>15} {'connections':>12}")
+    for mode in ('threads', 'asyncio'):
+        with GroqStubServer(latency=args.latency, requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                            tokens_per_request=TOKENS_PER_REQUEST, fail_first=2, window=args.window) as stub:
+            client = GroqClient(api_key='stub', base_url=stub.base_url, backoff_base=0.1,
+                                pool_size=args.concurrency, limiter=RateLimiter(args.rpm, args.tpm))
+            start = time.perf_counter()
+            if mode == 'threads':
+                results = run_threads(client, args.calls, args.concurrency)
+            else:
+                results = asyncio.run(run_async(client, args.calls, args.concurrency))
+            elapsed = time.perf_counter() - start
+            client.close()
+
+            assert len(results) == args.calls
+            print(f"{mode:<8} {args.calls:>5} {elapsed:>8.2f} {stub.rate_limited:>5} "
+                  f"{stub.max_in_flight:>15} {len(stub.connections):>12}")
+
+
+if __name__ == "__main__":
+    main()
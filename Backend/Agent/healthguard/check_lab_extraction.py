@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+"""
+Regression check: lab value extraction against lab_extraction_corpus.json.
+
+Each corpus case is a lab report text with the parameter values that should be
+extracted. The current single-pass extractor (LAB_VALUE_RE + synonym index) is
+scored against the previous multi-regex extractor, which is kept below for
+comparison. The script fails (exit 1) if any case extracts fewer correct values,
+or more wrong ones, than before. It also times both extractors on the whole
+corpus repeated many times.
+
+Usage:
+    python check_lab_extraction.py [--corpus PATH] [--repeat N]
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add project paths
+current_dir = Path(__file__).parent
+sys.path.append(str(current_dir / "src" / "healthguard" / "tools"))
+
+from lab_report_processor import LabReportImageProcessor
+
+
+def legacy_extract_lab_values(self, lines, parsed_data):
+    """_extract_lab_values before the single-pass rewrite (kept here for comparison only)"""
+    # Common patterns for lab values
+    value_patterns = [
+        # Pattern: Parameter Name    Value    Unit    Normal Range
+        r'([a-zA-Z\s]+?)\s+(\d+\.?\d*)\s*([a-zA-Z/%μ]+)?\s*(?:(?:normal|ref|reference)?\s*:?\s*)?([<>]?\d+\.?\d*\s*[-–]\s*[<>]?\d+\.?\d*|[<>]\d+\.?\d*)',
+        
+        # Pattern: Parameter: Value Unit (Normal: range)
+        r'([a-zA-Z\s]+?):\s*(\d+\.?\d*)\s*([a-zA-Z/%μ]+)?\s*\((?:normal|ref):\s*([^)]+)\)',
+        
+        # Pattern: Parameter Value Unit Normal Range
+        r'([a-zA-Z\s]+?)\s+(\d+\.?\d*)\s+([a-zA-Z/%μ]+)\s+([<>]?\d+\.?\d*\s*[-–]\s*[<>]?\d+\.?\d*)',
+        
+        # Simple pattern: Parameter Value
+        r'([a-zA-Z\s]+?)\s+(\d+\.?\d*)\s*([a-zA-Z/%μ]+)?',
+    ]
+    
+    for line in lines:
+        # Skip header lines and non-data lines
+        if any(skip_word in line.lower() for skip_word in ['patient', 'hospital', 'laboratory', 'report', 'date']):
+            continue
+        
+        for pattern in value_patterns:
+            matches = re.finditer(pattern, line, re.IGNORECASE)
+            for match in matches:
+                param_name = match.group(1).strip().lower()
+                param_value = match.group(2)
+                param_unit = match.group(3) if len(match.groups()) > 2 and match.group(3) else ''
+                normal_range = match.group(4) if len(match.groups()) > 3 and match.group(4) else ''
+                
+                # Clean parameter name
+                param_name = re.sub(r'[^\w\s]', '', param_name).strip()
+                param_name = re.sub(r'\s+', '_', param_name)
+                
+                if len(param_name) > 2 and param_value:
+                    # Try to match with known parameters
+                    matched_param = legacy_match_parameter(self, param_name)
+                    if matched_param:
+                        parsed_data['lab_results'][matched_param] = {
+                            'value': float(param_value),
+                            'unit': param_unit or self.common_lab_parameters[matched_param]['unit'],
+                            'raw_name': match.group(1).strip()
+                        }
+                        
+                        if normal_range:
+                            parsed_data['lab_normal_ranges'][matched_param] = normal_range
+                        else:
+                            parsed_data['lab_normal_ranges'][matched_param] = self.common_lab_parameters[matched_param]['normal_range']
+
+def legacy_match_parameter(self, param_name):
+    """Match extracted parameter name with known lab parameters."""
+    param_name = param_name.lower().replace('_', ' ')
+    
+    # Direct matches
+    if param_name in self.common_lab_parameters:
+        return param_name
+    
+    # Fuzzy matching with common abbreviations and variations
+    matches = {
+        'glucose': ['glucose', 'blood glucose', 'fasting glucose', 'random glucose'],
+        'cholesterol': ['cholesterol', 'total cholesterol', 'chol'],
+        'hdl': ['hdl', 'hdl cholesterol', 'high density lipoprotein'],
+        'ldl': ['ldl', 'ldl cholesterol', 'low density lipoprotein'],
+        'triglycerides': ['triglycerides', 'tg', 'trigs'],
+        'creatinine': ['creatinine', 'creat', 'cr'],
+        'bun': ['bun', 'blood urea nitrogen', 'urea'],
+        'hemoglobin': ['hemoglobin', 'hgb', 'hb'],
+        'hematocrit': ['hematocrit', 'hct', 'hct'],
+        'rbc': ['rbc', 'red blood cells', 'red blood cell count', 'erythrocytes'],
+        'wbc': ['wbc', 'white blood cells', 'white blood cell count', 'leukocytes'],
+        'platelets': ['platelets', 'plt', 'platelet count'],
+        'alt': ['alt', 'alanine aminotransferase', 'sgpt'],
+        'ast': ['ast', 'aspartate aminotransferase', 'sgot'],
+        'tsh': ['tsh', 'thyroid stimulating hormone'],
+        't3': ['t3', 'triiodothyronine'],
+        't4': ['t4', 'thyroxine'],
+    }
+    
+    for standard_name, variations in matches.items():
+        if any(variation in param_name for variation in variations):
+            return standard_name
+    
+    return None
+
+
+def extract(processor, extractor, text):
+    parsed_data = {'lab_results': {}, 'lab_normal_ranges': {}}
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    extractor(processor, lines, parsed_data)
+    return {param: result['value'] for param, result in parsed_data['lab_results'].items()}
+
+
+def score(found, expected):
+    correct = sum(1 for param, value in found.items() if param in expected and abs(expected[param] - value) < 1e-9)
+    wrong = len(found) - correct
+    return correct, wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=str(current_dir / 'lab_extraction_corpus.json'))
+    parser.add_argument('--repeat', type=int, default=200, help="Corpus repetitions for the timing run")
+    args = parser.parse_args()
+
+    cases = json.loads(Path(args.corpus).read_text())
+    processor = LabReportImageProcessor()
+    extractors = {
+        'before': legacy_extract_lab_values,
+        'after': LabReportImageProcessor._extract_lab_values,
+    }
+
+    regressions = 0
+    totals = {label: [0, 0] for label in extractors}
+    expected_total = 0
+    print(f"{'case':<26} {'expected':>8} {'before ok/wrong':>16} {'after ok/wrong':>15}")
+    for case in cases:
+        expected = case['expected']
+        expected_total += len(expected)
+        scores = {}
+        for label, extractor in extractors.items():
+            scores[label] = score(extract(processor, extractor, case['text']), expected)
+            totals[label][0] += scores[label][0]
+            totals[label][1] += scores[label][1]
+        before, after = scores['before'], scores['after']
+        regressed = after[0] < before[0] or after[1] > before[1]
+        regressions += regressed
+        print(f"{case['name']:<26} {len(expected):>8} {before[0]:>10}/{before[1]:<5} {after[0]:>9}/{after[1]:<5}{'  REGRESSION' if regressed else ''}")
+        if after[0] < len(expected) or after[1]:
+            found = extract(processor, extractors['after'], case['text'])
+            print(f"    missing: {sorted(set(expected) - set(found))}  unexpected: {sorted(set(found) - set(expected))}")
+
+    print(f"\nCorrect values: before {totals['before'][0]}/{expected_total} (wrong {totals['before'][1]}), "
+          f"after {totals['after'][0]}/{expected_total} (wrong {totals['after'][1]})")
+
+    texts = [case['text'] for case in cases] * args.repeat
+    for label, extractor in extractors.items():
+        start = time.perf_counter()
+        for text in texts:
+            extract(processor, extractor, text)
+        print(f"{label:<7} {len(texts)} reports in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    if regressions:
+        print(f"\n{regressions} case(s) regressed")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
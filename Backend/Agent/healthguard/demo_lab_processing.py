@@ -184,15 +184,20 @@ def demo_api_usage():
     
     print("📤 Image Upload API:")
     print("""
-    # Upload lab report image
+    # Upload lab report image (responds 202 with a job_id and status_url)
     curl -X POST http://localhost:8000/healthapp/api/lab-image-upload/ \\
-         -F "lab_report_image=@lab_report.jpg" \\
-         -F "user_id=1"
+         -H "Authorization: Bearer <access_token>" \\
+         -F "lab_report_image=@lab_report.jpg"
     
     # Or with base64 encoding
     curl -X POST http://localhost:8000/healthapp/api/lab-image-upload/ \\
+         -H "Authorization: Bearer <access_token>" \\
          -H "Content-Type: application/json" \\
-         -d '{"image_base64": "base64_encoded_image_data", "user_id": 1}'
+         -d '{"image_base64": "base64_encoded_image_data"}'
+    
+    # Poll the OCR job
+    curl http://localhost:8000/healthapp/api/lab-jobs/<job_id>/ \\
+         -H "Authorization: Bearer <access_token>"
     """)
     
     print("📝 Text Analysis API:")
@@ -212,7 +217,7 @@ def demo_api_usage():
     curl -X POST http://localhost:8000/healthapp/api/lab-batch-process/ \\
          -F "lab_report_1=@report1.jpg" \\
          -F "lab_report_2=@report2.jpg" \\
-         -F "user_id=1"
+         -H "Authorization: Bearer <access_token>"
     """)
 
 def demo_workflow_examples():
@@ -5,12 +5,17 @@ Combines image OCR with Groq's llama-4-scout for medical analysis
 """
 
 import os
+import sys
 import base64
 import json
-import requests
 from pathlib import Path
 from datetime import datetime
 
+# Add project paths
+sys.path.append(str(Path(__file__).parent / "src" / "healthguard" / "tools"))
+
+from groq_client import GroqAPIError, get_groq_client
+
 # Basic OCR using PIL (we'll enhance this)
 try:
     from PIL import Image
@@ -66,11 +71,6 @@ def analyze_with_groq_scout(extracted_text):
     if not api_key:
         return {"error": "GROQ_API_KEY not found"}
     
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
     system_prompt = """You are an expert medical AI assistant specializing in lab report analysis.
 
 Analyze the provided lab report text and extract ALL medical information with high accuracy.
@@ -145,31 +145,29 @@ Please be thorough and accurate in your analysis."""
     }
     
     try:
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=120
-        )
+        # Shared pooled client: rate limiting and retries with backoff
+        result = get_groq_client().chat_completion(payload)
+        analysis = result['choices'][0]['message']['content']
+        usage = result.get('usage', {})
         
-        if response.status_code == 200:
-            result = response.json()
-            analysis = result['choices'][0]['message']['content']
-            usage = result.get('usage', {})
-            
-            return {
-                "success": True,
-                "analysis": analysis,
-                "usage": usage,
-                "model": "meta-llama/llama-4-scout-17b-16e-instruct"
-            }
-        else:
+        return {
+            "success": True,
+            "analysis": analysis,
+            "usage": usage,
+            "model": "meta-llama/llama-4-scout-17b-16e-instruct"
+        }
+        
+    except GroqAPIError as e:
+        if e.status_code is None:
             return {
                 "success": False,
-                "error": f"API Error: {response.status_code}",
-                "details": response.text
+                "error": str(e)
             }
-            
+        return {
+            "success": False,
+            "error": f"API Error: {e.status_code}",
+            "details": e.body
+        }
     except Exception as e:
         return {
             "success": False,
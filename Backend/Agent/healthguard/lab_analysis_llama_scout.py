@@ -5,27 +5,36 @@ Converts images from the images folder to base64 and analyzes using the specifie
 """
 
 import os
+import sys
 import base64
 import json
-import requests
 from pathlib import Path
 from datetime import datetime
 
+# Add project paths
+sys.path.append(str(Path(__file__).parent / "src" / "healthguard" / "tools"))
+
+from analysis_cache import file_sha256, get_analysis_cache
+from groq_client import GroqAPIError, GroqTimeout, get_groq_client
+from image_upload import prepare_image_for_upload
+
+# Bump when the prompt or the saved analysis structure change, so cached analyses aren't reused
+PROMPT_VERSION = "llama-scout-v2"
+
 class LabAnalysisLlamaScout:
     def __init__(self):
         self.api_key = os.getenv('GROQ_API_KEY')
         self.images_folder = Path("c:/Users/MALAVIKA/Documents/GitHub/Nexus-Hackbattle/Backend/Agent/images")
         self.model = "meta-llama/llama-4-scout-17b-16e-instruct"
-        self.groq_base_url = "https://api.groq.com/openai/v1/chat/completions"
         self.supported_formats = {'.jpg', '.jpeg', '.png'}
+        self.analysis_cache = get_analysis_cache()
     
-    def convert_image_to_base64(self, image_path: Path) -> str:
-        """Convert image file to base64 string"""
+    def convert_image_to_base64(self, image_path: Path) -> tuple:
+        """Convert image file to a base64 string, oriented, cropped and downscaled for the model"""
         try:
-            with open(image_path, 'rb') as image_file:
-                image_data = image_file.read()
-                base64_encoded = base64.b64encode(image_data).decode('utf-8')
-            return base64_encoded
+            image_data, image_info = prepare_image_for_upload(image_path, self.model)
+            base64_encoded = base64.b64encode(image_data).decode('utf-8')
+            return base64_encoded, image_info
         except Exception as e:
             raise Exception(f"Failed to convert image to base64: {e}")
     
@@ -43,6 +52,13 @@ class LabAnalysisLlamaScout:
     def analyze_lab_report_with_llama_scout(self, image_path: Path) -> dict:
         """Analyze lab report using meta-llama/llama-4-scout-17b-16e-instruct"""
         
+        # Unchanged images were analyzed before: reuse the stored analysis instead of calling the API
+        image_sha256 = file_sha256(image_path)
+        cached_analysis = self.analysis_cache.get(image_sha256, self.model, PROMPT_VERSION)
+        if cached_analysis is not None:
+            print(f"♻️  Reusing cached analysis for {image_path.name} (from {cached_analysis['analysis_timestamp']})")
+            return {**cached_analysis, "image_analyzed": str(image_path), "cache_hit": True}
+        
         if not self.api_key:
             raise Exception("GROQ_API_KEY environment variable not found")
         
@@ -50,15 +66,13 @@ class LabAnalysisLlamaScout:
         print(f"🤖 Using model: {self.model}")
         
         # Convert image to base64
-        base64_image = self.convert_image_to_base64(image_path)
+        base64_image, image_info = self.convert_image_to_base64(image_path)
+        upload = image_info['upload']
         print(f"✅ Image converted to base64 ({len(base64_image)} characters)")
+        print(f"   {image_info['size'][0]}x{image_info['size'][1]} → {upload['size'][0]}x{upload['size'][1]} {upload['format']}, "
+              f"{image_info['file_size']:,} → {upload['file_size']:,} bytes ({upload['size_reduction']:.0%} smaller)")
         
         # Prepare API request
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "model": self.model,
             "messages": [
@@ -129,7 +143,7 @@ Be extremely thorough and accurate in your extraction and analysis."""
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+                                "url": f"data:{upload['mime_type']};base64,{base64_image}"
                             }
                         }
                     ]
@@ -142,64 +156,60 @@ Be extremely thorough and accurate in your extraction and analysis."""
         print("🚀 Sending to Groq API with Llama Scout model...")
         
         try:
-            response = requests.post(
-                self.groq_base_url,
-                headers=headers,
-                json=payload,
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                ai_content = result['choices'][0]['message']['content']
-                usage = result.get('usage', {})
-                
-                print("✅ SUCCESS! Lab Report Analysis Complete!")
-                
-                # Save the analysis
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                analysis_file = f"llama_scout_lab_analysis_{timestamp}.json"
-                
-                analysis_data = {
-                    "image_analyzed": str(image_path),
-                    "model_used": self.model,
-                    "analysis_timestamp": timestamp,
-                    "analysis_content": ai_content,
-                    "usage_stats": usage,
-                    "raw_response": result
-                }
-                
-                with open(analysis_file, 'w', encoding='utf-8') as f:
-                    json.dump(analysis_data, f, indent=2, ensure_ascii=False)
-                
-                print(f"💾 Analysis saved to: {analysis_file}")
-                
-                # Show API usage stats
-                print(f"\n📊 API Usage Statistics:")
-                print(f"   Model: {result.get('model', 'N/A')}")
-                print(f"   Total Tokens: {usage.get('total_tokens', 'N/A')}")
-                print(f"   Prompt Tokens: {usage.get('prompt_tokens', 'N/A')}")
-                print(f"   Completion Tokens: {usage.get('completion_tokens', 'N/A')}")
-                
-                return analysis_data
-                
-            else:
-                error_msg = f"Groq API Error: {response.status_code} - {response.text}"
-                print(f"❌ {error_msg}")
-                
-                if response.status_code == 401:
-                    print("🔑 Check your GROQ_API_KEY - it might be invalid")
-                elif response.status_code == 429:
-                    print("⏰ Rate limit exceeded - try again in a moment")
-                elif response.status_code == 400:
-                    print("📝 Bad request - check if the model supports vision")
-                
-                raise Exception(error_msg)
-                
-        except requests.exceptions.Timeout:
+            # Shared pooled client: rate limiting and retries with backoff
+            result = get_groq_client().chat_completion(payload)
+        except GroqTimeout:
             error_msg = "Request timed out - the image might be too large"
             print(f"⏰ {error_msg}")
             raise Exception(error_msg)
+        except GroqAPIError as e:
+            error_msg = str(e)
+            print(f"❌ {error_msg}")
+            
+            if e.status_code == 401:
+                print("🔑 Check your GROQ_API_KEY - it might be invalid")
+            elif e.status_code == 429:
+                print("⏰ Rate limit exceeded - try again in a moment")
+            elif e.status_code == 400:
+                print("📝 Bad request - check if the model supports vision")
+            
+            raise Exception(error_msg)
+        
+        try:
+            ai_content = result['choices'][0]['message']['content']
+            usage = result.get('usage', {})
+            
+            print("✅ SUCCESS! Lab Report Analysis Complete!")
+            
+            # Save the analysis
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            analysis_file = f"llama_scout_lab_analysis_{timestamp}.json"
+            
+            analysis_data = {
+                "image_analyzed": str(image_path),
+                "model_used": self.model,
+                "analysis_timestamp": timestamp,
+                "analysis_content": ai_content,
+                "image_info": image_info,
+                "usage_stats": usage,
+                "raw_response": result
+            }
+            
+            with open(analysis_file, 'w', encoding='utf-8') as f:
+                json.dump(analysis_data, f, indent=2, ensure_ascii=False)
+            
+            print(f"💾 Analysis saved to: {analysis_file}")
+            self.analysis_cache.put(image_sha256, self.model, PROMPT_VERSION, analysis_data)
+            
+            # Show API usage stats
+            print(f"\n📊 API Usage Statistics:")
+            print(f"   Model: {result.get('model', 'N/A')}")
+            print(f"   Total Tokens: {usage.get('total_tokens', 'N/A')}")
+            print(f"   Prompt Tokens: {usage.get('prompt_tokens', 'N/A')}")
+            print(f"   Completion Tokens: {usage.get('completion_tokens', 'N/A')}")
+            
+            return analysis_data
+            
         except Exception as e:
             error_msg = f"Unexpected error: {e}"
             print(f"❌ {error_msg}")
@@ -251,10 +261,12 @@ def main():
     if results:
         successful = sum(1 for r in results if 'error' not in r)
         failed = len(results) - successful
+        cached = sum(1 for r in results if r.get('cache_hit'))
         
         print(f"\n📊 Analysis Summary:")
         print(f"   Total images: {len(results)}")
         print(f"   Successfully analyzed: {successful}")
+        print(f"   Reused from cache: {cached}")
         print(f"   Failed: {failed}")
         
         if successful > 0:
@@ -0,0 +1,167 @@
+"""
+On-disk cache of LLM lab report analyses, keyed by image content.
+
+A result is stored under (SHA-256 of the image file, model, prompt version), so
+re-running a processor over a folder only sends new or changed images to Groq.
+Renamed or copied files still hit the cache. Changing the model or bumping a
+processor's PROMPT_VERSION misses it.
+
+Each entry is one JSON file, written atomically. When the cache grows past its
+size limit, the least recently used entries are evicted first (a hit refreshes
+the entry's mtime). Several processes can share one cache directory.
+
+Settings (environment):
+    LAB_ANALYSIS_CACHE_DIR      cache directory (default ~/.cache/healthguard/lab_analyses)
+    LAB_ANALYSIS_CACHE_MAX_MB   size limit in MB (default 256; 0 disables the cache)
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "healthguard" / "lab_analyses"
+DEFAULT_MAX_MB = 256
+
+# After eviction the cache is trimmed to this fraction of its limit, so it isn't re-scanned on every write
+EVICT_TO_FRACTION = 0.9
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: Union[str, os.PathLike]) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """Size-bounded, LRU-evicted store of analysis results on disk"""
+
+    def __init__(self, directory: Union[str, os.PathLike, None] = None, max_bytes: Optional[int] = None):
+        self.directory = Path(directory or os.getenv('LAB_ANALYSIS_CACHE_DIR') or DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('LAB_ANALYSIS_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._size = None  # bytes on disk, counted on first write
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(image_sha256: str, model: str, prompt_version: str) -> str:
+        return hashlib.sha256(f"{image_sha256}\0{model}\0{prompt_version}".encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, image_sha256: str, model: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+        """The cached result, or None"""
+        if not self.enabled:
+            return None
+        path = self._path(self.key(image_sha256, model, prompt_version))
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            # Missing, evicted by another process, or a torn file from a crash
+            return None
+        return entry.get('result')
+
+    def put(self, image_sha256: str, model: str, prompt_version: str, result: Dict[str, Any]):
+        """Store a result (replacing any previous one), then evict if over the size limit"""
+        if not self.enabled:
+            return
+        key = self.key(image_sha256, model, prompt_version)
+        data = json.dumps({
+            "image_sha256": image_sha256,
+            "model": model,
+            "prompt_version": prompt_version,
+            "cached_at": datetime.now().isoformat(),
+            "result": result
+        }, ensure_ascii=False).encode('utf-8')
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        try:
+            previous_size = path.stat().st_size
+        except OSError:
+            previous_size = 0
+        # Write to a temp file and rename, so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += len(data) - previous_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                try:
+                    yield entry.path, entry.stat()
+                except OSError:
+                    pass
+
+    def _disk_usage(self) -> int:
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def _evict(self):
+        """Delete least recently used entries until under EVICT_TO_FRACTION of the limit"""
+        entries = sorted(self._entries(), key=lambda item: item[1].st_mtime)
+        size = sum(stat.st_size for _, stat in entries)
+        target = self.max_bytes * EVICT_TO_FRACTION
+        for path, stat in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            size -= stat.st_size
+        self._size = size
+
+    def clear(self):
+        with self._lock:
+            if self.directory.exists():
+                for path, _ in self._entries():
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+            self._size = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """The process-wide cache, configured from the environment"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnalysisCache()
+    return _cache
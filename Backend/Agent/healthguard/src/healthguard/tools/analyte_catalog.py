@@ -0,0 +1,367 @@
+"""
+Analyte catalog: units, synonyms and reference ranges of lab parameters.
+
+The catalog is loaded from analyte_catalog.json (or any JSON file with the same
+layout), so analytes and ranges can be added without touching code. Range
+strings such as '<200' or '70-100' are parsed once into ReferenceRange objects,
+and ranges may depend on the patient's sex and age. evaluate() checks a whole
+panel with a few numpy array comparisons instead of parsing each range.
+"""
+
+import json
+import os
+import re
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analyte_catalog.json')
+
+# A value below half the lower bound or above 1.5x the upper bound is critical
+CRITICAL_LOW_FACTOR = 0.5
+CRITICAL_HIGH_FACTOR = 1.5
+
+NORMAL, ABNORMAL, CRITICAL = 'normal', 'abnormal', 'critical'
+SEVERITIES = np.array([NORMAL, ABNORMAL, CRITICAL], dtype=object)
+
+_NUMBER = r'\d+(?:\.\d+)?'
+_UPPER_RE = re.compile(rf'<\s*(=)?\s*({_NUMBER})')
+_LOWER_RE = re.compile(rf'>\s*(=)?\s*({_NUMBER})')
+_INTERVAL_RE = re.compile(rf'({_NUMBER})\s*[-–]\s*({_NUMBER})')
+
+
+@dataclass(frozen=True)
+class ReferenceRange:
+    """
+    A parsed reference range. '<200' is normal below 200, '>40' above 40 and
+    '70-100' from 70 to 100 inclusive; a missing bound is infinite, so a range
+    that can't be parsed never flags a value.
+    """
+    low: float = -np.inf
+    high: float = np.inf
+    low_inclusive: bool = True
+    high_inclusive: bool = True
+    text: str = ''
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def parse(text: str) -> 'ReferenceRange':
+        """Parse a range string (cached: each distinct string is parsed once per process)"""
+        text = (text or '').strip()
+        match = _UPPER_RE.search(text)
+        if match:
+            return ReferenceRange(high=float(match.group(2)), high_inclusive=bool(match.group(1)), text=text)
+        match = _LOWER_RE.search(text)
+        if match:
+            return ReferenceRange(low=float(match.group(2)), low_inclusive=bool(match.group(1)), text=text)
+        match = _INTERVAL_RE.search(text)
+        if match:
+            return ReferenceRange(low=float(match.group(1)), high=float(match.group(2)), text=text)
+        return ReferenceRange(text=text)
+
+    def severity(self, value: float) -> str:
+        """'normal', 'abnormal' or 'critical' for a single value"""
+        return str(evaluate_ranges([value], [self])[0])
+
+
+UNBOUNDED = ReferenceRange()
+
+
+def evaluate_ranges(values: Iterable[float], ranges: Iterable[ReferenceRange]) -> np.ndarray:
+    """Severity ('normal' / 'abnormal' / 'critical') of each value against the range at the same position"""
+    ranges = list(ranges)
+    bounds = np.array([(r.low, r.high) for r in ranges], dtype=float).reshape(-1, 2)
+    inclusive = np.array([(r.low_inclusive, r.high_inclusive) for r in ranges], dtype=bool).reshape(-1, 2)
+    return _evaluate(np.asarray(list(values), dtype=float), bounds[:, 0], bounds[:, 1], inclusive[:, 0], inclusive[:, 1])
+
+
+def _evaluate(values, low, high, low_inclusive, high_inclusive) -> np.ndarray:
+    with np.errstate(invalid='ignore'):
+        abnormal = (
+            np.where(low_inclusive, values < low, values <= low)
+            | np.where(high_inclusive, values > high, values >= high)
+        )
+        critical = abnormal & ((values < low * CRITICAL_LOW_FACTOR) | (values > high * CRITICAL_HIGH_FACTOR))
+    return SEVERITIES[abnormal.astype(np.intp) + critical]
+
+
+def normalize_sex(sex) -> Optional[str]:
+    """'male' / 'female' from the usual spellings ('M', 'f', 'Female', ...), else None"""
+    sex = str(sex or '').strip().lower()
+    if sex in ('m', 'male'):
+        return 'male'
+    if sex in ('f', 'female'):
+        return 'female'
+    return None
+
+
+def normalize_age(age) -> Optional[float]:
+    try:
+        return float(age)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class RangeRule:
+    """A reference range that applies to one sex and/or an age band (min_age inclusive, max_age exclusive)"""
+    range: ReferenceRange
+    sex: Optional[str] = None
+    min_age: Optional[float] = None
+    max_age: Optional[float] = None
+
+    def applies(self, sex: Optional[str], age: Optional[float]) -> bool:
+        if self.sex is not None and self.sex != sex:
+            return False
+        if self.min_age is not None and (age is None or age < self.min_age):
+            return False
+        if self.max_age is not None and (age is None or age >= self.max_age):
+            return False
+        return True
+
+
+@dataclass(frozen=True)
+class Analyte:
+    name: str
+    unit: str
+    group: str = ''
+    synonyms: Tuple[str, ...] = ()
+    rules: Tuple[RangeRule, ...] = ()
+    model_fields: Tuple[str, ...] = ()
+
+    @property
+    def normal_range(self) -> str:
+        """The general (adult, either sex) reference range"""
+        return self.range_for().text
+
+    def range_for(self, sex: Optional[str] = None, age: Optional[float] = None) -> ReferenceRange:
+        """The first rule matching the patient; rules are ordered most specific first"""
+        for rule in self.rules:
+            if rule.applies(sex, age):
+                return rule.range
+        return UNBOUNDED
+
+
+class RangeTable(NamedTuple):
+    """Every analyte's reference range for one patient profile, as arrays"""
+    position: Dict[str, int]
+    ranges: List[ReferenceRange]
+    low: np.ndarray
+    high: np.ndarray
+    low_inclusive: np.ndarray
+    high_inclusive: np.ndarray
+
+
+class RangeCheck(NamedTuple):
+    severity: str
+    range: ReferenceRange
+
+
+def normalize_parameter_name(name: str) -> str:
+    """Lowercase, punctuation/underscores to spaces, single-spaced"""
+    return ' '.join(_NON_ALNUM_RE.sub(' ', name.lower()).split())
+
+
+_NON_ALNUM_RE = re.compile(r'[^0-9a-z]+')
+
+
+class SynonymIndex:
+    """
+    Aho-Corasick automaton over parameter synonyms, built once per process.
+
+    find() scans a normalized name in a single pass and returns the standard
+    parameter for the longest synonym that occurs as whole words (leftmost on
+    ties), e.g. "hdl cholesterol" -> hdl rather than cholesterol.
+    """
+
+    def __init__(self, synonyms: Dict[str, List[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]
+        seen = set()
+        for parameter, variants in synonyms.items():
+            for variant in variants:
+                variant = normalize_parameter_name(variant)
+                if variant and variant not in seen:
+                    seen.add(variant)
+                    self._add(variant, parameter)
+        self._build()
+
+    def _add(self, word: str, parameter: str):
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._out[state].append((len(word), parameter))
+
+    def _build(self):
+        # Breadth-first: failure links point to the longest proper suffix that is also a prefix
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0) if state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def find(self, name: str) -> Optional[str]:
+        goto, fail, out = self._goto, self._fail, self._out
+        best = None  # (length, start, parameter)
+        state = 0
+        last = len(name) - 1
+        for end, char in enumerate(name):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, parameter in out[state]:
+                start = end - length + 1
+                # Whole words only: "cr" must not match inside "crp"
+                if (start == 0 or name[start - 1] == ' ') and (end == last or name[end + 1] == ' '):
+                    if best is None or length > best[0] or (length == best[0] and start < best[1]):
+                        best = (length, start, parameter)
+        return best[2] if best else None
+
+
+class AnalyteCatalog:
+    """
+    Lab analytes by standard name, with a synonym index for report names and
+    reference ranges precompiled per patient profile (sex, age).
+    """
+
+    def __init__(self, analytes: Iterable[Analyte]):
+        self.analytes: Dict[str, Analyte] = {analyte.name: analyte for analyte in analytes}
+        # Every analyte's own name (with spaces for underscores) is a synonym too
+        self.synonym_index = SynonymIndex({
+            name: [name.replace('_', ' '), *analyte.synonyms] for name, analyte in self.analytes.items()
+        })
+        self._model_fields = {model_field: analyte for analyte in self for model_field in analyte.model_fields}
+        self._tables: Dict[Tuple[Optional[str], Optional[float]], RangeTable] = {}
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> 'AnalyteCatalog':
+        analytes = []
+        for name, entry in data['analytes'].items():
+            rules = tuple(
+                RangeRule(
+                    range=ReferenceRange.parse(rule['range']),
+                    sex=normalize_sex(rule.get('sex')),
+                    min_age=normalize_age(rule.get('min_age')),
+                    max_age=normalize_age(rule.get('max_age'))
+                )
+                for rule in entry.get('ranges', [])
+            )
+            analytes.append(Analyte(
+                name=name,
+                unit=entry.get('unit', ''),
+                group=entry.get('group', ''),
+                synonyms=tuple(entry.get('synonyms', [])),
+                rules=rules,
+                model_fields=tuple(entry.get('model_fields', []))
+            ))
+        return cls(analytes)
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike] = DEFAULT_CATALOG_PATH) -> 'AnalyteCatalog':
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.analytes
+
+    def __getitem__(self, name: str) -> Analyte:
+        return self.analytes[name]
+
+    def __iter__(self):
+        return iter(self.analytes.values())
+
+    def __len__(self) -> int:
+        return len(self.analytes)
+
+    def find(self, name: str) -> Optional[str]:
+        """Standard analyte name for a name as printed on a report, or None"""
+        return self.synonym_index.find(normalize_parameter_name(name))
+
+    def for_model_field(self, model: str, field: str) -> Optional[Analyte]:
+        """The analyte stored in a nexusapp model field, e.g. ('BloodTestReport', 'wbc_count') -> wbc"""
+        return self._model_fields.get(f'{model}.{field}')
+
+    def range_for(self, name: str, sex=None, age=None) -> ReferenceRange:
+        """Reference range of an analyte for a patient (sex: 'male'/'female'/'m'/'f', age in years)"""
+        table = self.range_table(sex, age)
+        position = table.position.get(name)
+        return table.ranges[position] if position is not None else UNBOUNDED
+
+    def range_table(self, sex=None, age=None) -> RangeTable:
+        """All reference ranges for one patient profile, compiled on first use"""
+        key = (normalize_sex(sex), normalize_age(age))
+        table = self._tables.get(key)
+        if table is None:
+            ranges = [analyte.range_for(*key) for analyte in self]
+            table = self._tables[key] = RangeTable(
+                position={analyte.name: i for i, analyte in enumerate(self)},
+                ranges=ranges,
+                low=np.array([r.low for r in ranges], dtype=float),
+                high=np.array([r.high for r in ranges], dtype=float),
+                low_inclusive=np.array([r.low_inclusive for r in ranges], dtype=bool),
+                high_inclusive=np.array([r.high_inclusive for r in ranges], dtype=bool)
+            )
+        return table
+
+    def evaluate(self, values: Mapping[str, float], sex=None, age=None,
+                 ranges: Optional[Mapping[str, str]] = None) -> Dict[str, RangeCheck]:
+        """
+        Check a panel of results at once.
+
+        Args:
+            values: Result value by analyte name
+            sex, age: Patient profile selecting sex/age-specific ranges
+            ranges: Reference ranges printed on the report, by analyte name; these
+                    take precedence over the catalog's
+
+        Returns:
+            RangeCheck(severity, range) by analyte name
+        """
+        names = list(values)
+        if not names:
+            return {}
+        table = self.range_table(sex, age)
+        rows = np.array([table.position.get(name, -1) for name in names])
+        known = rows >= 0
+        rows = np.where(known, rows, 0)
+
+        low, high = table.low[rows], table.high[rows]
+        low_inclusive, high_inclusive = table.low_inclusive[rows], table.high_inclusive[rows]
+        effective = [table.ranges[row] if is_known else UNBOUNDED for row, is_known in zip(rows, known)]
+
+        # Unknown analytes are unbounded unless the report prints a range
+        low[~known], high[~known] = -np.inf, np.inf
+        low_inclusive[~known] = high_inclusive[~known] = True
+        for i, name in enumerate(names):
+            text = (ranges or {}).get(name)
+            if text and text != effective[i].text:
+                override = effective[i] = ReferenceRange.parse(text)
+                low[i], high[i] = override.low, override.high
+                low_inclusive[i], high_inclusive[i] = override.low_inclusive, override.high_inclusive
+
+        severities = _evaluate(np.array([values[name] for name in names], dtype=float),
+                               low, high, low_inclusive, high_inclusive)
+        return {name: RangeCheck(str(severity), range_) for name, severity, range_ in zip(names, severities, effective)}
+
+
+@lru_cache(maxsize=None)
+def default_catalog() -> AnalyteCatalog:
+    """The bundled analyte_catalog.json, loaded once per process"""
+    return AnalyteCatalog.load()
@@ -0,0 +1,72 @@
+"""
+Bounded-concurrency processing of a folder of lab report images.
+
+Each image's work is mostly waiting on the Groq API, so the folder processors
+run several images at once on a thread pool. At most `max_concurrency` are in
+flight at a time, which keeps API concurrency and the memory held by base64
+payloads bounded. Results are yielded as each image completes, and an exception
+in one image becomes that image's error result instead of failing the batch.
+
+The default concurrency comes from LAB_PROCESSING_CONCURRENCY (default 4).
+The shared Groq client's rate limiter still paces the calls.
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+
+
+DEFAULT_CONCURRENCY = 4
+
+Item = TypeVar('Item')
+
+
+def default_concurrency() -> int:
+    return max(1, int(os.getenv('LAB_PROCESSING_CONCURRENCY', DEFAULT_CONCURRENCY)))
+
+
+def process_concurrently(items: Iterable[Item],
+                         process: Callable[[Item], Dict[str, Any]],
+                         on_error: Callable[[Item, Exception], Dict[str, Any]],
+                         max_concurrency: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Run `process` on every item, at most `max_concurrency` at a time.
+
+    Items are drawn from `items` only as workers free up, so it can be a lazy
+    generator. Yields (index, result) in completion order. If `process` raises, the result
+    is on_error(item, exception). When the caller stops iterating early, items
+    that haven't started are cancelled.
+    """
+    max_concurrency = max_concurrency or default_concurrency()
+
+    def timed(item):
+        start = time.time()
+        result = process(item)
+        if isinstance(result.get('processing_info'), dict):
+            result['processing_info']['processing_time'] = time.time() - start
+        return result
+
+    executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='lab-processing')
+    try:
+        # Submit only as many as can run, so pending work (and its payloads) stays bounded
+        remaining = iter(enumerate(items))
+        in_flight = {}
+        for index, item in remaining:
+            in_flight[executor.submit(timed, item)] = (index, item)
+            if len(in_flight) >= max_concurrency:
+                break
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, item = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = on_error(item, e)
+                next_item = next(remaining, None)
+                if next_item is not None:
+                    in_flight[executor.submit(timed, next_item[1])] = next_item
+                yield index, result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
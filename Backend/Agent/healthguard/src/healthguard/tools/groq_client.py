@@ -0,0 +1,319 @@
+"""
+Shared Groq chat-completions client for the lab analysis tools.
+
+All processors share one GroqClient per process (get_groq_client()):
+- A requests.Session keeps a pool of keep-alive connections to the API, so
+  each call skips the TCP/TLS handshake.
+- A token-bucket limiter paces requests and tokens per minute. After every
+  response it is re-synced from Groq's x-ratelimit-* headers, and a 429's
+  retry-after pauses every caller, not just the one that was rejected.
+- Failed calls (429, 5xx, connection errors, connect timeouts) are retried
+  with exponential backoff and full jitter. A read timeout is not retried:
+  the server may still be generating (and billing) that completion. The read
+  timeout is 120 s, what the processors used before sharing this client.
+- achat_completion() is an async variant for asyncio callers. The HTTP call
+  runs on the client's thread pool, while waiting for the limiter and the
+  backoff never blocks the event loop.
+
+Set GROQ_BASE_URL to point the client at another server, e.g. the local
+stub in groq_stub_server.py.
+"""
+
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+# Status codes worth retrying: rate limited, or a transient server-side failure
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Defaults for the free tier; the limiter adjusts to the real limits from response headers
+DEFAULT_REQUESTS_PER_MINUTE = 30
+DEFAULT_TOKENS_PER_MINUTE = 30000
+
+# Rough prompt-token cost of one image, for pacing before the API reports real usage
+IMAGE_TOKEN_ESTIMATE = 1500
+CHARS_PER_TOKEN = 4
+
+
+class GroqAPIError(Exception):
+    """A Groq API call failed (after retries); status_code is None for network errors"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, body: str = ''):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class GroqTimeout(GroqAPIError):
+    """The request was sent but the API didn't answer within the client's read timeout; never retried"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: holds up to `capacity` tokens, refilled at
+    `capacity` per `period` seconds. Usable from threads (acquire) and
+    asyncio (acquire_async).
+    """
+
+    def __init__(self, capacity: float, period: float = 60):
+        self.capacity = float(capacity)
+        self.period = period
+        self.refill_rate = self.capacity / period
+        self.level = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    def try_acquire(self, amount: float = 1) -> float:
+        """Take `amount` tokens if available and return 0, else return the seconds to wait"""
+        # A request larger than the whole bucket waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            if self.level >= amount:
+                self.level -= amount
+                return 0.0
+            return (amount - self.level) / self.refill_rate if self.refill_rate > 0 else 1.0
+
+    def acquire(self, amount: float = 1):
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, amount: float = 1):
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def sync(self, limit: Optional[float] = None, remaining: Optional[float] = None,
+             reset_seconds: Optional[float] = None):
+        """
+        Align the bucket with the server's view: at most `remaining` tokens now,
+        refilling to `limit` over `reset_seconds`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if limit:
+                self.capacity = float(limit)
+                self.refill_rate = self.capacity / self.period
+            if remaining is not None:
+                # Only ever lower the level: responses of concurrent calls arrive out of
+                # order, and an older, higher `remaining` would hand out tokens twice
+                self.level = min(self.level, self.capacity, float(remaining))
+                if reset_seconds and self.level < self.capacity:
+                    # Refill at whatever pace gets back to full when the server says it resets
+                    self.refill_rate = (self.capacity - self.level) / reset_seconds
+
+    def pause(self, seconds: float):
+        """Hand out nothing for `seconds` (e.g. after a 429 with retry-after)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Groq reset header ('2m59.56s', '7.66s', '340ms') or a bare number"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets, kept in sync with Groq's rate-limit headers"""
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def acquire(self, tokens: float):
+        self.requests.acquire(1)
+        self.tokens.acquire(tokens)
+
+    async def acquire_async(self, tokens: float):
+        await self.requests.acquire_async(1)
+        await self.tokens.acquire_async(tokens)
+
+    def update(self, headers: Mapping[str, str]):
+        """Re-sync from x-ratelimit-* headers (tokens are per minute, requests per day)"""
+        self.tokens.sync(
+            limit=_header_number(headers, 'x-ratelimit-limit-tokens'),
+            remaining=_header_number(headers, 'x-ratelimit-remaining-tokens'),
+            reset_seconds=parse_duration(headers.get('x-ratelimit-reset-tokens'))
+        )
+        # The request quota is daily: only act on it once it is used up
+        if _header_number(headers, 'x-ratelimit-remaining-requests') == 0:
+            self.requests.pause(parse_duration(headers.get('x-ratelimit-reset-requests')) or 60)
+
+    def pause(self, seconds: float):
+        self.requests.pause(seconds)
+
+
+def estimate_tokens(payload: Mapping[str, Any]) -> int:
+    """Upper-bound token cost of a chat completion: prompt text, images, and max_tokens"""
+    prompt_chars, images = 0, 0
+    for message in payload.get('messages', []):
+        content = message.get('content', '')
+        if isinstance(content, str):
+            prompt_chars += len(content)
+            continue
+        for part in content:
+            if part.get('type') == 'image_url':
+                images += 1
+            else:
+                prompt_chars += len(part.get('text', ''))
+    return prompt_chars // CHARS_PER_TOKEN + images * IMAGE_TOKEN_ESTIMATE + payload.get('max_tokens', 1024)
+
+
+class GroqClient:
+    """Pooled, rate-limited, retrying client for Groq's OpenAI-compatible chat completions API"""
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 timeout: Union[float, Tuple[float, float]] = (10, 120), max_retries: int = 4,
+                 pool_size: int = 16, backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 limiter: Optional[RateLimiter] = None):
+        self.api_key = api_key or os.getenv('GROQ_API_KEY')
+        self.base_url = (base_url or os.getenv('GROQ_BASE_URL') or GROQ_BASE_URL).rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = limiter or RateLimiter(
+            requests_per_minute=float(os.getenv('GROQ_REQUESTS_PER_MINUTE', DEFAULT_REQUESTS_PER_MINUTE)),
+            tokens_per_minute=float(os.getenv('GROQ_TOKENS_PER_MINUTE', DEFAULT_TOKENS_PER_MINUTE))
+        )
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='groq-client')
+
+    @property
+    def chat_completions_url(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    def chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a chat completion and return the decoded response; raises GroqAPIError"""
+        tokens = estimate_tokens(payload)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                return self._post(payload)
+            except GroqAPIError as e:
+                time.sleep(self._retry_delay(e, attempt))
+
+    async def achat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Async chat_completion(): limiter and backoff waits yield to the event loop"""
+        loop = asyncio.get_running_loop()
+        tokens = estimate_tokens(payload)
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire_async(tokens)
+            try:
+                return await loop.run_in_executor(self._executor, self._post, payload)
+            except GroqAPIError as e:
+                await asyncio.sleep(self._retry_delay(e, attempt))
+
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """One attempt; re-syncs the limiter from the response headers"""
+        if not self.api_key:
+            raise GroqAPIError("GROQ_API_KEY environment variable not set")
+        try:
+            response = self.session.post(
+                self.chat_completions_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json=payload,
+                timeout=self.timeout
+            )
+        except requests.exceptions.ConnectTimeout as e:
+            # Nothing reached the server: safe to retry
+            raise GroqAPIError(f"Connection timed out: {e}") from e
+        except requests.exceptions.Timeout as e:
+            raise GroqTimeout(f"Request timed out: {e}") from e
+        except requests.exceptions.RequestException as e:
+            raise GroqAPIError(f"Request failed: {e}") from e
+
+        self.limiter.update(response.headers)
+        if response.status_code == 429:
+            # Everyone waits, not only this caller
+            self.limiter.pause(parse_duration(response.headers.get('retry-after')) or 1.0)
+        if response.status_code != 200:
+            raise GroqAPIError(
+                f"Groq API Error: {response.status_code} - {response.text}",
+                status_code=response.status_code,
+                body=response.text
+            )
+        try:
+            return response.json()
+        except ValueError as e:
+            raise GroqAPIError(f"Invalid JSON in Groq response: {e}", status_code=response.status_code, body=response.text)
+
+    def _retry_delay(self, error: GroqAPIError, attempt: int) -> float:
+        """Backoff before the next attempt, or re-raise if the error is final"""
+        if isinstance(error, GroqTimeout):
+            # The completion may still be running server-side; re-sending it would be billed again
+            raise error
+        retryable = error.status_code is None or error.status_code in RETRYABLE_STATUS_CODES
+        if not retryable or not self.api_key or attempt >= self.max_retries:
+            raise error
+        # Exponential backoff with full jitter, so parallel callers don't retry in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_groq_client() -> GroqClient:
+    """The process-wide client, created on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GroqClient()
+    return _client
+
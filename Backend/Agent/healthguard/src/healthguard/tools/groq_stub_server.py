@@ -0,0 +1,200 @@
+"""
+Local stand-in for Groq's chat completions endpoint, for tests and load checks.
+
+GroqStubServer answers POST /openai/v1/chat/completions with a canned
+completion after a configurable latency. It enforces its own requests- and
+tokens-per-minute quota, sending Groq-style x-ratelimit-* headers and 429s
+with retry-after. Checks can shorten the quota `window` to run faster. It can
+also fail the first N calls with 503. It counts what it saw: requests, 429s,
+peak concurrency and client connections.
+
+    with GroqStubServer(tokens_per_minute=6000) as stub:
+        client = GroqClient(api_key='test', base_url=stub.base_url)
+        client.chat_completion({...})
+
+Or run it standalone and point the tools at it:
+
+    python groq_stub_server.py --port 8765
+    GROQ_BASE_URL=http://127.0.0.1:8765/openai/v1 GROQ_API_KEY=test python ...
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_CONTENT = json.dumps({
+    "lab_test_name": "Complete Blood Count",
+    "lab_results": {"hemoglobin": {"value": 13.5, "unit": "g/dL", "reference_range": "12.0-16.0"}},
+    "interpretation_summary": "All parameters are within normal limits."
+})
+
+
+class GroqStubServer:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.05, requests_per_minute=1000,
+                 tokens_per_minute=100000, tokens_per_request=500, fail_first=0, window=60,
+                 content=DEFAULT_CONTENT):
+        self.latency = latency
+        self.window = window
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.tokens_per_request = tokens_per_request
+        self.fail_first = fail_first
+        self.content = content
+
+        self.requests = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = set()
+        self._updated = time.monotonic()
+        self._request_budget = requests_per_minute
+        self._token_budget = tokens_per_minute
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/openai/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='groq-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _admit(self):
+        """Count a request against the quota; returns (status, headers)"""
+        with self._lock:
+            self.requests += 1
+            if self.requests <= self.fail_first:
+                return 503, {}
+
+            # Like Groq, the quota replenishes continuously: the full limit over one window
+            now = time.monotonic()
+            elapsed, self._updated = now - self._updated, now
+            self._request_budget = min(self.requests_per_minute,
+                                       self._request_budget + elapsed * self.requests_per_minute / self.window)
+            self._token_budget = min(self.tokens_per_minute,
+                                     self._token_budget + elapsed * self.tokens_per_minute / self.window)
+
+            over_quota = self._request_budget < 1 or self._token_budget < self.tokens_per_request
+            if not over_quota:
+                self._request_budget -= 1
+                self._token_budget -= self.tokens_per_request
+            headers = {
+                'x-ratelimit-limit-requests': str(self.requests_per_minute),
+                'x-ratelimit-remaining-requests': str(int(self._request_budget)),
+                'x-ratelimit-reset-requests': self._seconds_until(self._request_budget, self.requests_per_minute, self.requests_per_minute),
+                'x-ratelimit-limit-tokens': str(self.tokens_per_minute),
+                'x-ratelimit-remaining-tokens': str(int(self._token_budget)),
+                'x-ratelimit-reset-tokens': self._seconds_until(self._token_budget, self.tokens_per_minute, self.tokens_per_minute),
+            }
+            if over_quota:
+                self.rate_limited += 1
+                headers['retry-after'] = self._seconds_until(self._token_budget, self.tokens_per_request, self.tokens_per_minute)[:-1]
+                return 429, headers
+            return 200, headers
+
+    def _seconds_until(self, budget, needed, limit):
+        """Groq-style duration ('1.25s') until `budget` has refilled to `needed`"""
+        return f"{max(0.0, needed - budget) * self.window / limit:.2f}s"
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with stub._lock:
+                    stub.connections.add(self.client_address)
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    if not self.path.endswith('/chat/completions'):
+                        return self._reply(404, {"error": {"message": "Unknown endpoint"}})
+                    if not self.headers.get('Authorization', '').startswith('Bearer '):
+                        return self._reply(401, {"error": {"message": "Invalid API Key"}})
+
+                    status, headers = stub._admit()
+                    if status == 429:
+                        return self._reply(429, {"error": {"message": "Rate limit reached", "type": "tokens"}}, headers)
+                    if status != 200:
+                        return self._reply(status, {"error": {"message": "Service unavailable"}}, headers)
+
+                    time.sleep(stub.latency)
+                    payload = json.loads(body or b'{}')
+                    self._reply(200, {
+                        "id": f"chatcmpl-stub-{stub.requests}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": payload.get('model', 'stub'),
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": stub.content},
+                            "finish_reason": "stop"
+                        }],
+                        "usage": {
+                            "prompt_tokens": stub.tokens_per_request // 2,
+                            "completion_tokens": stub.tokens_per_request - stub.tokens_per_request // 2,
+                            "total_tokens": stub.tokens_per_request
+                        }
+                    }, headers)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _reply(self, status, data, headers=None):
+                encoded = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(encoded)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(encoded)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local Groq chat completions stub")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds per completion")
+    parser.add_argument('--rpm', type=int, default=30, help="Requests per minute before 429s")
+    parser.add_argument('--tpm', type=int, default=30000, help="Tokens per minute before 429s")
+    args = parser.parse_args()
+
+    stub = GroqStubServer(port=args.port, latency=args.latency,
+                          requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    print(f"Groq stub listening on {stub.base_url} (Ctrl-C to stop)")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,27 @@ import json
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-import requests
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from crewai_tools import BaseTool
 from PIL import Image
 import io
 
+try:
+    from .analysis_cache import file_sha256, get_analysis_cache
+    from .concurrent_processing import default_concurrency, process_concurrently
+    from .groq_client import GroqAPIError, get_groq_client
+    from .image_upload import prepare_image_for_upload, upload_settings
+    from .pdf_ingestion import PdfPage, iter_pdf_pages, merge_page_analyses, rasterize_page
+except ImportError:
+    from analysis_cache import file_sha256, get_analysis_cache
+    from concurrent_processing import default_concurrency, process_concurrently
+    from groq_client import GroqAPIError, get_groq_client
+    from image_upload import prepare_image_for_upload, upload_settings
+    from pdf_ingestion import PdfPage, iter_pdf_pages, merge_page_analyses, rasterize_page
+
+# Bump when the prompts or the response structure change, so cached analyses aren't reused
+PROMPT_VERSION = "vision-v2"
+
 class GroqVisionProcessor(BaseTool):
     name: str = "Groq Vision Lab Report Processor"
     description: str = """
@@ -17,12 +32,12 @@ class GroqVisionProcessor(BaseTool):
     
     This tool:
     1. Scans the images folder for lab report images
-    2. Converts images to base64 encoding for API transmission
+    2. Orients, crops and downscales images, then base64-encodes them for API transmission
     3. Sends images to Groq's vision models for AI-powered analysis
     4. Extracts comprehensive medical data from lab reports
     5. Returns structured JSON with all findings and AI insights
     
-    Supports multiple image formats: JPG, JPEG, PNG, PDF (first page)
+    Supports multiple image formats: JPG, JPEG, PNG, PDF (all pages; the text layer is used when present)
     Uses Groq models: llama-3.2-90b-vision-preview, llava-v1.5-7b-4096-preview
     """
     
@@ -31,14 +46,17 @@ class GroqVisionProcessor(BaseTool):
         self.groq_api_key = os.getenv('GROQ_API_KEY')
         self.images_folder = Path("c:/Users/MALAVIKA/Documents/GitHub/Nexus-Hackbattle/Backend/Agent/images")
         self.supported_formats = {'.jpg', '.jpeg', '.png', '.pdf'}
-        self.groq_base_url = "https://api.groq.com/openai/v1/chat/completions"
+        self.groq_model = "llama-3.2-90b-vision-preview"
+        self.analysis_cache = get_analysis_cache()
+        self.max_concurrency = default_concurrency()
         
-    def _run(self, image_path: Optional[str] = None) -> Dict[str, Any]:
+    def _run(self, image_path: Optional[str] = None, max_concurrency: Optional[int] = None) -> Dict[str, Any]:
         """
         Process lab report images using Groq vision AI.
         
         Args:
             image_path: Optional specific image path. If None, processes all images in folder.
+            max_concurrency: Images processed at once (default: LAB_PROCESSING_CONCURRENCY or 4)
             
         Returns:
             Dict containing comprehensive lab analysis results
@@ -59,18 +77,10 @@ class GroqVisionProcessor(BaseTool):
                     "supported_formats": list(self.supported_formats)
                 }
             
-            results = []
-            
-            for image_path in images_to_process:
-                try:
-                    # Process single image
-                    result = self._process_single_image(image_path)
-                    results.append(result)
-                except Exception as e:
-                    results.append({
-                        "error": f"Failed to process {image_path.name}: {str(e)}",
-                        "image_path": str(image_path)
-                    })
+            # Images run concurrently; results keep the folder order
+            results = [None] * len(images_to_process)
+            for index, result in self._process_images(images_to_process, max_concurrency):
+                results[index] = result
             
             processing_time = time.time() - start_time
             
@@ -79,6 +89,7 @@ class GroqVisionProcessor(BaseTool):
                     "total_images": len(images_to_process),
                     "successful_processing": len([r for r in results if "error" not in r]),
                     "failed_processing": len([r for r in results if "error" in r]),
+                    "cache_hits": len([r for r in results if r.get("processing_info", {}).get("cache_hit")]),
                     "total_processing_time": processing_time,
                     "timestamp": datetime.now().isoformat()
                 },
@@ -92,6 +103,32 @@ class GroqVisionProcessor(BaseTool):
                 "timestamp": datetime.now().isoformat()
             }
     
+    def iter_process_images(self, image_path: Optional[str] = None,
+                            max_concurrency: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Like _run, but yields each image's result as soon as it completes
+        (in completion order) instead of returning them all at the end.
+        """
+        images_to_process = [Path(image_path)] if image_path else self._scan_images_folder()
+        for _, result in self._process_images(images_to_process, max_concurrency):
+            yield result
+    
+    def _process_images(self, images: List[Path], max_concurrency: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(index, result) per image as each completes; a failing image yields an error result"""
+        max_concurrency = max_concurrency or self.max_concurrency
+        # PDFs fan out over their pages too: split the budget so images x pages stays within max_concurrency
+        page_concurrency = max(1, max_concurrency // max(1, min(len(images), max_concurrency)))
+        return process_concurrently(
+            images, lambda image_path: self._process_single_image(image_path, page_concurrency), self._image_error,
+            max_concurrency=max_concurrency
+        )
+    
+    def _image_error(self, image_path: Path, error: Exception) -> Dict[str, Any]:
+        return {
+            "error": f"Failed to process {image_path.name}: {str(error)}",
+            "image_path": str(image_path)
+        }
+    
     def _scan_images_folder(self) -> List[Path]:
         """Scan images folder for lab report images"""
         if not self.images_folder.exists():
@@ -104,41 +141,49 @@ class GroqVisionProcessor(BaseTool):
         
         return sorted(images)
     
-    def _process_single_image(self, image_path: Path) -> Dict[str, Any]:
-        """Process a single lab report image with Groq vision AI"""
+    def _process_single_image(self, image_path: Path, page_concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """Process a single lab report image with Groq vision AI (a PDF's pages `page_concurrency` at a time)"""
         
-        # Convert image to base64
-        base64_image, image_info = self._convert_to_base64(image_path)
+        # Unchanged images were analyzed before: reuse the stored result instead of calling the API
+        image_sha256 = file_sha256(image_path)
+        cached_result = self.analysis_cache.get(image_sha256, self.groq_model, PROMPT_VERSION)
+        if cached_result is not None:
+            cached_result["processing_info"].update(image_source=str(image_path), cache_hit=True)
+            return cached_result
         
-        # Prepare Groq API request
-        groq_response = self._call_groq_vision_api(base64_image, image_path.name)
+        if image_path.suffix.lower() == '.pdf':
+            # PDFs are analyzed page by page and merged into one report
+            structured_result = self._process_pdf(image_path, page_concurrency)
+        else:
+            # Convert image to base64
+            base64_image, image_info = self._convert_to_base64(image_path)
+            
+            # Prepare Groq API request
+            groq_response = self._call_groq_vision_api(
+                base64_image, image_path.name, image_info.get('upload', {}).get('mime_type', 'image/jpeg')
+            )
+            
+            # Parse and structure the response
+            structured_result = self._structure_groq_response(
+                groq_response, image_path, image_info
+            )
         
-        # Parse and structure the response
-        structured_result = self._structure_groq_response(
-            groq_response, image_path, image_info
-        )
+        # A PDF with failed pages is retried in full next time rather than cached incomplete
+        if "error" not in structured_result and not structured_result["processing_info"].get("failed_pages"):
+            self.analysis_cache.put(image_sha256, self.groq_model, PROMPT_VERSION, structured_result)
         
         return structured_result
     
     def _convert_to_base64(self, image_path: Path) -> tuple[str, Dict]:
-        """Convert image to base64 with metadata"""
+        """Convert image to base64 with metadata, shrunk to what the model can use"""
         try:
             if image_path.suffix.lower() == '.pdf':
-                # For PDF files, convert first page to image
+                # For PDF files, render the first page to an image
                 return self._convert_pdf_to_base64(image_path)
             else:
-                # For image files
-                with open(image_path, 'rb') as image_file:
-                    image_data = image_file.read()
-                
-                # Get image info
-                with Image.open(image_path) as img:
-                    image_info = {
-                        "format": img.format,
-                        "size": img.size,
-                        "mode": img.mode,
-                        "file_size": len(image_data)
-                    }
+                # For image files: EXIF-orient, crop to the page, downscale and re-encode;
+                # image_info["upload"] records what is sent and the bytes saved
+                image_data, image_info = prepare_image_for_upload(image_path, self.groq_model)
                 
                 base64_encoded = base64.b64encode(image_data).decode('utf-8')
                 
@@ -147,24 +192,109 @@ class GroqVisionProcessor(BaseTool):
         except Exception as e:
             raise Exception(f"Failed to convert image to base64: {str(e)}")
     
-    def _convert_pdf_to_base64(self, pdf_path: Path) -> tuple[str, Dict]:
-        """Convert first page of PDF to base64 image"""
+    def _convert_pdf_to_base64(self, pdf_path: Path, page: Optional[PdfPage] = None) -> tuple[str, Dict]:
+        """Render one PDF page (default: the first) to a base64 image at the model's resolution"""
         try:
-            # This would require pdf2image library
-            # For now, return error for PDF files
-            raise Exception("PDF processing not implemented. Please convert PDF to image format.")
+            if page is None:
+                page = next(iter_pdf_pages(pdf_path), None)
+                if page is None:
+                    raise Exception("PDF has no pages")
+            max_dimension = upload_settings(self.groq_model)[0]
+            image_data, image_info = prepare_image_for_upload(
+                rasterize_page(pdf_path, page, max_dimension), self.groq_model
+            )
+            image_info.update(format="PDF", page=page.number)
+            return base64.b64encode(image_data).decode('utf-8'), image_info
         except Exception as e:
             raise Exception(f"PDF conversion failed: {str(e)}")
     
-    def _call_groq_vision_api(self, base64_image: str, filename: str) -> Dict[str, Any]:
-        """Make API call to Groq vision model"""
+    def _process_pdf(self, pdf_path: Path, max_concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Analyze every page of a PDF and merge them into one structured report.
         
-        if not self.groq_api_key:
-            raise Exception("GROQ_API_KEY environment variable not set")
+        Pages with a text layer are sent as text; only the others are rendered
+        (one at a time, as workers free up) and sent to the vision model. Up to
+        max_concurrency pages (default: self.max_concurrency) run at once, and a
+        failed page is reported (processing_info["failed_pages"]) without failing
+        the rest.
+        """
+        pages = [
+            page_result for _, page_result in process_concurrently(
+                iter_pdf_pages(pdf_path),
+                lambda page: self._process_pdf_page(pdf_path, page),
+                lambda page, e: {"page": page.number, "error": f"Page {page.number}: {str(e)}"},
+                max_concurrency=max_concurrency or self.max_concurrency
+            )
+        ]
+        pages.sort(key=lambda page_result: page_result["page"])
+        analyzed = [page_result for page_result in pages if "error" not in page_result]
+        if not analyzed:
+            raise Exception("; ".join(page_result["error"] for page_result in pages) or "PDF has no pages")
         
-        # Prepare the prompt for lab report analysis
-        system_prompt = """You are an expert medical AI assistant specializing in lab report analysis. 
-        Analyze the provided lab report image and extract ALL visible medical data with high accuracy.
+        ai_data = merge_page_analyses([page_result["ai_data"] for page_result in analyzed])
+        ai_content = "\n\n".join(
+            f"--- Page {page_result['page']} ---\n{page_result['ai_content']}" for page_result in analyzed
+        )
+        usage_info = {
+            key: sum(page_result["usage"].get(key, 0) for page_result in analyzed)
+            for key in ('prompt_tokens', 'completion_tokens', 'total_tokens')
+        }
+        uploads = [page_result["upload"] for page_result in analyzed if page_result.get("upload")]
+        pdf_info = {
+            "format": "PDF",
+            "size": uploads[0]["size"] if uploads else (0, 0),
+            "file_size": pdf_path.stat().st_size,
+            "page_count": len(pages),
+            "upload": {"file_size": sum(upload["file_size"] for upload in uploads)}
+        }
+        
+        structured_result = self._build_structured_response(
+            ai_data, ai_content, usage_info,
+            {"pages": [page_result["groq_response"] for page_result in analyzed]},
+            pdf_path, pdf_info
+        )
+        if "error" not in structured_result:
+            structured_result["pdf_pages"] = [
+                {key: value for key, value in page_result.items() if key not in ('usage', 'ai_data', 'ai_content', 'groq_response')}
+                for page_result in pages
+            ]
+            structured_result["processing_info"]["failed_pages"] = [
+                page_result["page"] for page_result in pages if "error" in page_result
+            ]
+            text_pages = len([page_result for page_result in analyzed if page_result["source"] == "text_layer"])
+            structured_result["processing_notes"].append(
+                f"PDF: {len(pages)} page(s), {text_pages} read from the text layer, "
+                f"{len(analyzed) - text_pages} via vision OCR, {len(pages) - len(analyzed)} failed"
+            )
+        return structured_result
+    
+    def _process_pdf_page(self, pdf_path: Path, page: PdfPage) -> Dict[str, Any]:
+        """Analyze one PDF page: its text layer if it has one, otherwise a rendering of it"""
+        page_name = f"{pdf_path.name}, page {page.number}"
+        upload = None
+        if page.needs_ocr:
+            base64_page, image_info = self._convert_pdf_to_base64(pdf_path, page)
+            upload = image_info["upload"]
+            groq_response = self._call_groq_vision_api(base64_page, page_name, upload["mime_type"])
+        else:
+            groq_response = self._call_groq_text_api(page.text, page_name)
+        
+        ai_content = groq_response.get('choices', [{}])[0].get('message', {}).get('content', '')
+        return {
+            "page": page.number,
+            "source": "vision_ocr" if page.needs_ocr else "text_layer",
+            "tokens": groq_response.get('usage', {}).get('total_tokens', 0),
+            "upload": upload,
+            "usage": groq_response.get('usage', {}),
+            "ai_content": ai_content,
+            "ai_data": self._parse_ai_content(ai_content),
+            "groq_response": groq_response
+        }
+    
+    def _analysis_prompts(self, filename: str, subject: str = "image") -> tuple[str, str]:
+        """System and user prompts for analyzing a lab report `subject` (image or text)"""
+        system_prompt = f"""You are an expert medical AI assistant specializing in lab report analysis. 
+        Analyze the provided lab report {subject} and extract ALL visible medical data with high accuracy.
         
         Focus on:
         1. Patient information (name, age, gender, ID)
@@ -175,7 +305,7 @@ class GroqVisionProcessor(BaseTool):
         
         Provide comprehensive medical insights and recommendations based on the findings."""
         
-        user_prompt = f"""Please analyze this lab report image ({filename}) and extract all medical data.
+        user_prompt = f"""Please analyze this lab report {subject} ({filename}) and extract all medical data.
         
         Return a comprehensive JSON response with:
         - Complete patient demographics
@@ -188,13 +318,19 @@ class GroqVisionProcessor(BaseTool):
         
         Ensure accuracy and completeness in extraction."""
         
-        headers = {
-            "Authorization": f"Bearer {self.groq_api_key}",
-            "Content-Type": "application/json"
-        }
+        return system_prompt, user_prompt
+    
+    def _call_groq_vision_api(self, base64_image: str, filename: str, mime_type: str = "image/jpeg") -> Dict[str, Any]:
+        """Make API call to Groq vision model"""
+        
+        if not self.groq_api_key:
+            raise Exception("GROQ_API_KEY environment variable not set")
+        
+        # Prepare the prompt for lab report analysis
+        system_prompt, user_prompt = self._analysis_prompts(filename)
         
         payload = {
-            "model": "llama-3.2-90b-vision-preview",  # Use the most capable vision model
+            "model": self.groq_model,  # Use the most capable vision model
             "messages": [
                 {
                     "role": "system",
@@ -207,7 +343,7 @@ class GroqVisionProcessor(BaseTool):
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+                                "url": f"data:{mime_type};base64,{base64_image}"
                             }
                         }
                     ]
@@ -218,17 +354,33 @@ class GroqVisionProcessor(BaseTool):
         }
         
         try:
-            response = requests.post(
-                self.groq_base_url,
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
+            # Shared pooled client: rate limiting and retries with backoff
+            return get_groq_client().chat_completion(payload)
             
-            response.raise_for_status()
-            return response.json()
-            
-        except requests.exceptions.RequestException as e:
+        except GroqAPIError as e:
+            raise Exception(f"Groq API call failed: {str(e)}")
+    
+    def _call_groq_text_api(self, text: str, filename: str) -> Dict[str, Any]:
+        """Make API call to the Groq model with a report's extracted text (no image, so no OCR)"""
+        
+        if not self.groq_api_key:
+            raise Exception("GROQ_API_KEY environment variable not set")
+        
+        system_prompt, user_prompt = self._analysis_prompts(filename, subject="text")
+        
+        payload = {
+            "model": self.groq_model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"{user_prompt}\n\nLAB REPORT TEXT:\n{text}"}
+            ],
+            "max_tokens": 4000,
+            "temperature": 0.1
+        }
+        
+        try:
+            return get_groq_client().chat_completion(payload)
+        except GroqAPIError as e:
             raise Exception(f"Groq API call failed: {str(e)}")
     
     def _structure_groq_response(self, groq_response: Dict, image_path: Path, image_info: Dict) -> Dict[str, Any]:
@@ -238,30 +390,46 @@ class GroqVisionProcessor(BaseTool):
             # Extract the AI response content
             ai_content = groq_response.get('choices', [{}])[0].get('message', {}).get('content', '')
             usage_info = groq_response.get('usage', {})
-            
-            # Try to parse AI response as JSON, fallback to text analysis
-            try:
-                # If AI returned structured JSON
-                if ai_content.strip().startswith('{'):
-                    ai_data = json.loads(ai_content)
-                else:
-                    # If AI returned text, we need to structure it
-                    ai_data = self._parse_text_response(ai_content)
-            except json.JSONDecodeError:
-                ai_data = self._parse_text_response(ai_content)
-            
+            ai_data = self._parse_ai_content(ai_content)
+        except Exception as e:
+            return {
+                "error": f"Failed to structure Groq response: {str(e)}",
+                "raw_response": str(groq_response),
+                "image_path": str(image_path)
+            }
+        
+        return self._build_structured_response(ai_data, ai_content, usage_info, groq_response, image_path, image_info)
+    
+    def _parse_ai_content(self, ai_content: str) -> Dict[str, Any]:
+        """Parse the AI response as JSON, falling back to text analysis"""
+        try:
+            # If AI returned structured JSON
+            if ai_content.strip().startswith('{'):
+                return json.loads(ai_content)
+            # If AI returned text, we need to structure it
+            return self._parse_text_response(ai_content)
+        except json.JSONDecodeError:
+            return self._parse_text_response(ai_content)
+    
+    def _build_structured_response(self, ai_data: Dict, ai_content: str, usage_info: Dict,
+                                   groq_response: Dict, image_path: Path, image_info: Dict) -> Dict[str, Any]:
+        """The structured result for a parsed analysis"""
+        
+        try:
             # Create comprehensive structured response
             structured_response = {
                 "processing_info": {
                     "image_source": str(image_path),
-                    "groq_model": "llama-3.2-90b-vision-preview",
-                    "base64_size": image_info.get('file_size', 0),
+                    "groq_model": self.groq_model,
+                    "base64_size": image_info.get('upload', {}).get('file_size', image_info.get('file_size', 0)),
+                    "upload_optimization": image_info.get('upload', {}),
                     "processing_time": 0.0,  # Will be updated by caller
-                    "api_response_tokens": usage_info.get('total_tokens', 0)
+                    "api_response_tokens": usage_info.get('total_tokens', 0),
+                    "cache_hit": False
                 },
                 **self._extract_medical_data(ai_data, ai_content),
                 "groq_processing_details": {
-                    "model_used": "llama-3.2-90b-vision-preview",
+                    "model_used": self.groq_model,
                     "tokens_consumed": usage_info.get('total_tokens', 0),
                     "prompt_tokens": usage_info.get('prompt_tokens', 0),
                     "completion_tokens": usage_info.get('completion_tokens', 0),
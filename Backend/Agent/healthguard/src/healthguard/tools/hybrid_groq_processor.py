@@ -1,12 +1,18 @@
 import os
 import json
 import time
-import requests
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from crewai_tools import BaseTool
 
+try:
+    from .concurrent_processing import default_concurrency, process_concurrently
+    from .groq_client import GroqAPIError, get_groq_client
+except ImportError:
+    from concurrent_processing import default_concurrency, process_concurrently
+    from groq_client import GroqAPIError, get_groq_client
+
 # Basic OCR placeholder (can be enhanced with real OCR libraries)
 try:
     from PIL import Image
@@ -35,15 +41,16 @@ class HybridGroqLabProcessor(BaseTool):
         self.groq_api_key = os.getenv('GROQ_API_KEY')
         self.images_folder = Path("c:/Users/MALAVIKA/Documents/GitHub/Nexus-Hackbattle/Backend/Agent/images")
         self.supported_formats = {'.jpg', '.jpeg', '.png'}
-        self.groq_base_url = "https://api.groq.com/openai/v1/chat/completions"
         self.groq_model = "meta-llama/llama-4-scout-17b-16e-instruct"
+        self.max_concurrency = default_concurrency()
         
-    def _run(self, image_path: Optional[str] = None) -> Dict[str, Any]:
+    def _run(self, image_path: Optional[str] = None, max_concurrency: Optional[int] = None) -> Dict[str, Any]:
         """
         Process lab report images using hybrid OCR + Groq analysis.
         
         Args:
             image_path: Optional specific image path. If None, processes all images in folder.
+            max_concurrency: Images processed at once (default: LAB_PROCESSING_CONCURRENCY or 4)
             
         Returns:
             Dict containing comprehensive lab analysis results
@@ -64,18 +71,10 @@ class HybridGroqLabProcessor(BaseTool):
                     "supported_formats": list(self.supported_formats)
                 }
             
-            results = []
-            
-            for image_path in images_to_process:
-                try:
-                    # Process single image with hybrid approach
-                    result = self._process_single_image_hybrid(image_path)
-                    results.append(result)
-                except Exception as e:
-                    results.append({
-                        "error": f"Failed to process {image_path.name}: {str(e)}",
-                        "image_path": str(image_path)
-                    })
+            # Images run concurrently; results keep the folder order
+            results = [None] * len(images_to_process)
+            for index, result in self._process_images(images_to_process, max_concurrency):
+                results[index] = result
             
             processing_time = time.time() - start_time
             
@@ -99,6 +98,29 @@ class HybridGroqLabProcessor(BaseTool):
                 "timestamp": datetime.now().isoformat()
             }
     
+    def iter_process_images(self, image_path: Optional[str] = None,
+                            max_concurrency: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Like _run, but yields each image's result as soon as it completes
+        (in completion order) instead of returning them all at the end.
+        """
+        images_to_process = [Path(image_path)] if image_path else self._scan_images_folder()
+        for _, result in self._process_images(images_to_process, max_concurrency):
+            yield result
+    
+    def _process_images(self, images: List[Path], max_concurrency: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(index, result) per image as each completes; a failing image yields an error result"""
+        return process_concurrently(
+            images, self._process_single_image_hybrid, self._image_error,
+            max_concurrency=max_concurrency or self.max_concurrency
+        )
+    
+    def _image_error(self, image_path: Path, error: Exception) -> Dict[str, Any]:
+        return {
+            "error": f"Failed to process {image_path.name}: {str(error)}",
+            "image_path": str(image_path)
+        }
+    
     def _scan_images_folder(self) -> List[Path]:
         """Scan images folder for lab report images"""
         if not self.images_folder.exists():
@@ -229,11 +251,6 @@ Return your analysis in this EXACT JSON format:
 
 Focus on accuracy and provide detailed clinical interpretations."""
 
-        headers = {
-            "Authorization": f"Bearer {self.groq_api_key}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "model": self.groq_model,
             "messages": [
@@ -256,17 +273,10 @@ Please be thorough and accurate in your analysis."""
         }
         
         try:
-            response = requests.post(
-                self.groq_base_url,
-                headers=headers,
-                json=payload,
-                timeout=120
-            )
-            
-            response.raise_for_status()
-            return response.json()
+            # Shared pooled client: rate limiting and retries with backoff
+            return get_groq_client().chat_completion(payload)
             
-        except requests.exceptions.RequestException as e:
+        except GroqAPIError as e:
             raise Exception(f"Groq API call failed: {str(e)}")
     
     def _structure_hybrid_response(self, groq_response: Dict, image_path: Path, extracted_text: str) -> Dict[str, Any]:
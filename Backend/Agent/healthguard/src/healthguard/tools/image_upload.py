@@ -0,0 +1,187 @@
+"""
+Shrinks lab report photos before they are sent to a vision model.
+
+Phone photos of a report are often 4-12 MP and several MB, while the vision
+models tile their input at a much lower resolution and downsample the rest
+away. prepare_image_for_upload:
+
+1. applies the EXIF orientation, so the page is upright;
+2. crops to the sheet of paper when it is photographed on a darker background;
+3. downscales to the model's effective input resolution (never upscales);
+4. re-encodes as JPEG (or WebP).
+
+If none of that changes the image and the re-encoded file would be larger, the
+original bytes are sent unchanged. JPEGs are decoded at reduced scale when
+possible, so large photos are never fully decoded.
+
+Settings (environment):
+    LAB_UPLOAD_MAX_DIMENSION   longest side in pixels (default: per model, else 1568)
+    LAB_UPLOAD_FORMAT          jpeg or webp (default jpeg)
+    LAB_UPLOAD_QUALITY         encoder quality 1-100 (default 85)
+"""
+
+import io
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+
+# Longest side beyond which each model only downsamples (its tile grid)
+MODEL_MAX_DIMENSION = {
+    "llama-3.2-90b-vision-preview": 1120,
+    "llama-3.2-11b-vision-preview": 1120,
+    "meta-llama/llama-4-scout-17b-16e-instruct": 1344,
+    "meta-llama/llama-4-maverick-17b-128e-instruct": 1344,
+}
+DEFAULT_MAX_DIMENSION = 1568
+DEFAULT_FORMAT = "jpeg"
+DEFAULT_QUALITY = 85
+
+UPLOAD_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+ORIGINAL_MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+# Page detection runs on a copy this size; it only needs the page outline
+DETECT_DIMENSION = 512
+# The page must cover at least this much of the photo, and cropping must remove at least MIN_CROP_GAIN
+MIN_PAGE_FRACTION = 0.3
+MIN_CROP_GAIN = 0.05
+# Kept around the detected page, as a fraction of its size
+CROP_MARGIN = 0.01
+
+
+def upload_settings(model: Optional[str] = None) -> Tuple[int, str, int]:
+    """(max_dimension, format, quality) for `model`, with environment overrides"""
+    max_dimension = int(os.getenv('LAB_UPLOAD_MAX_DIMENSION') or MODEL_MAX_DIMENSION.get(model, DEFAULT_MAX_DIMENSION))
+    image_format = os.getenv('LAB_UPLOAD_FORMAT', DEFAULT_FORMAT).lower()
+    if image_format not in UPLOAD_FORMATS:
+        raise ValueError(f"LAB_UPLOAD_FORMAT must be one of {', '.join(UPLOAD_FORMATS)}, not {image_format!r}")
+    quality = int(os.getenv('LAB_UPLOAD_QUALITY', DEFAULT_QUALITY))
+    return max_dimension, image_format, quality
+
+
+def find_document_box(image: Image.Image) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Bounding box (left, top, right, bottom) of the sheet of paper in a photo,
+    or None if there is no clear page on a darker background (e.g. a scan).
+    """
+    scale = min(1.0, DETECT_DIMENSION / max(image.size))
+    small = image.convert('L')
+    if scale < 1.0:
+        small = small.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                             Image.BILINEAR)
+    gray = cv2.GaussianBlur(np.asarray(small), (5, 5), 0)
+
+    # Paper is the bright region; closing fills in the printed text
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    kernel_size = max(3, min(gray.shape) // 20)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((kernel_size, kernel_size), np.uint8))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+
+    x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+    area_fraction = (w * h) / (gray.shape[0] * gray.shape[1])
+    if area_fraction < MIN_PAGE_FRACTION or area_fraction > 1 - MIN_CROP_GAIN:
+        return None
+
+    margin_x, margin_y = w * CROP_MARGIN, h * CROP_MARGIN
+    return (max(0, int((x - margin_x) / scale)),
+            max(0, int((y - margin_y) / scale)),
+            min(image.width, int((x + w + margin_x) / scale + 1)),
+            min(image.height, int((y + h + margin_y) / scale + 1)))
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """Grayscale stays grayscale; anything with transparency is composited on white"""
+    if image.mode in ('L', 'RGB'):
+        return image
+    if image.mode in ('1', 'I', 'I;16', 'F'):
+        return image.convert('L')
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def prepare_image_for_upload(image_path: Union[str, os.PathLike, bytes], model: Optional[str] = None,
+                             max_dimension: Optional[int] = None, image_format: Optional[str] = None,
+                             quality: Optional[int] = None) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    The bytes to upload for an image (a file path or encoded image bytes), and its image_info.
+
+    image_info describes the original file (format, size, mode, file_size) and,
+    under "upload", what is sent: its format, size, file_size, mime_type, the
+    steps applied and the bytes saved.
+    """
+    default_dimension, default_format, default_quality = upload_settings(model)
+    max_dimension = max_dimension or default_dimension
+    image_format = (image_format or default_format).lower()
+    quality = quality or default_quality
+
+    original_data = image_path if isinstance(image_path, bytes) else Path(image_path).read_bytes()
+    with Image.open(io.BytesIO(original_data)) as img:
+        image_info = {
+            "format": img.format,
+            "size": img.size,
+            "mode": img.mode,
+            "file_size": len(original_data)
+        }
+        # Let the JPEG decoder scale down by 1/2-1/8 while decoding; keep 2x headroom for the crop
+        if img.format == 'JPEG':
+            img.draft(img.mode, (max_dimension * 2, max_dimension * 2))
+
+        orientation = _exif_orientation(img)
+        image = _flatten(ImageOps.exif_transpose(img))
+
+    steps = []
+    if orientation not in (None, 1):
+        steps.append("exif_orientation")
+
+    box = find_document_box(image)
+    if box is not None:
+        image = image.crop(box)
+        steps.append("document_crop")
+
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS, reducing_gap=3.0)
+        steps.append("downscale")
+
+    pil_format, mime_type = UPLOAD_FORMATS[image_format]
+    buffer = io.BytesIO()
+    if pil_format == 'JPEG':
+        image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, 'WEBP', quality=quality, method=4)
+    data = buffer.getvalue()
+    steps.append("reencode")
+
+    # Nothing to gain: send the file as it is
+    if (len(data) >= len(original_data) and steps == ["reencode"]
+            and image_info["format"] in ORIGINAL_MIME_TYPES):
+        data, mime_type, steps = original_data, ORIGINAL_MIME_TYPES[image_info["format"]], []
+        pil_format = image_info["format"]
+
+    image_info["upload"] = {
+        "format": pil_format,
+        "size": image.size if steps else image_info["size"],
+        "file_size": len(data),
+        "mime_type": mime_type,
+        "steps": steps,
+        "bytes_saved": len(original_data) - len(data),
+        "size_reduction": round(1 - len(data) / len(original_data), 3) if original_data else 0.0
+    }
+    return data, image_info
+
+
+def _exif_orientation(image: Image.Image) -> Optional[int]:
+    try:
+        return image.getexif().get(0x0112)
+    except Exception:
+        return None
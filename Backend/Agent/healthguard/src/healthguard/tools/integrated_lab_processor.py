@@ -165,12 +165,8 @@ class IntegratedLabReportTool:
             }
         
         try:
-            # Remove data URL prefix if present
-            if base64_string.startswith('data:image'):
-                base64_string = base64_string.split(',')[1]
-            
-            # Process the base64 image
-            result = process_base64_image(base64_string)
+            # Process the base64 image in memory, reusing this tool's processor
+            result = process_base64_image(base64_string, processor=self.processor)
             
             if result.get('error'):
                 return {
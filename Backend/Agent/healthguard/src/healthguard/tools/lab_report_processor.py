@@ -7,13 +7,115 @@ import cv2
 import numpy as np
 import pytesseract
 import re
-from PIL import Image, ImageEnhance, ImageFilter
-from typing import Dict, List, Tuple, Any, Optional
+from PIL import Image
+from typing import Callable, Dict, List, Tuple, Any, Optional, Union
+import os
 import json
 from datetime import datetime
 import base64
 import io
 
+try:
+    from .analyte_catalog import AnalyteCatalog, ReferenceRange, SynonymIndex, default_catalog, normalize_parameter_name
+except ImportError:
+    from analyte_catalog import AnalyteCatalog, ReferenceRange, SynonymIndex, default_catalog, normalize_parameter_name
+
+
+# Anything the processor accepts as an image: a file path, encoded image bytes
+# (bytes / bytearray / memoryview), a binary file-like object, or a decoded
+# OpenCV image array (BGR or grayscale)
+ImageSource = Union[str, os.PathLike, bytes, bytearray, memoryview, np.ndarray, io.IOBase]
+
+# Longest side, in pixels, an image is downscaled to before OCR: a Letter/A4 page
+# at ~300 DPI, where Tesseract is most accurate
+OCR_MAX_DIMENSION = 3300
+
+# Preprocessing parameters
+CONTRAST_FACTOR = 1.5
+SHARPNESS_FACTOR = 2.0
+# PIL's ImageFilter.SMOOTH kernel, the reference image for sharpening
+SMOOTH_KERNEL = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13
+MORPH_KERNEL = np.ones((2, 2), np.uint8)
+
+
+def load_image(image: ImageSource) -> np.ndarray:
+    """
+    Decode an image source into an OpenCV BGR array.
+    Encoded bytes are decoded in memory with cv2.imdecode (no temp files).
+    
+    Args:
+        image: Path, encoded bytes/buffer, file-like object or image array
+        
+    Returns:
+        Image as a BGR numpy array
+    """
+    if isinstance(image, np.ndarray):
+        if image.ndim == 2:
+            return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        if image.ndim == 3 and image.shape[2] == 4:
+            return cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+        return image
+    
+    if isinstance(image, (str, os.PathLike)):
+        img = cv2.imread(os.fspath(image))
+        if img is None:
+            raise ValueError(f"Could not read image from {image}")
+        return img
+    
+    if hasattr(image, 'read'):
+        image = image.read()
+    
+    # Zero-copy view of the encoded bytes for the decoder
+    buffer = np.frombuffer(memoryview(image), dtype=np.uint8)
+    img = cv2.imdecode(buffer, cv2.IMREAD_COLOR) if buffer.size else None
+    if img is None:
+        # Formats OpenCV can't decode (e.g. GIF): fall back to Pillow, still in memory
+        try:
+            with Image.open(io.BytesIO(image)) as pil_img:
+                img = cv2.cvtColor(np.asarray(pil_img.convert('RGB')), cv2.COLOR_RGB2BGR)
+        except Exception:
+            raise ValueError("Could not decode image data")
+    return img
+
+
+# Units, synonyms and reference ranges come from the analyte catalog (analyte_catalog.json)
+_catalog = default_catalog()
+
+# Unit and general reference range by standard parameter name
+COMMON_LAB_PARAMETERS = {
+    analyte.name: {'unit': analyte.unit, 'normal_range': analyte.normal_range} for analyte in _catalog
+}
+
+# Names and abbreviations found on reports, by standard parameter name. Every
+# parameter's own name (with spaces for underscores) is matched as well.
+PARAMETER_SYNONYMS = {analyte.name: list(analyte.synonyms) for analyte in _catalog}
+
+
+def get_synonym_index() -> SynonymIndex:
+    """The synonym index of the default analyte catalog"""
+    return default_catalog().synonym_index
+
+
+# Lines that are headers / patient details rather than results
+SKIP_LINE_RE = re.compile(r'patient|hospital|laboratory|report|date', re.IGNORECASE)
+
+# One pass over a result line: "Name[:] value [unit] [(normal: range) | [ref] range]".
+# A unit without "/" (e.g. "pg", "fL") must not be followed by a bare number, which
+# would make it the next parameter's name ("LDL 130 HDL 45").
+_NUMBER = r'\d+(?:\.\d+)?'
+LAB_VALUE_RE = re.compile(rf"""
+    (?P<name>[a-z][a-z0-9 \t]*?)
+    (?:\s*:\s*|\s+)
+    (?P<value>{_NUMBER})
+    (?:\s*(?P<unit>%|[a-zμµ]+/[a-z0-9μµ]+|[a-zμµ]{{1,4}}\b(?!\s*{_NUMBER}(?!\s*[-–]))))?
+    (?:\s*(?:
+        \(\s*(?:normal|ref(?:erence)?)(?:\s+range)?\s*:?\s*(?P<paren_range>[^)]+)\)
+        |
+        (?:(?:normal|ref(?:erence)?)(?:\s+range)?\s*:?\s*)?
+        (?P<range>[<>]=?\s*{_NUMBER}|{_NUMBER}\s*[-–]\s*{_NUMBER})
+    ))?
+""", re.IGNORECASE | re.VERBOSE)
+
 
 class LabReportImageProcessor:
     """
@@ -21,115 +123,96 @@ class LabReportImageProcessor:
     Uses OCR, image preprocessing, and AI text analysis.
     """
     
-    def __init__(self):
-        self.common_lab_parameters = {
-            # Blood Chemistry
-            'glucose': {'unit': 'mg/dL', 'normal_range': '70-100'},
-            'cholesterol': {'unit': 'mg/dL', 'normal_range': '<200'},
-            'hdl': {'unit': 'mg/dL', 'normal_range': '>40'},
-            'ldl': {'unit': 'mg/dL', 'normal_range': '<100'},
-            'triglycerides': {'unit': 'mg/dL', 'normal_range': '<150'},
-            'creatinine': {'unit': 'mg/dL', 'normal_range': '0.6-1.2'},
-            'bun': {'unit': 'mg/dL', 'normal_range': '7-20'},
-            'uric_acid': {'unit': 'mg/dL', 'normal_range': '3.4-7.0'},
-            
-            # Complete Blood Count (CBC)
-            'hemoglobin': {'unit': 'g/dL', 'normal_range': '12.0-16.0'},
-            'hematocrit': {'unit': '%', 'normal_range': '36-46'},
-            'rbc': {'unit': 'million/μL', 'normal_range': '4.2-5.4'},
-            'wbc': {'unit': 'thousand/μL', 'normal_range': '4.5-11.0'},
-            'platelets': {'unit': 'thousand/μL', 'normal_range': '150-450'},
-            'mcv': {'unit': 'fL', 'normal_range': '80-100'},
-            'mch': {'unit': 'pg', 'normal_range': '27-32'},
-            'mchc': {'unit': 'g/dL', 'normal_range': '32-36'},
-            
-            # Liver Function
-            'alt': {'unit': 'U/L', 'normal_range': '7-56'},
-            'ast': {'unit': 'U/L', 'normal_range': '10-40'},
-            'alkaline_phosphatase': {'unit': 'U/L', 'normal_range': '44-147'},
-            'bilirubin_total': {'unit': 'mg/dL', 'normal_range': '0.3-1.2'},
-            'bilirubin_direct': {'unit': 'mg/dL', 'normal_range': '0.0-0.3'},
-            
-            # Thyroid
-            'tsh': {'unit': 'mIU/L', 'normal_range': '0.4-4.0'},
-            't3': {'unit': 'ng/dL', 'normal_range': '80-200'},
-            't4': {'unit': 'μg/dL', 'normal_range': '5.0-12.0'},
-            
-            # Vitamins & Minerals
-            'vitamin_d': {'unit': 'ng/mL', 'normal_range': '30-100'},
-            'vitamin_b12': {'unit': 'pg/mL', 'normal_range': '200-900'},
-            'iron': {'unit': 'μg/dL', 'normal_range': '60-170'},
-            'calcium': {'unit': 'mg/dL', 'normal_range': '8.5-10.5'},
-            'magnesium': {'unit': 'mg/dL', 'normal_range': '1.7-2.2'},
+    def __init__(self, catalog: Optional[AnalyteCatalog] = None):
+        """
+        Args:
+            catalog: Analyte catalog to use (default: the bundled analyte_catalog.json)
+        """
+        self.catalog = catalog or default_catalog()
+        self.common_lab_parameters = COMMON_LAB_PARAMETERS if catalog is None else {
+            analyte.name: {'unit': analyte.unit, 'normal_range': analyte.normal_range} for analyte in self.catalog
         }
+        self.synonym_index = self.catalog.synonym_index
     
-    def preprocess_image(self, image_path: str) -> np.ndarray:
+    def preprocess_image(self, image: ImageSource,
+                         profile: Optional[Callable[[str], None]] = None) -> np.ndarray:
         """
         Preprocess the image for better OCR accuracy.
         
+        The whole pipeline runs on a single-channel OpenCV image: it converts to
+        grayscale first, downscales oversized photos to roughly 300 DPI, then
+        reuses two working buffers (dst=) for contrast, sharpening, blur,
+        thresholding and morphology.
+        
         Args:
-            image_path: Path to the lab report image
+            image: Lab report image (path, encoded bytes, file-like object or array)
+            profile: Optional callback, called with each stage's name as it finishes
+                     (used by benchmark_preprocessing.py)
             
         Returns:
-            Preprocessed image as numpy array
+            Preprocessed (binary) image as numpy array
         """
+        stage = profile or (lambda name: None)
         try:
-            # Read image
-            img = cv2.imread(image_path)
-            if img is None:
-                raise ValueError(f"Could not read image from {image_path}")
-            
-            # Convert to RGB
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            
-            # Convert to PIL Image for advanced processing
-            pil_img = Image.fromarray(img_rgb)
-            
-            # Enhance contrast
-            enhancer = ImageEnhance.Contrast(pil_img)
-            pil_img = enhancer.enhance(1.5)
-            
-            # Enhance sharpness
-            enhancer = ImageEnhance.Sharpness(pil_img)
-            pil_img = enhancer.enhance(2.0)
-            
-            # Convert back to numpy array
-            img_array = np.array(pil_img)
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+            # Read / decode image
+            img = load_image(image)
+            stage('decode')
+            
+            # Convert to grayscale first: every later step works on one channel
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img.copy()
+            del img
+            stage('grayscale')
+            
+            # Downscale oversized phone photos; extra pixels only slow Tesseract down
+            height, width = gray.shape
+            scale = OCR_MAX_DIMENSION / max(height, width)
+            if scale < 1:
+                gray = cv2.resize(gray, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+            stage('downscale')
+            
+            # Enhance contrast (x1.5 around the mean, as PIL's ImageEnhance.Contrast)
+            mean = cv2.mean(gray)[0]
+            cv2.addWeighted(gray, CONTRAST_FACTOR, gray, 0, (1 - CONTRAST_FACTOR) * mean, dst=gray)
+            stage('contrast')
+            
+            # Enhance sharpness (x2 away from a smoothed copy, as PIL's ImageEnhance.Sharpness)
+            work = cv2.filter2D(gray, -1, SMOOTH_KERNEL)
+            cv2.addWeighted(gray, SHARPNESS_FACTOR, work, 1 - SHARPNESS_FACTOR, 0, dst=gray)
+            stage('sharpen')
             
             # Apply Gaussian blur to reduce noise
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+            cv2.GaussianBlur(gray, (5, 5), 0, dst=work)
+            stage('blur')
             
             # Apply adaptive thresholding
-            thresh = cv2.adaptiveThreshold(
-                blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+            cv2.adaptiveThreshold(
+                work, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2, dst=gray
             )
+            stage('threshold')
             
             # Morphological operations to clean up the image
-            kernel = np.ones((2, 2), np.uint8)
-            cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-            cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_OPEN, kernel)
+            cv2.morphologyEx(gray, cv2.MORPH_CLOSE, MORPH_KERNEL, dst=work)
+            cv2.morphologyEx(work, cv2.MORPH_OPEN, MORPH_KERNEL, dst=gray)
+            stage('morphology')
             
-            return cleaned
+            return gray
             
         except Exception as e:
             raise Exception(f"Error preprocessing image: {str(e)}")
     
-    def extract_text_from_image(self, image_path: str) -> str:
+    def extract_text_from_image(self, image: ImageSource) -> str:
         """
         Extract text from lab report image using OCR.
         
         Args:
-            image_path: Path to the lab report image
+            image: Lab report image (path, encoded bytes, file-like object or array)
             
         Returns:
             Extracted text as string
         """
         try:
             # Preprocess image
-            processed_img = self.preprocess_image(image_path)
+            processed_img = self.preprocess_image(image)
             
             # Configure Tesseract for medical text
             custom_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,:;()[]/-<>=+ '
@@ -234,88 +317,39 @@ class LabReportImageProcessor:
                 break
     
     def _extract_lab_values(self, lines: List[str], parsed_data: Dict[str, Any]):
-        """Extract lab values and normal ranges from text lines."""
-        # Common patterns for lab values
-        value_patterns = [
-            # Pattern: Parameter Name    Value    Unit    Normal Range
-            r'([a-zA-Z\s]+?)\s+(\d+\.?\d*)\s*([a-zA-Z/%μ]+)?\s*(?:(?:normal|ref|reference)?\s*:?\s*)?([<>]?\d+\.?\d*\s*[-–]\s*[<>]?\d+\.?\d*|[<>]\d+\.?\d*)',
-            
-            # Pattern: Parameter: Value Unit (Normal: range)
-            r'([a-zA-Z\s]+?):\s*(\d+\.?\d*)\s*([a-zA-Z/%μ]+)?\s*\((?:normal|ref):\s*([^)]+)\)',
-            
-            # Pattern: Parameter Value Unit Normal Range
-            r'([a-zA-Z\s]+?)\s+(\d+\.?\d*)\s+([a-zA-Z/%μ]+)\s+([<>]?\d+\.?\d*\s*[-–]\s*[<>]?\d+\.?\d*)',
-            
-            # Simple pattern: Parameter Value
-            r'([a-zA-Z\s]+?)\s+(\d+\.?\d*)\s*([a-zA-Z/%μ]+)?',
-        ]
+        """
+        Extract lab values and normal ranges from text lines.
+        Each line is scanned once by LAB_VALUE_RE and names are resolved through
+        the synonym index, so parsing is linear in the length of the text.
+        """
+        # Default ranges follow the patient's sex and age, where the report gives them
+        patient_info = parsed_data.get('patient_info', {})
+        sex, age = patient_info.get('gender'), patient_info.get('age')
         
         for line in lines:
             # Skip header lines and non-data lines
-            if any(skip_word in line.lower() for skip_word in ['patient', 'hospital', 'laboratory', 'report', 'date']):
+            if SKIP_LINE_RE.search(line):
                 continue
             
-            for pattern in value_patterns:
-                matches = re.finditer(pattern, line, re.IGNORECASE)
-                for match in matches:
-                    param_name = match.group(1).strip().lower()
-                    param_value = match.group(2)
-                    param_unit = match.group(3) if len(match.groups()) > 2 and match.group(3) else ''
-                    normal_range = match.group(4) if len(match.groups()) > 3 and match.group(4) else ''
-                    
-                    # Clean parameter name
-                    param_name = re.sub(r'[^\w\s]', '', param_name).strip()
-                    param_name = re.sub(r'\s+', '_', param_name)
-                    
-                    if len(param_name) > 2 and param_value:
-                        # Try to match with known parameters
-                        matched_param = self._match_parameter(param_name)
-                        if matched_param:
-                            parsed_data['lab_results'][matched_param] = {
-                                'value': float(param_value),
-                                'unit': param_unit or self.common_lab_parameters[matched_param]['unit'],
-                                'raw_name': match.group(1).strip()
-                            }
-                            
-                            if normal_range:
-                                parsed_data['lab_normal_ranges'][matched_param] = normal_range
-                            else:
-                                parsed_data['lab_normal_ranges'][matched_param] = self.common_lab_parameters[matched_param]['normal_range']
+            for match in LAB_VALUE_RE.finditer(line):
+                matched_param = self.synonym_index.find(normalize_parameter_name(match.group('name')))
+                if not matched_param:
+                    continue
+                
+                parsed_data['lab_results'][matched_param] = {
+                    'value': float(match.group('value')),
+                    'unit': match.group('unit') or self.catalog[matched_param].unit,
+                    'raw_name': match.group('name').strip()
+                }
+                # The report's own reference range when printed, else the catalog's
+                normal_range = match.group('range') or match.group('paren_range')
+                parsed_data['lab_normal_ranges'][matched_param] = (
+                    normal_range.strip() if normal_range else self.catalog.range_for(matched_param, sex, age).text
+                )
     
     def _match_parameter(self, param_name: str) -> Optional[str]:
         """Match extracted parameter name with known lab parameters."""
-        param_name = param_name.lower().replace('_', ' ')
-        
-        # Direct matches
-        if param_name in self.common_lab_parameters:
-            return param_name
-        
-        # Fuzzy matching with common abbreviations and variations
-        matches = {
-            'glucose': ['glucose', 'blood glucose', 'fasting glucose', 'random glucose'],
-            'cholesterol': ['cholesterol', 'total cholesterol', 'chol'],
-            'hdl': ['hdl', 'hdl cholesterol', 'high density lipoprotein'],
-            'ldl': ['ldl', 'ldl cholesterol', 'low density lipoprotein'],
-            'triglycerides': ['triglycerides', 'tg', 'trigs'],
-            'creatinine': ['creatinine', 'creat', 'cr'],
-            'bun': ['bun', 'blood urea nitrogen', 'urea'],
-            'hemoglobin': ['hemoglobin', 'hgb', 'hb'],
-            'hematocrit': ['hematocrit', 'hct', 'hct'],
-            'rbc': ['rbc', 'red blood cells', 'red blood cell count', 'erythrocytes'],
-            'wbc': ['wbc', 'white blood cells', 'white blood cell count', 'leukocytes'],
-            'platelets': ['platelets', 'plt', 'platelet count'],
-            'alt': ['alt', 'alanine aminotransferase', 'sgpt'],
-            'ast': ['ast', 'aspartate aminotransferase', 'sgot'],
-            'tsh': ['tsh', 'thyroid stimulating hormone'],
-            't3': ['t3', 'triiodothyronine'],
-            't4': ['t4', 'thyroxine'],
-        }
-        
-        for standard_name, variations in matches.items():
-            if any(variation in param_name for variation in variations):
-                return standard_name
-        
-        return None
+        return self.synonym_index.find(normalize_parameter_name(param_name))
     
     def analyze_results(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -338,20 +372,26 @@ class LabReportImageProcessor:
             abnormal_count = 0
             critical_count = 0
             
-            for param, result in parsed_data['lab_results'].items():
-                value = result['value']
-                normal_range = parsed_data['lab_normal_ranges'].get(param, '')
-                
-                # Parse normal range
-                is_abnormal, severity = self._check_abnormal(param, value, normal_range)
+            # Check the whole panel at once against the precompiled reference ranges
+            lab_results = parsed_data['lab_results']
+            patient_info = parsed_data.get('patient_info', {})
+            checks = self.catalog.evaluate(
+                {param: result['value'] for param, result in lab_results.items()},
+                sex=patient_info.get('gender'),
+                age=patient_info.get('age'),
+                ranges=parsed_data['lab_normal_ranges']
+            )
+            
+            for param, result in lab_results.items():
+                severity, normal_range = checks[param]
                 
-                if is_abnormal:
+                if severity != 'normal':
                     abnormal_count += 1
                     if severity == 'critical':
                         critical_count += 1
                     
                     analysis['interpretation_abnormalities'].append(
-                        f"{param.replace('_', ' ').title()}: {value} {result['unit']} (Normal: {normal_range})"
+                        f"{param.replace('_', ' ').title()}: {result['value']} {result['unit']} (Normal: {normal_range.text})"
                     )
             
             # Generate summary
@@ -378,31 +418,8 @@ class LabReportImageProcessor:
     
     def _check_abnormal(self, param: str, value: float, normal_range: str) -> Tuple[bool, str]:
         """Check if a parameter value is abnormal and determine severity."""
-        try:
-            # Parse normal range
-            if '<' in normal_range:
-                max_val = float(re.search(r'<(\d+\.?\d*)', normal_range).group(1))
-                if value >= max_val:
-                    severity = 'critical' if value > max_val * 1.5 else 'abnormal'
-                    return True, severity
-            elif '>' in normal_range:
-                min_val = float(re.search(r'>(\d+\.?\d*)', normal_range).group(1))
-                if value <= min_val:
-                    severity = 'critical' if value < min_val * 0.5 else 'abnormal'
-                    return True, severity
-            elif '-' in normal_range:
-                range_match = re.search(r'(\d+\.?\d*)\s*[-–]\s*(\d+\.?\d*)', normal_range)
-                if range_match:
-                    min_val = float(range_match.group(1))
-                    max_val = float(range_match.group(2))
-                    if value < min_val or value > max_val:
-                        severity = 'critical' if (value < min_val * 0.5 or value > max_val * 1.5) else 'abnormal'
-                        return True, severity
-            
-            return False, 'normal'
-            
-        except Exception:
-            return False, 'normal'
+        severity = ReferenceRange.parse(normal_range).severity(value)
+        return severity != 'normal', severity
     
     def _add_specific_recommendations(self, parsed_data: Dict[str, Any], analysis: Dict[str, Any]):
         """Add specific recommendations based on abnormal lab values."""
@@ -423,19 +440,19 @@ class LabReportImageProcessor:
                 if rec not in analysis['recommendations']:
                     analysis['recommendations'].append(rec)
     
-    def process_lab_report_image(self, image_path: str) -> Dict[str, Any]:
+    def process_lab_report_image(self, image: ImageSource) -> Dict[str, Any]:
         """
         Complete processing pipeline for lab report image.
         
         Args:
-            image_path: Path to the lab report image
+            image: Lab report image (path, encoded bytes, file-like object or array)
             
         Returns:
             Complete processed lab report data
         """
         try:
             # Extract text from image
-            extracted_text = self.extract_text_from_image(image_path)
+            extracted_text = self.extract_text_from_image(image)
             
             # Parse lab parameters
             parsed_data = self.parse_lab_parameters(extracted_text)
@@ -470,38 +487,30 @@ class LabReportImageProcessor:
             }
 
 
-def process_base64_image(base64_string: str, filename: str = "temp_lab_report.jpg") -> Dict[str, Any]:
+def process_base64_image(base64_string: str, filename: str = "temp_lab_report.jpg",
+                         processor: Optional[LabReportImageProcessor] = None) -> Dict[str, Any]:
     """
     Process lab report from base64 encoded image string.
     
     Args:
-        base64_string: Base64 encoded image
-        filename: Temporary filename to use
+        base64_string: Base64 encoded image (optionally a data: URL)
+        filename: Unused; kept for backwards compatibility (images are decoded in memory)
+        processor: Processor to reuse (a new one is created if omitted)
         
     Returns:
         Processed lab report data
     """
     try:
+        # Remove data URL prefix if present
+        if base64_string.startswith('data:'):
+            base64_string = base64_string.split(',', 1)[1]
+        
         # Decode base64 image
         image_data = base64.b64decode(base64_string)
         
-        # Create PIL Image
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Save temporarily
-        temp_path = f"/tmp/{filename}"
-        image.save(temp_path)
-        
-        # Process the image
-        processor = LabReportImageProcessor()
-        result = processor.process_lab_report_image(temp_path)
-        
-        # Clean up temp file
-        import os
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        
-        return result
+        # Process the image straight from memory
+        processor = processor or LabReportImageProcessor()
+        return processor.process_lab_report_image(image_data)
         
     except Exception as e:
         return {
@@ -0,0 +1,142 @@
+"""
+Page-by-page ingestion of PDF lab reports.
+
+Most lab PDFs are generated by the lab's software and carry a text layer, so
+their text can be read directly and no OCR is needed. Only pages without usable
+text (scans, photos saved as PDF) are rasterized for the vision model:
+
+    for page in iter_pdf_pages(path):          # lazy, one page at a time
+        if page.needs_ocr:
+            png = rasterize_page(path, page, max_dimension=1120)
+        else:
+            analyze(page.text)
+
+merge_page_analyses combines the per-page analyses into one report.
+
+PyPDF2 reads the text layer; pdf2image (which needs poppler's pdftoppm)
+rasterizes pages.
+"""
+
+import io
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+try:
+    from PyPDF2 import PdfReader
+    PYPDF2_AVAILABLE = True
+except ImportError:
+    PYPDF2_AVAILABLE = False
+
+try:
+    from pdf2image import convert_from_path
+    PDF2IMAGE_AVAILABLE = True
+except ImportError:
+    PDF2IMAGE_AVAILABLE = False
+
+
+# A page whose text layer has fewer letters/digits than this is treated as scanned
+MIN_TEXT_CHARS = 40
+
+# PDF user space units per inch
+POINTS_PER_INCH = 72
+
+URGENCY_ORDER = ['low', 'medium', 'high', 'critical']
+
+# Free-text fields that are combined across pages rather than taken from the first page
+CONCATENATED_FIELDS = {'interpretation_summary', 'clinical_summary', 'risk_assessment'}
+
+
+@dataclass
+class PdfPage:
+    number: int              # 1-based
+    text: str                # the text layer ('' if none)
+    size: Tuple[float, float]  # width, height in points
+
+    @property
+    def needs_ocr(self) -> bool:
+        return sum(c.isalnum() for c in self.text) < MIN_TEXT_CHARS
+
+
+def iter_pdf_pages(pdf_path: Union[str, Path]) -> Iterator[PdfPage]:
+    """Each page's text layer, read lazily one page at a time"""
+    if not PYPDF2_AVAILABLE:
+        raise ImportError("PyPDF2 is required for PDF lab reports: pip install PyPDF2")
+
+    with open(pdf_path, 'rb') as f:
+        reader = PdfReader(f)
+        if reader.is_encrypted:
+            reader.decrypt('')
+        for index, page in enumerate(reader.pages):
+            try:
+                text = page.extract_text() or ''
+            except Exception:
+                # Broken content streams: fall back to OCR for this page
+                text = ''
+            box = page.mediabox
+            yield PdfPage(index + 1, text.strip(), (float(box.width), float(box.height)))
+
+
+def rasterize_page(pdf_path: Union[str, Path], page: PdfPage, max_dimension: int) -> bytes:
+    """
+    One page rendered as PNG with its longest side about `max_dimension` pixels.
+    Only this page is rendered, so memory stays bounded regardless of page count.
+    """
+    if not PDF2IMAGE_AVAILABLE:
+        raise ImportError("pdf2image is required to OCR scanned PDF pages: pip install pdf2image")
+
+    dpi = max(1, int(max_dimension * POINTS_PER_INCH / max(page.size)))
+    images = convert_from_path(str(pdf_path), dpi=dpi, first_page=page.number,
+                               last_page=page.number, thread_count=1)
+    buffer = io.BytesIO()
+    images[0].save(buffer, 'PNG')
+    images[0].close()
+    return buffer.getvalue()
+
+
+def _is_empty(value) -> bool:
+    return value in (None, '', 0, [], {})
+
+
+def merge_page_analyses(analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine per-page analysis dicts (in page order) into one.
+
+    Lab results from all pages are kept (the first page wins if a parameter
+    repeats), lists are concatenated without duplicates, summaries are joined,
+    follow_up_required is true if any page says so, urgency_level is the
+    highest, and other fields take the first non-empty value.
+    """
+    merged: Dict[str, Any] = {}
+    for analysis in analyses:
+        for key, value in analysis.items():
+            if _is_empty(value):
+                continue
+            current = merged.get(key)
+            if key == 'urgency_level':
+                rank = {level: i for i, level in enumerate(URGENCY_ORDER)}
+                if current is None or rank.get(str(value).lower(), 0) > rank.get(str(current).lower(), 0):
+                    merged[key] = value
+            elif isinstance(value, bool):
+                merged[key] = bool(current) or value
+            elif isinstance(value, dict):
+                combined = dict(current) if isinstance(current, dict) else {}
+                for name, entry in value.items():
+                    combined.setdefault(name, entry)
+                merged[key] = combined
+            elif isinstance(value, list):
+                combined = list(current) if isinstance(current, list) else []
+                seen = {json.dumps(item, sort_keys=True, default=str) for item in combined}
+                for item in value:
+                    marker = json.dumps(item, sort_keys=True, default=str)
+                    if marker not in seen:
+                        seen.add(marker)
+                        combined.append(item)
+                merged[key] = combined
+            elif key in CONCATENATED_FIELDS and isinstance(value, str) and current:
+                if value not in current:
+                    merged[key] = f"{current}\n\n{value}"
+            elif _is_empty(current):
+                merged[key] = value
+    return merged
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test that a PDF analysis with failed pages is not cached
+
+Runs GroqVisionProcessor against the local Groq stub (no API key or network
+needed) on a three-page PDF whose second page fails on the first run. The
+partial result must not be stored in the analysis cache, so the next run sends
+every page to the API again; once all pages succeed, the result is cached.
+
+    python test_pdf_analysis_cache.py      (or: pytest test_pdf_analysis_cache.py)
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent / "src" / "healthguard" / "tools"))
+
+import groq_client
+import groq_vision_processor
+from analysis_cache import AnalysisCache
+from groq_stub_server import GroqStubServer
+from pdf_ingestion import PdfPage
+
+
+PAGES = [
+    PdfPage(number, f"City Lab - page {number}: Hemoglobin 11.2 g/dL (12.0-16.0), WBC 7.1 10^3/uL", (595, 842))
+    for number in (1, 2, 3)
+]
+
+
+def test_failed_page_is_not_cached():
+    with tempfile.TemporaryDirectory() as tmp, GroqStubServer(latency=0.01) as stub:
+        pdf_path = Path(tmp) / "report.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4 three page lab report")
+
+        groq_client._client = groq_client.GroqClient(api_key="test", base_url=stub.base_url)
+        processor = groq_vision_processor.GroqVisionProcessor()
+        processor.groq_api_key = "test"
+        processor.analysis_cache = AnalysisCache(Path(tmp) / "cache", max_bytes=1024 * 1024)
+
+        call_text_api = processor._call_groq_text_api
+        fail_page_2 = True
+
+        def flaky_text_api(text, filename):
+            if fail_page_2 and filename.endswith("page 2"):
+                raise groq_client.GroqAPIError("Request timed out")
+            return call_text_api(text, filename)
+
+        with mock.patch.object(groq_vision_processor, "iter_pdf_pages", lambda path: iter(PAGES)), \
+                mock.patch.object(processor, "_call_groq_text_api", flaky_text_api):
+            first = processor._process_single_image(pdf_path)
+            assert "error" not in first, first
+            assert first["processing_info"]["failed_pages"] == [2]
+            assert stub.requests == 2
+
+            # Page 2 recovers: the partial result wasn't cached, so all three pages are sent again
+            fail_page_2 = False
+            second = processor._process_single_image(pdf_path)
+            assert second["processing_info"]["failed_pages"] == []
+            assert second["processing_info"]["cache_hit"] is False
+            assert stub.requests == 5
+
+            # Complete now: served from the cache
+            third = processor._process_single_image(pdf_path)
+            assert third["processing_info"]["cache_hit"] is True
+            assert stub.requests == 5
+
+
+if __name__ == "__main__":
+    test_failed_page_is_not_cached()
+    print("✅ Partial PDF analyses are not cached")
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class HealthappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'healthapp'
\ No newline at end of file
+    name = 'healthapp'
+
+    def ready(self):
+        from . import lab_jobs
+        lab_jobs.connect_signals()
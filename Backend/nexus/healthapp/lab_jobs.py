@@ -0,0 +1,167 @@
+"""
+Background job tasks for lab report image OCR.
+
+The upload views store the image in the blob store and queue one of these
+tasks with nexusapp.jobs.enqueue(); a `manage.py run_jobs` worker runs the
+OpenCV + Tesseract pipeline and the client polls the job status for the result.
+
+An upload is only kept in the blob store for OCR. Each uploaded file has a
+LabUpload row referencing its blob (see nexusapp.blobstore.register_blob_reference),
+created with the job by enqueue_lab_job(). The rows are deleted once the job has
+succeeded or failed for good (nexusapp.jobs.job_finished), never while it may
+still be retried, and each delete releases the blob through the blob store's
+locking release path, so it stays while another pending job or a stored
+LabReport has the same file.
+"""
+
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete
+
+from nexusapp.blobstore import (
+    BlobNotFound, get_blob_store, referencing_blob, register_blob_reference, release_unreferenced_blob
+)
+from nexusapp.jobs import enqueue, job_finished
+
+from .models import LabResult, LabUpload
+from .ocr import process_image_bytes, process_images
+
+
+PROCESS_IMAGE_TASK = 'healthapp.lab_jobs.process_lab_report_image'
+PROCESS_BATCH_TASK = 'healthapp.lab_jobs.process_lab_report_batch'
+
+
+class LabReportProcessingError(Exception):
+    pass
+
+
+def enqueue_lab_job(task, payload, user, writers):
+    """
+    Queue a lab job and commit each open BlobWriter (from BlobStore.write_chunks())
+    with a LabUpload row keeping its blob until the job is done. The payload names
+    the blobs by writer.digest(). If queueing fails, no blob is left behind.
+    """
+    try:
+        with transaction.atomic():
+            job = enqueue(task, payload, user=user)
+            for writer in writers:
+                with referencing_blob(writer) as file_sha256:
+                    LabUpload.objects.create(job=job, file_sha256=file_sha256)
+    except BaseException:
+        for writer in writers:
+            if writer.sha256 is None:
+                writer.abort()
+            else:
+                release_unreferenced_blob(writer.sha256)
+        raise
+    return job
+
+
+def _release_uploads(sender, job, **kwargs):
+    LabUpload.objects.filter(job=job).delete()
+
+
+def _release_upload_blob(sender, instance, **kwargs):
+    release_unreferenced_blob(instance.file_sha256)
+
+
+def connect_signals():
+    register_blob_reference('healthapp.LabUpload', 'file_sha256')
+    job_finished.connect(_release_uploads, dispatch_uid='lab_job_upload_release')
+    post_delete.connect(_release_upload_blob, sender=LabUpload, dispatch_uid='lab_upload_blob_release')
+
+
+def _read_upload(file_sha256):
+    return get_blob_store().read_bytes(file_sha256)
+
+
+def save_lab_result(user_id, processed_data):
+    """Save OCR output as a LabResult; adds database_saved (and lab_result_id / database_error) to processed_data"""
+    try:
+        user = User.objects.get(id=user_id)
+        lab_result = LabResult.objects.create(
+            user=user,
+            lab_test_name=processed_data['lab_test_name'],
+            lab_date_conducted=datetime.strptime(processed_data['lab_date_conducted'], '%Y-%m-%d').date(),
+            lab_results=processed_data['lab_results'],
+            lab_normal_ranges=processed_data['lab_normal_ranges'],
+            interpretation_summary=processed_data['interpretation_summary'],
+            interpretation_abnormalities=processed_data['interpretation_abnormalities'],
+            recommendation_date=datetime.strptime(processed_data['recommendation_date'], '%Y-%m-%d').date(),
+            recommendation_action=processed_data['recommendation_action']
+        )
+        processed_data['database_saved'] = True
+        processed_data['lab_result_id'] = lab_result.id
+    except Exception as db_error:
+        # Processing succeeded but database save failed
+        processed_data['database_saved'] = False
+        processed_data['database_error'] = str(db_error)
+    return processed_data
+
+
+def process_lab_report_image(payload):
+    """
+    Job task: OCR one uploaded lab report image and save the extracted LabResult.
+    payload: {"file_sha256": ..., "user_id": ...}
+    """
+    processed_data = process_image_bytes(_read_upload(payload['file_sha256']))
+
+    if processed_data.get('error'):
+        raise LabReportProcessingError(processed_data.get('message', 'Unknown processing error'))
+
+    return save_lab_result(payload['user_id'], processed_data)
+
+
+def process_lab_report_batch(payload):
+    """
+    Job task: OCR several uploaded images in parallel; results keep the upload order (file_index).
+    payload: {"files": [{"file_index": ..., "filename": ..., "file_sha256": ... or "error": ...}, ...]}
+    """
+    accepted, images, processed = [], [], {}
+    # The same image uploaded twice in a batch is one blob: read it once
+    read = {}
+    for file in payload['files']:
+        if file.get('error'):
+            continue
+        try:
+            if file['file_sha256'] not in read:
+                read[file['file_sha256']] = _read_upload(file['file_sha256'])
+            images.append(read[file['file_sha256']])
+            accepted.append(file['file_index'])
+        except BlobNotFound:
+            processed[file['file_index']] = {'error': True, 'message': 'Uploaded file is missing from storage'}
+
+    # OCR runs in parallel on the process pool; results come back in upload order
+    processed.update(zip(accepted, process_images(images)))
+
+    results = []
+    for file in payload['files']:
+        result = {'file_index': file['file_index'], 'filename': file['filename']}
+        processed_data = processed.get(file['file_index'])
+        if file.get('error'):
+            # Rejected at upload time
+            result.update(success=False, error=file['error'])
+        elif processed_data.get('error'):
+            result.update(success=False, error=processed_data.get('message', 'Processing failed'))
+        else:
+            result.update(
+                success=True,
+                data=processed_data,
+                parameters_extracted=len(processed_data.get('lab_results', {}))
+            )
+        results.append(result)
+
+    successful = sum(1 for r in results if r['success'])
+    total_parameters = sum(r.get('parameters_extracted', 0) for r in results if r['success'])
+    return {
+        'message': f'Batch processing completed. {successful}/{len(results)} files processed successfully.',
+        'summary': {
+            'total_files': len(results),
+            'successful': successful,
+            'failed': len(results) - successful,
+            'total_parameters_extracted': total_parameters
+        },
+        'results': results
+    }
@@ -11,34 +11,33 @@ from django.views.decorators.http import require_http_methods
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from django.conf import settings
-import tempfile
+from django.urls import reverse
 from PIL import Image
 import io
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
 
-# Import our lab report processor
-import sys
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'Agent', 'healthguard', 'src', 'healthguard', 'tools'))
-
-try:
-    from lab_report_processor import LabReportImageProcessor, process_base64_image
-except ImportError:
-    # Fallback if import fails
-    LabReportImageProcessor = None
-    process_base64_image = None
+from nexusapp.authentication import token_required
+from nexusapp.blobstore import get_blob_store
+from nexusapp.models import Job
 
 from .services import HealthDataService
+from .ocr import LabReportImageProcessor, process_base64_image
+from .lab_jobs import PROCESS_BATCH_TASK, PROCESS_IMAGE_TASK, enqueue_lab_job
 
 
-@csrf_exempt
-@require_http_methods(["POST"])
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@token_required
 def upload_lab_report_image(request):
     """
-    API endpoint to upload and process lab report images.
-    Accepts both file uploads and base64 encoded images.
+    API endpoint to upload lab report images for processing, for the authenticated user
+    (an "Authorization: Bearer <token>" header or a "token" field).
+    Accepts a lab_report_image file upload, or an image_base64 form or JSON field.
+    OCR runs in a background job (manage.py run_jobs): responds 202 with a job_id
+    to poll at status_url; the job result is the processed lab report data.
     """
     try:
-        user_id = request.POST.get('user_id', 1)
-        
         # Check if we have the processor available
         if not LabReportImageProcessor:
             return JsonResponse({
@@ -46,8 +45,6 @@ def upload_lab_report_image(request):
                 'error': 'Lab report processor not available. Please install required dependencies: pip install opencv-python pytesseract pillow'
             }, status=500)
         
-        processed_data = None
-        
         # Handle file upload
         if 'lab_report_image' in request.FILES:
             uploaded_file = request.FILES['lab_report_image']
@@ -59,117 +56,32 @@ def upload_lab_report_image(request):
                     'error': 'Invalid file type. Please upload an image file.'
                 }, status=400)
             
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                for chunk in uploaded_file.chunks():
-                    temp_file.write(chunk)
-                temp_path = temp_file.name
-            
-            try:
-                # Process the image
-                processor = LabReportImageProcessor()
-                processed_data = processor.process_lab_report_image(temp_path)
-            finally:
-                # Clean up temp file
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+            writer = get_blob_store().write_chunks(uploaded_file.chunks())
         
-        # Handle base64 encoded image
-        elif 'image_base64' in request.POST:
-            base64_string = request.POST['image_base64']
-            
-            # Remove data URL prefix if present
-            if base64_string.startswith('data:image'):
-                base64_string = base64_string.split(',')[1]
-            
-            processed_data = process_base64_image(base64_string)
+        # Handle base64 encoded image (form field or JSON body)
+        elif request.data.get('image_base64'):
+            writer = get_blob_store().write_base64(request.data['image_base64'])
         
-        # Handle JSON body with base64 image
         else:
-            try:
-                data = json.loads(request.body)
-                if 'image_base64' in data:
-                    base64_string = data['image_base64']
-                    user_id = data.get('user_id', user_id)
-                    
-                    # Remove data URL prefix if present
-                    if base64_string.startswith('data:image'):
-                        base64_string = base64_string.split(',')[1]
-                    
-                    processed_data = process_base64_image(base64_string)
-                else:
-                    return JsonResponse({
-                        'success': False,
-                        'error': 'No image data provided. Use lab_report_image file upload or image_base64 parameter.'
-                    }, status=400)
-            except json.JSONDecodeError:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Invalid JSON data.'
-                }, status=400)
-        
-        if not processed_data:
             return JsonResponse({
                 'success': False,
-                'error': 'No image data to process.'
+                'error': 'No image data provided. Use lab_report_image file upload or image_base64 parameter.'
             }, status=400)
         
-        # Check if processing was successful
-        if processed_data.get('error'):
-            return JsonResponse({
-                'success': False,
-                'error': processed_data.get('message', 'Unknown processing error')
-            }, status=500)
-        
-        # Save to database if processing was successful
-        try:
-            lab_data = {
-                'lab_test_name': processed_data['lab_test_name'],
-                'lab_date_conducted': processed_data['lab_date_conducted'],
-                'lab_results': processed_data['lab_results'],
-                'lab_normal_ranges': processed_data['lab_normal_ranges'],
-                'interpretation_summary': processed_data['interpretation_summary'],
-                'interpretation_abnormalities': processed_data['interpretation_abnormalities'],
-                'recommendation_date': processed_data['recommendation_date'],
-                'recommendation_action': processed_data['recommendation_action'],
-            }
-            
-            # Convert date strings to date objects
-            from datetime import datetime
-            lab_data['lab_date_conducted'] = datetime.strptime(lab_data['lab_date_conducted'], '%Y-%m-%d').date()
-            lab_data['recommendation_date'] = datetime.strptime(lab_data['recommendation_date'], '%Y-%m-%d').date()
-            
-            # Save to database using existing service
-            from ..models import LabResult, User
-            from django.shortcuts import get_object_or_404
-            
-            user = get_object_or_404(User, id=user_id)
-            lab_result = LabResult.objects.create(
-                user=user,
-                lab_test_name=lab_data['lab_test_name'],
-                lab_date_conducted=lab_data['lab_date_conducted'],
-                lab_results=lab_data['lab_results'],
-                lab_normal_ranges=lab_data['lab_normal_ranges'],
-                interpretation_summary=lab_data['interpretation_summary'],
-                interpretation_abnormalities=lab_data['interpretation_abnormalities'],
-                recommendation_date=lab_data['recommendation_date'],
-                recommendation_action=lab_data['recommendation_action']
-            )
-            
-            processed_data['database_saved'] = True
-            processed_data['lab_result_id'] = lab_result.id
-            
-        except Exception as db_error:
-            # Processing succeeded but database save failed
-            processed_data['database_saved'] = False
-            processed_data['database_error'] = str(db_error)
-        
+        job = enqueue_lab_job(
+            PROCESS_IMAGE_TASK,
+            {'file_sha256': writer.digest(), 'user_id': request.user.id},
+            request.user,
+            [writer]
+        )
+        return _job_accepted(request, job, 'Lab report queued for processing')
+    
+    except ValueError as e:
+        # Malformed base64
         return JsonResponse({
-            'success': True,
-            'message': 'Lab report processed successfully',
-            'data': processed_data
-        })
-        
+            'success': False,
+            'error': str(e)
+        }, status=400)
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -332,15 +244,16 @@ def get_lab_report_status(request):
         }, status=500)
 
 
-@csrf_exempt
-@require_http_methods(["POST"])
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@token_required
 def batch_process_lab_reports(request):
     """
-    API endpoint to process multiple lab report images in batch.
+    API endpoint to process multiple lab report images (lab_report_* file fields) in batch,
+    for the authenticated user (an "Authorization: Bearer <token>" header or a "token" field).
+    Responds 202 with a job_id; the job result has the per-file results (in upload order) and a summary.
     """
     try:
-        user_id = request.POST.get('user_id', 1)
-        
         if not LabReportImageProcessor:
             return JsonResponse({
                 'success': False,
@@ -359,78 +272,65 @@ def batch_process_lab_reports(request):
                 'error': 'No lab report images provided for batch processing.'
             }, status=400)
         
-        results = []
-        processor = LabReportImageProcessor()
-        
-        for idx, uploaded_file in enumerate(uploaded_files):
-            try:
+        files, writers = [], []
+        try:
+            for idx, uploaded_file in enumerate(uploaded_files):
+                file = {'file_index': idx, 'filename': uploaded_file.name}
                 # Validate file type
                 if not uploaded_file.content_type.startswith('image/'):
-                    results.append({
-                        'file_index': idx,
-                        'filename': uploaded_file.name,
-                        'success': False,
-                        'error': 'Invalid file type'
-                    })
-                    continue
-                
-                # Save temporarily and process
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                    for chunk in uploaded_file.chunks():
-                        temp_file.write(chunk)
-                    temp_path = temp_file.name
-                
-                try:
-                    # Process the image
-                    processed_data = processor.process_lab_report_image(temp_path)
-                    
-                    if processed_data.get('error'):
-                        results.append({
-                            'file_index': idx,
-                            'filename': uploaded_file.name,
-                            'success': False,
-                            'error': processed_data.get('message', 'Processing failed')
-                        })
-                    else:
-                        results.append({
-                            'file_index': idx,
-                            'filename': uploaded_file.name,
-                            'success': True,
-                            'data': processed_data,
-                            'parameters_extracted': len(processed_data.get('lab_results', {}))
-                        })
-                
-                finally:
-                    # Clean up temp file
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-                        
-            except Exception as file_error:
-                results.append({
-                    'file_index': idx,
-                    'filename': uploaded_file.name,
-                    'success': False,
-                    'error': str(file_error)
-                })
-        
-        # Summary
-        successful = sum(1 for r in results if r['success'])
-        total_parameters = sum(r.get('parameters_extracted', 0) for r in results if r['success'])
-        
-        return JsonResponse({
-            'success': True,
-            'message': f'Batch processing completed. {successful}/{len(results)} files processed successfully.',
-            'summary': {
-                'total_files': len(results),
-                'successful': successful,
-                'failed': len(results) - successful,
-                'total_parameters_extracted': total_parameters
-            },
-            'results': results
-        })
+                    file['error'] = 'Invalid file type'
+                else:
+                    writers.append(get_blob_store().write_chunks(uploaded_file.chunks()))
+                    file['file_sha256'] = writers[-1].digest()
+                files.append(file)
+        except BaseException:
+            for writer in writers:
+                writer.abort()
+            raise
+        
+        job = enqueue_lab_job(
+            PROCESS_BATCH_TASK,
+            {'files': files, 'user_id': request.user.id},
+            request.user,
+            writers
+        )
+        return _job_accepted(request, job, f'{len(files)} lab report(s) queued for batch processing')
         
     except Exception as e:
         return JsonResponse({
             'success': False,
             'error': f'Batch processing error: {str(e)}'
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+@token_required
+def get_lab_job_status(request, job_id):
+    """
+    API endpoint to poll a lab report processing job queued for the user.
+    GET with an "Authorization: Bearer <token>" header, or POST {"token": "jwt_token"}.
+    status is queued, running, succeeded (result holds the processed data) or failed (error is set).
+    """
+    try:
+        job = Job.objects.get(id=job_id, user=request.user, task__in=[PROCESS_IMAGE_TASK, PROCESS_BATCH_TASK])
+    except Job.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'error': 'Job not found or you do not have permission to access it.'
+        }, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'data': job.as_status()
+    })
+
+
+def _job_accepted(request, job, message):
+    return JsonResponse({
+        'success': True,
+        'message': message,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': request.build_absolute_uri(reverse('healthapp:lab_job_status', args=[job.id]))
+    }, status=202)
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Appointment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_symptoms', models.JSONField(default=list)),
+                ('assessment_urgency_level', models.CharField(max_length=50)),
+                ('hospital_name', models.CharField(max_length=200)),
+                ('hospital_address', models.TextField()),
+                ('hospital_distance_km', models.FloatField()),
+                ('appointment_status', models.CharField(max_length=50)),
+                ('appointment_doctor', models.CharField(max_length=200)),
+                ('appointment_department', models.CharField(max_length=100)),
+                ('appointment_date', models.DateField()),
+                ('appointment_time', models.TimeField()),
+                ('confirmation_message', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HealthAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alert_date', models.DateField()),
+                ('alert_time', models.TimeField()),
+                ('alert_issue_detected', models.TextField()),
+                ('alert_advice', models.TextField()),
+                ('is_resolved', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LabResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lab_test_name', models.CharField(max_length=200)),
+                ('lab_date_conducted', models.DateField()),
+                ('lab_results', models.JSONField(default=dict)),
+                ('lab_normal_ranges', models.JSONField(default=dict)),
+                ('interpretation_summary', models.TextField()),
+                ('interpretation_abnormalities', models.JSONField(default=list)),
+                ('recommendation_date', models.DateField()),
+                ('recommendation_action', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MedicineRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('medicine_name', models.CharField(max_length=200)),
+                ('medicine_dosage', models.CharField(max_length=100)),
+                ('medicine_frequency', models.CharField(max_length=100)),
+                ('medicine_timing', models.JSONField(default=list)),
+                ('medicine_quantity_available', models.IntegerField()),
+                ('medicine_special_instructions', models.TextField(blank=True)),
+                ('restock_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('age', models.IntegerField(blank=True, null=True)),
+                ('phone', models.CharField(blank=True, max_length=15, null=True)),
+                ('emergency_contact', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Task paths as of this migration (healthapp.lab_jobs)
+LAB_TASKS = ['healthapp.lab_jobs.process_lab_report_image', 'healthapp.lab_jobs.process_lab_report_batch']
+
+
+def backfill_lab_uploads(apps, schema_editor):
+    """Reference the uploads of lab jobs still queued or running, so they are released when those finish"""
+    Job = apps.get_model('nexusapp', 'Job')
+    LabUpload = apps.get_model('healthapp', 'LabUpload')
+    uploads = []
+    for job in Job.objects.filter(task__in=LAB_TASKS, status__in=['queued', 'running']).iterator():
+        files = [job.payload] if 'file_sha256' in job.payload else job.payload.get('files', [])
+        uploads.extend(LabUpload(job=job, file_sha256=file['file_sha256']) for file in files if file.get('file_sha256'))
+    LabUpload.objects.bulk_create(uploads)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthapp', '0001_initial'),
+        ('nexusapp', '0029_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_sha256', models.CharField(db_index=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lab_uploads', to='nexusapp.job')),
+            ],
+        ),
+        migrations.RunPython(backfill_lab_uploads, migrations.RunPython.noop),
+    ]
@@ -75,4 +75,13 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.user.username} - {self.appointment_doctor} on {self.appointment_date}"
\ No newline at end of file
+        return f"{self.user.username} - {self.appointment_doctor} on {self.appointment_date}"
+
+class LabUpload(models.Model):
+    """An uploaded lab report image waiting for OCR; keeps its blob alive until the job is done"""
+    job = models.ForeignKey('nexusapp.Job', on_delete=models.CASCADE, related_name='lab_uploads')
+    file_sha256 = models.CharField(max_length=64, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Job {self.job_id} - {self.file_sha256[:12]}"
@@ -0,0 +1,112 @@
+"""
+Lab report OCR engine: the Agent's LabReportImageProcessor and a warm process pool.
+
+Tesseract and OpenCV are CPU-bound, so batches are fanned out over a bounded
+ProcessPoolExecutor. Every run_jobs worker has its own pool of
+settings.LAB_OCR_POOL_SIZE processes, so `run_jobs --workers N` starts N times
+that many; by default the cores are divided among the N workers. Pool processes
+are started once and reused. Each builds its own
+LabReportImageProcessor a single time, and images are passed to it as bytes.
+
+Pool processes are started with "spawn" and only import this module and the
+processor. They never touch Django settings or the database, so they don't
+inherit the parent's open database connections.
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'Agent', 'healthguard', 'src', 'healthguard', 'tools'))
+
+try:
+    from lab_report_processor import LabReportImageProcessor, process_base64_image
+except ImportError:
+    # Fallback if import fails
+    LabReportImageProcessor = None
+    process_base64_image = None
+
+
+class ProcessorUnavailable(Exception):
+    pass
+
+
+_processor = None
+
+
+def get_processor():
+    """One LabReportImageProcessor per process"""
+    global _processor
+    if _processor is None:
+        if LabReportImageProcessor is None:
+            raise ProcessorUnavailable(
+                'Lab report processor not available. Please install required dependencies: pip install opencv-python pytesseract pillow'
+            )
+        _processor = LabReportImageProcessor()
+    return _processor
+
+
+def process_image_bytes(data):
+    """Run the full OCR + analysis pipeline on an encoded image (decoded in memory); returns the processor's result dict"""
+    return get_processor().process_lab_report_image(data)
+
+
+def _pool_process_image(data):
+    # Runs in a pool process: report failures as data so one bad image doesn't fail the batch
+    try:
+        return process_image_bytes(data)
+    except Exception as e:
+        return {'error': True, 'message': str(e)}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool_size():
+    """settings.LAB_OCR_POOL_SIZE, or this job worker's share of the cores"""
+    from django.conf import settings
+    from nexusapp import jobs
+
+    return getattr(settings, 'LAB_OCR_POOL_SIZE', None) or max(1, (os.cpu_count() or 1) // jobs.worker_count)
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=pool_size(),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=get_processor
+                )
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def process_images(images):
+    """
+    OCR several encoded images in parallel on the pool. Returns one result dict per
+    image, in input order; failed images get {"error": True, "message": ...}.
+    """
+    futures = [get_pool().submit(_pool_process_image, data) for data in images]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except BrokenProcessPool:
+            # A pool process died (e.g. killed for memory); start a fresh pool next time
+            _reset_pool()
+            results.append({'error': True, 'message': 'OCR worker process crashed'})
+    return results
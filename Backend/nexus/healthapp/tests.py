@@ -0,0 +1,226 @@
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from nexusapp import blobstore, jobs
+from nexusapp.jobs import enqueue
+from nexusapp.models import Job, LabReport
+from nexusapp.tests import MigrationTestCase
+
+from . import lab_jobs, ocr
+from .lab_jobs import PROCESS_BATCH_TASK, PROCESS_IMAGE_TASK, enqueue_lab_job
+from .models import LabUpload
+
+
+class LabTestCase(TestCase):
+    """Runs each test against a throwaway LocalFileSystemBlobStore, with user alice"""
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.blob_store = blobstore.LocalFileSystemBlobStore(root)
+        patcher = mock.patch.object(blobstore, '_store', self.blob_store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user('alice', password='pw')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+
+class LabJobStatusTests(LabTestCase):
+    def setUp(self):
+        super().setUp()
+        self.job = enqueue(PROCESS_IMAGE_TASK, {'file_sha256': 'ab' * 32, 'user_id': self.user.id}, user=self.user)
+        self.url = f'/healthapp/api/lab-jobs/{self.job.id}/'
+
+    def test_owner_can_poll_job(self):
+        response = self.client_for(self.user).get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['status'], 'queued')
+
+    def test_token_is_required(self):
+        self.assertEqual(APIClient().get(self.url).status_code, 401)
+
+    def test_other_users_job_is_not_found(self):
+        other = User.objects.create_user('bob', password='pw')
+        self.assertEqual(self.client_for(other).get(self.url).status_code, 404)
+
+
+class LabImageUploadTests(LabTestCase):
+    IMAGE = b'\x89PNG\r\n\x1a\nlab report photo'
+
+    def test_token_is_required(self):
+        response = APIClient().post('/healthapp/api/lab-image-upload/', {'image_base64': 'aGk=', 'user_id': self.user.id})
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Job.objects.exists())
+
+    def test_job_belongs_to_the_uploader_not_the_body_user_id(self):
+        uploader = User.objects.create_user('bob', password='pw')
+        client = self.client_for(uploader)
+        response = client.post('/healthapp/api/lab-image-upload/', {
+            'lab_report_image': SimpleUploadedFile('cbc.png', self.IMAGE, content_type='image/png'),
+            'user_id': self.user.id
+        }, format='multipart')
+        self.assertEqual(response.status_code, 202, response.content)
+
+        job = Job.objects.get()
+        self.assertEqual((job.user, job.payload['user_id']), (uploader, uploader.id))
+        self.assertEqual(self.blob_store.read_bytes(job.payload['file_sha256']), self.IMAGE)
+        self.assertEqual(list(job.lab_uploads.values_list('file_sha256', flat=True)), [job.payload['file_sha256']])
+        self.assertEqual(client.get(response.json()['status_url']).status_code, 200)
+        self.assertEqual(self.client_for(self.user).get(response.json()['status_url']).status_code, 404)
+
+    def test_base64_json_upload(self):
+        response = self.client_for(self.user).post('/healthapp/api/lab-image-upload/', {
+            'image_base64': base64.b64encode(self.IMAGE).decode()
+        }, format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        job = Job.objects.get()
+        self.assertEqual(job.user, self.user)
+        self.assertEqual(self.blob_store.read_bytes(job.lab_uploads.get().file_sha256), self.IMAGE)
+
+    def test_malformed_base64_leaves_nothing_behind(self):
+        response = self.client_for(self.user).post('/healthapp/api/lab-image-upload/', {'image_base64': 'not base64!'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(os.listdir(self.blob_store.temp_dir), [])
+
+    def test_batch_job_belongs_to_the_uploader(self):
+        response = self.client_for(self.user).post('/healthapp/api/lab-batch-process/', {
+            'lab_report_1': SimpleUploadedFile('a.png', self.IMAGE, content_type='image/png'),
+            'lab_report_2': SimpleUploadedFile('b.txt', b'text', content_type='text/plain'),
+            'user_id': 1
+        }, format='multipart')
+        self.assertEqual(response.status_code, 202, response.content)
+        job = Job.objects.get()
+        self.assertEqual((job.user, job.payload['user_id']), (self.user, self.user.id))
+        self.assertEqual([file.get('error') for file in job.payload['files']], [None, 'Invalid file type'])
+        self.assertEqual(job.lab_uploads.count(), 1)
+
+
+class LabJobUploadReleaseTests(LabTestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = b'lab report photo'
+        self.sha256 = hashlib.sha256(self.data).hexdigest()
+        # OCR finds nothing: the image task fails, the batch task reports it per file
+        ocr_failure = {'error': True, 'message': 'no text found'}
+        for patcher in [mock.patch.object(lab_jobs, 'process_image_bytes', return_value=ocr_failure),
+                        mock.patch.object(lab_jobs, 'process_images', side_effect=lambda images: [ocr_failure] * len(images))]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def image_job(self, max_attempts=1):
+        job = enqueue_lab_job(PROCESS_IMAGE_TASK, {'file_sha256': self.sha256, 'user_id': self.user.id},
+                              self.user, [self.blob_store.write_bytes(self.data)])
+        Job.objects.filter(id=job.id).update(max_attempts=max_attempts)
+        return job
+
+    def run_next(self):
+        with self.captureOnCommitCallbacks(execute=True), self.assertLogs('nexusapp.jobs', 'ERROR'):
+            return jobs.run_job(jobs.claim_next('worker'))
+
+    def test_upload_is_released_when_job_finishes(self):
+        self.image_job()
+        self.assertEqual(self.run_next().status, Job.FAILED)
+        self.assertFalse(self.blob_store.exists(self.sha256))
+        self.assertFalse(LabUpload.objects.exists())
+
+    def test_upload_is_kept_for_a_retry(self):
+        self.image_job(max_attempts=2)
+        self.assertEqual(self.run_next().status, Job.QUEUED)
+        self.assertTrue(self.blob_store.exists(self.sha256))
+
+        Job.objects.update(run_after=timezone.now())
+        self.run_next()
+        self.assertEqual(lab_jobs.process_image_bytes.call_count, 2)
+        self.assertFalse(self.blob_store.exists(self.sha256))
+
+    def test_upload_is_kept_while_another_job_has_the_same_file(self):
+        self.image_job()
+        self.image_job()
+        self.run_next()
+        self.assertTrue(self.blob_store.exists(self.sha256))
+        self.run_next()
+        self.assertFalse(self.blob_store.exists(self.sha256))
+
+    def test_batch_with_the_same_image_twice(self):
+        files = [{'file_index': i, 'filename': f'{i}.png', 'file_sha256': self.sha256} for i in range(2)]
+        enqueue_lab_job(PROCESS_BATCH_TASK, {'files': files, 'user_id': self.user.id}, self.user,
+                        [self.blob_store.write_bytes(self.data) for _ in files])
+        with self.captureOnCommitCallbacks(execute=True):
+            job = jobs.run_job(jobs.claim_next('worker'))
+
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual([r['error'] for r in job.result['results']], ['no text found'] * 2)
+        self.assertFalse(self.blob_store.exists(self.sha256))
+
+    def test_stale_job_releases_upload_once_failed(self):
+        self.image_job()
+        jobs.claim_next('dead-worker')
+        Job.objects.update(started_at=timezone.now() - timedelta(seconds=120))
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.requeue_stale_jobs(timeout=60)
+        self.assertFalse(self.blob_store.exists(self.sha256))
+
+    def test_upload_is_kept_while_a_lab_report_has_the_same_file(self):
+        self.image_job()
+        LabReport.objects.create(user=self.user, report_name='CBC', report_type='blood_test', report_date=date(2024, 1, 1),
+                                 file_name='cbc.pdf', file_type='pdf', file_size=len(self.data), file_sha256=self.sha256)
+        self.run_next()
+        self.assertTrue(self.blob_store.exists(self.sha256))
+
+    def test_failed_enqueue_leaves_no_blob(self):
+        with mock.patch.object(lab_jobs, 'enqueue', side_effect=RuntimeError('database is down')), \
+                self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+            self.image_job()
+        self.assertFalse(self.blob_store.exists(self.sha256))
+        self.assertEqual(os.listdir(self.blob_store.temp_dir), [])
+
+
+class OcrPoolSizeTests(TestCase):
+    @override_settings(LAB_OCR_POOL_SIZE=None)
+    def test_cores_are_divided_among_job_workers(self):
+        with mock.patch.object(os, 'cpu_count', return_value=8):
+            for workers, size in [(1, 8), (2, 4), (3, 2), (16, 1)]:
+                with mock.patch.object(jobs, 'worker_count', workers):
+                    self.assertEqual(ocr.pool_size(), size)
+
+    @override_settings(LAB_OCR_POOL_SIZE=3)
+    def test_setting_is_per_job_worker(self):
+        with mock.patch.object(jobs, 'worker_count', 4):
+            self.assertEqual(ocr.pool_size(), 3)
+
+
+class LabUploadBackfillMigrationTests(MigrationTestCase):
+    app = 'healthapp'
+    migrate_from = '0001_initial'
+    migrate_to = '0002_labupload'
+
+    def setUpBeforeMigration(self, apps):
+        Job = apps.get_model('nexusapp', 'Job')
+        image_job = Job.objects.create(task=PROCESS_IMAGE_TASK, payload={'file_sha256': 'a' * 64, 'user_id': 1})
+        files = [{'file_index': 0, 'file_sha256': 'b' * 64}, {'file_index': 1, 'error': 'Invalid file type'}]
+        batch_job = Job.objects.create(task=PROCESS_BATCH_TASK, payload={'files': files, 'user_id': 1}, status='running')
+        Job.objects.create(task=PROCESS_IMAGE_TASK, payload={'file_sha256': 'c' * 64}, status='succeeded')
+        self.expected = {(image_job.id, 'a' * 64), (batch_job.id, 'b' * 64)}
+
+    def test_backfills_uploads_of_pending_jobs(self):
+        LabUpload = self.apps.get_model('healthapp', 'LabUpload')
+        self.assertEqual(set(LabUpload.objects.values_list('job_id', 'file_sha256')), self.expected)
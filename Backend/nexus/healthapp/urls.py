@@ -16,4 +16,5 @@ urlpatterns = [
     path('api/lab-text-analyze/', lab_views.analyze_lab_text, name='analyze_lab_text'),
     path('api/lab-batch-process/', lab_views.batch_process_lab_reports, name='batch_process_labs'),
     path('api/lab-status/', lab_views.get_lab_report_status, name='lab_report_status'),
+    path('api/lab-jobs/<int:job_id>/', lab_views.get_lab_job_status, name='lab_job_status'),
 ]
\ No newline at end of file
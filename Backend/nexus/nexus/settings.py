@@ -32,6 +32,19 @@ SECRET_KEY = os.getenv(
 # USDA API Key
 USDA_API_KEY = os.getenv("USDA_API_KEY")
 
+# USDA lookup cache (see nexusapp/usda.py)
+USDA_API_TIMEOUT = 10  # seconds
+USDA_CACHE_TTL_SECONDS = int(os.getenv("USDA_CACHE_TTL_SECONDS", 30 * 24 * 60 * 60))
+USDA_CACHE_MAX_ENTRIES = int(os.getenv("USDA_CACHE_MAX_ENTRIES", 1024))
+# Set the "nexusapp.usda" logger to DEBUG to log the cache's hit/miss counters after API-tier lookups
+# Resolve foods only from the imported local USDA database (no outbound HTTP)
+USDA_OFFLINE = os.getenv("USDA_OFFLINE", "false").lower() == "true"
+# Max concurrent USDA API lookups per batch request
+USDA_MAX_CONCURRENCY = int(os.getenv("USDA_MAX_CONCURRENCY", 4))
+
+# How long resolved nutrition goals stay cached (see nexusapp/goals.py)
+NUTRITION_GOALS_CACHE_TTL = int(os.getenv("NUTRITION_GOALS_CACHE_TTL", 300))
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
@@ -51,6 +64,7 @@ INSTALLED_APPS = [
     "rest_framework_simplejwt",
     "corsheaders",
     "nexusapp",
+    "healthapp",
 ]
 
 MIDDLEWARE = [
@@ -139,7 +153,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # REST Framework settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "nexusapp.authentication.CachedJWTAuthentication",
     ),
 }
 
@@ -154,6 +168,26 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Lab report file storage (see nexusapp/blobstore.py)
+BLOB_STORE = {
+    "BACKEND": "nexusapp.blobstore.LocalFileSystemBlobStore",
+    "OPTIONS": {"root": os.getenv("BLOB_STORE_ROOT", BASE_DIR / "blobs")},
+}
+# Largest lab report file accepted by the upload endpoints, in bytes
+LAB_REPORT_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+
+# Background job queue (see nexusapp/jobs.py): worker processes started by `manage.py run_jobs`,
+# and seconds after which a job still marked running is assumed lost and requeued
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", 600))
+# Processes per job worker for parallel lab image OCR (see healthapp/ocr.py); run_jobs --workers N
+# starts N times this many. Unset = the cores divided among the workers (cpu_count // N, at least 1)
+LAB_OCR_POOL_SIZE = int(os.getenv("LAB_OCR_POOL_SIZE", 0)) or None
+
+# In-process cache of authenticated users (see nexusapp/authentication.py)
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", 60))  # seconds
+AUTH_USER_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", 1024))
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # React/Next.js default port
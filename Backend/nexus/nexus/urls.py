@@ -21,4 +21,5 @@ from django.urls import path, include
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('nexusapp.urls')),
+    path('healthapp/', include('healthapp.urls')),
 ]
@@ -27,7 +27,7 @@ class LabReportAdmin(admin.ModelAdmin):
     search_fields = ['report_name', 'user__username', 'lab_name', 'doctor_name', 'file_name']
     ordering = ['-report_date', '-created_at']
     date_hierarchy = 'report_date'
-    readonly_fields = ['file_size', 'created_at', 'updated_at']
+    readonly_fields = ['file_sha256', 'file_size', 'created_at', 'updated_at']
     
     def file_size_display(self, obj):
         return f"{obj.get_file_size_mb()} MB"
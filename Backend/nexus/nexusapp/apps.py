@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class NexusappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'nexusapp'
+
+    def ready(self):
+        from . import authentication, blobstore, derivatives, goals
+        authentication.connect_signals()
+        blobstore.connect_signals()
+        derivatives.connect_signals()
+        goals.connect_signals()
@@ -0,0 +1,94 @@
+"""
+JWT authentication for the API.
+
+Clients may send the access token either as an `Authorization: Bearer <token>`
+header (handled by CachedJWTAuthentication, the DRF default authentication
+class) or, as the existing clients do, as a "token" field in the request body
+(handled by the token_required decorator).
+
+Token signatures and expiry are checked on every request. The user looked up
+from the token is cached in-process for a short time, so authenticated calls
+don't need a SELECT on auth_user. Cached users are dropped whenever a User is
+saved or deleted, so deactivation takes effect immediately in this process.
+Other worker processes pick it up once their TTL expires. Each request gets its
+own copy of the cached user, so a view that changes request.user can't leak
+that change into other requests.
+"""
+
+import copy
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .lru import LRUCache
+
+
+user_cache = LRUCache(getattr(settings, 'AUTH_USER_CACHE_MAX_ENTRIES', 1024))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """simplejwt's JWTAuthentication with the token -> user lookup served from user_cache"""
+
+    def get_user(self, validated_token):
+        key = str(validated_token.get(api_settings.USER_ID_CLAIM))
+        user = user_cache.get(key)
+        if user is None:
+            # Raises AuthenticationFailed for unknown or inactive users
+            user = super().get_user(validated_token)
+            user_cache.set(key, copy.copy(user), getattr(settings, 'AUTH_USER_CACHE_TTL', 60))
+            return user
+        # The cached instance is shared between threads: never hand it out directly
+        return copy.copy(user)
+
+
+_authenticator = CachedJWTAuthentication()
+
+
+def authenticate_token(token):
+    """Validate a raw access token and return its user; raises on invalid tokens or users"""
+    return _authenticator.get_user(_authenticator.get_validated_token(token))
+
+
+def token_required(view):
+    """
+    Require a valid access token for a function view, from the Authorization header
+    or the "token" body field. The authenticated user is available as request.user.
+    Apply below @api_view / @permission_classes.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        # Already authenticated from the Authorization header by DEFAULT_AUTHENTICATION_CLASSES
+        if request.user and request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        token = request.data.get('token')
+        if not token:
+            return Response({
+                'error': 'Token is required'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            request.user = authenticate_token(token)
+        except Exception:
+            return Response({
+                'error': 'Invalid token provided'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _invalidate_user(sender, instance, **kwargs):
+    user_cache.delete(str(instance.pk))
+
+
+def connect_signals():
+    post_save.connect(_invalidate_user, sender=User, dispatch_uid='auth_user_cache_save')
+    post_delete.connect(_invalidate_user, sender=User, dispatch_uid='auth_user_cache_delete')
@@ -0,0 +1,361 @@
+"""
+Content-addressed blob storage for uploaded files.
+
+Blobs are stored as raw bytes under the hex SHA-256 of their content, so
+identical uploads are stored once and a blob's key doubles as its ETag.
+Models keep only the key (e.g. LabReport.file_sha256).
+
+The backend is configured in settings.BLOB_STORE, in the same shape as Django's
+STORAGES entries:
+
+    BLOB_STORE = {
+        "BACKEND": "nexusapp.blobstore.LocalFileSystemBlobStore",
+        "OPTIONS": {"root": BASE_DIR / "blobs"},
+    }
+
+Any class implementing the BlobStore interface can be plugged in (e.g. an
+object-storage backend in production).
+
+Identical uploads share a blob, so a blob may only be deleted once no row
+references it. Rows that reference blobs (LabReport, LabReportDerivative, and
+whatever other apps add with register_blob_reference) are created inside
+referencing_blob(), which places the file and inserts the row while holding the
+blob's lock (a nexusapp.Blob row). release_unreferenced_blob() checks for
+references and deletes under the same lock. A concurrent upload of the same
+bytes therefore either sees the blob deleted and stores it again, or its row
+keeps the blob.
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.utils.module_loading import import_string
+
+
+CHUNK_SIZE = 64 * 1024
+
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+class BlobNotFound(FileNotFoundError):
+    pass
+
+
+class BlobWriter:
+    """
+    Incrementally writes one blob while hashing it. Use as a context manager, call
+    write() per chunk and close() to commit; leaving the block on an exception discards it.
+    After close(), `sha256` and `size` describe the stored blob.
+    """
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.sha256 = None
+        # Set on close(): False if identical content was already stored
+        self.created = None
+
+    def write(self, chunk):
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        self._write(chunk)
+
+    def digest(self):
+        """SHA-256 of what has been written so far (the blob's key once closed)"""
+        return self.sha256 or self._hash.hexdigest()
+
+    def close(self):
+        if self.sha256 is None:
+            self.sha256 = self._hash.hexdigest()
+            self._commit(self.sha256)
+        return self.sha256
+
+    def abort(self):
+        raise NotImplementedError
+
+    def _write(self, chunk):
+        raise NotImplementedError
+
+    def _commit(self, sha256):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.sha256 is None:
+            self.abort()
+        return False
+
+
+class BlobStore:
+    """Interface for blob storage backends"""
+
+    def open_writer(self):
+        """Return a BlobWriter for a new blob"""
+        raise NotImplementedError
+
+    def open(self, sha256):
+        """Open a stored blob for binary reading; raises BlobNotFound"""
+        raise NotImplementedError
+
+    def exists(self, sha256):
+        raise NotImplementedError
+
+    def size(self, sha256):
+        raise NotImplementedError
+
+    def delete(self, sha256):
+        """Delete a blob if it exists"""
+        raise NotImplementedError
+
+    def write_chunks(self, chunks):
+        """
+        An open (not yet committed) BlobWriter holding `chunks`, for referencing_blob().
+        The writer is aborted if an exception is raised while writing.
+        """
+        writer = self.open_writer()
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer
+
+    def write_bytes(self, data):
+        return self.write_chunks(data[start:start + CHUNK_SIZE] for start in range(0, len(data), CHUNK_SIZE))
+
+    def write_base64(self, text):
+        """Decode base64 text into an open BlobWriter chunk by chunk; raises ValueError on malformed input"""
+        return self.write_chunks(iter_base64_decode(text))
+
+    def save_bytes(self, data):
+        """Store bytes without taking a reference to them; returns (sha256, size)"""
+        writer = self.write_bytes(data)
+        return writer.close(), writer.size
+
+    def save_base64(self, text):
+        """Decode base64 text straight into a blob, chunk by chunk; returns (sha256, size)"""
+        writer = self.write_base64(text)
+        return writer.close(), writer.size
+
+    def read_bytes(self, sha256):
+        with self.open(sha256) as f:
+            return f.read()
+
+    def iter_chunks(self, sha256, start=0, length=None, chunk_size=CHUNK_SIZE):
+        """Yield a blob's bytes (optionally a byte range) in chunks"""
+        with self.open(sha256) as f:
+            f.seek(start)
+            remaining = length
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+
+class _LocalFileWriter(BlobWriter):
+    def __init__(self, store):
+        super().__init__()
+        self._store = store
+        fd, self._temp_path = tempfile.mkstemp(dir=store.temp_dir)
+        self._file = os.fdopen(fd, 'wb')
+
+    def _write(self, chunk):
+        self._file.write(chunk)
+
+    def _commit(self, sha256):
+        self._file.close()
+        path = self._store.path(sha256)
+        if path.exists():
+            # Same content is already stored
+            os.unlink(self._temp_path)
+            self.created = False
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self._temp_path, path)
+        self.created = True
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._temp_path):
+            os.unlink(self._temp_path)
+
+
+class LocalFileSystemBlobStore(BlobStore):
+    """Blobs as files under root/<aa>/<bb>/<sha256>, written via a temp file and atomic rename"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.temp_dir = self.root / 'tmp'
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+
+    def path(self, sha256):
+        if not _SHA256_RE.match(sha256 or ''):
+            raise BlobNotFound(f"Invalid blob key {sha256!r}")
+        return self.root / sha256[:2] / sha256[2:4] / sha256
+
+    def open_writer(self):
+        return _LocalFileWriter(self)
+
+    def open(self, sha256):
+        try:
+            return open(self.path(sha256), 'rb')
+        except FileNotFoundError:
+            raise BlobNotFound(sha256)
+
+    def exists(self, sha256):
+        try:
+            return self.path(sha256).exists()
+        except BlobNotFound:
+            return False
+
+    def size(self, sha256):
+        try:
+            return self.path(sha256).stat().st_size
+        except FileNotFoundError:
+            raise BlobNotFound(sha256)
+
+    def delete(self, sha256):
+        try:
+            self.path(sha256).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def iter_base64_decode(text, chunk_chars=4 * CHUNK_SIZE):
+    """
+    Decode base64 text in chunks. Tolerates a "data:...;base64," prefix, whitespace
+    and URL-safe characters; raises ValueError on malformed input.
+    """
+    if text.startswith('data:') and ',' in text[:256]:
+        text = text.split(',', 1)[1]
+
+    carry = ''
+    for start in range(0, len(text), chunk_chars):
+        chunk = carry + _WHITESPACE_RE.sub('', text[start:start + chunk_chars])
+        usable = len(chunk) - len(chunk) % 4
+        carry = chunk[usable:]
+        if usable:
+            yield _b64decode(chunk[:usable])
+    if carry:
+        yield _b64decode(carry + '=' * (-len(carry) % 4))
+
+
+def _b64decode(text):
+    try:
+        return base64.b64decode(text.replace('-', '+').replace('_', '/'), validate=True)
+    except binascii.Error as e:
+        raise ValueError(f"Invalid base64 data: {e}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """The configured BlobStore instance (created on first use)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = getattr(settings, 'BLOB_STORE', {})
+                backend = import_string(config.get('BACKEND', 'nexusapp.blobstore.LocalFileSystemBlobStore'))
+                options = config.get('OPTIONS', {'root': Path(settings.BASE_DIR) / 'blobs'})
+                _store = backend(**options)
+    return _store
+
+
+# (model label, field) pairs whose rows keep the blob named by that field alive
+_references = [('nexusapp.LabReport', 'file_sha256'), ('nexusapp.LabReportDerivative', 'file_sha256')]
+
+
+def register_blob_reference(model, field):
+    """Count rows of `model` (an "app_label.Model" label) as references to the blob named by `field`"""
+    if (model, field) not in _references:
+        _references.append((model, field))
+
+
+def is_blob_referenced(sha256):
+    from django.apps import apps
+
+    return any(apps.get_model(model).objects.filter(**{field: sha256}).exists() for model, field in _references)
+
+
+def lock_blob(sha256):
+    """Take the blob's row lock until the current transaction ends; call inside transaction.atomic()"""
+    from .models import Blob
+
+    Blob.objects.get_or_create(sha256=sha256)
+    Blob.objects.select_for_update().get(sha256=sha256)
+
+
+@contextmanager
+def referencing_blob(writer):
+    """
+    Commit an open BlobWriter and yield its sha256 inside a transaction holding the
+    blob's lock. Create the row that references the blob inside the block:
+
+        writer = get_blob_store().write_bytes(data)
+        with referencing_blob(writer) as file_sha256:
+            LabReport.objects.create(..., file_sha256=file_sha256)
+
+    The file is placed under the lock, so it is stored again if a release removed
+    it meanwhile. If the block raises, a blob this writer created is released.
+    """
+    sha256 = writer.digest()
+    try:
+        with transaction.atomic():
+            lock_blob(sha256)
+            writer.close()
+            yield sha256
+    except BaseException:
+        if writer.sha256 is None:
+            writer.abort()
+        elif writer.created:
+            release_unreferenced_blob(sha256)
+        raise
+
+
+def release_unreferenced_blob(sha256):
+    """
+    Delete a blob once the current transaction commits, unless a row references it
+    by then. Blobs are shared by identical uploads, so a blob may only be deleted
+    when nothing else uses it.
+    """
+    from .models import Blob
+
+    def release():
+        with transaction.atomic():
+            lock_blob(sha256)
+            if not is_blob_referenced(sha256):
+                get_blob_store().delete(sha256)
+                Blob.objects.filter(sha256=sha256).delete()
+
+    if sha256:
+        transaction.on_commit(release)
+
+
+def _release_lab_report_blob(sender, instance, **kwargs):
+    release_unreferenced_blob(instance.file_sha256)
+
+
+def connect_signals():
+    post_delete.connect(_release_lab_report_blob, sender='nexusapp.LabReport', dispatch_uid='lab_report_blob_release')
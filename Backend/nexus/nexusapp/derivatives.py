@@ -0,0 +1,159 @@
+"""
+Thumbnail and preview renditions of lab report images.
+
+When an image lab report is stored, a job is queued (nexusapp.jobs, run by
+`manage.py run_jobs`) to render a small thumbnail and a medium preview with
+Pillow. They are saved to the blob store and recorded as LabReportDerivative rows. Rows are
+keyed by the source file's SHA-256, so re-uploading the same image costs
+nothing. A list view can then show a few KB per report instead of the whole
+original.
+
+Renditions are WebP (JPEG when Pillow lacks WebP support). If a rendition is
+requested before the job has run (or for reports stored before this existed),
+it is rendered on demand.
+"""
+
+import io
+
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete, post_save
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from .blobstore import BlobNotFound, get_blob_store, referencing_blob, release_unreferenced_blob
+from .jobs import enqueue
+
+
+GENERATE_DERIVATIVES_TASK = 'nexusapp.derivatives.generate_derivatives_task'
+
+# Bounding box (width, height) of each rendition; aspect ratio is preserved
+DERIVATIVE_SIZES = {
+    'thumbnail': (256, 256),
+    'preview': (1024, 1024),
+}
+
+if features.check('webp'):
+    DERIVATIVE_FORMAT, DERIVATIVE_CONTENT_TYPE = 'WEBP', 'image/webp'
+else:
+    DERIVATIVE_FORMAT, DERIVATIVE_CONTENT_TYPE = 'JPEG', 'image/jpeg'
+
+DERIVATIVE_QUALITY = 80
+
+
+class DerivativeError(Exception):
+    """The source file can't be rendered (missing, or not a readable image)"""
+
+
+def _render(image, kind):
+    rendition = image.copy()
+    rendition.thumbnail(DERIVATIVE_SIZES[kind], Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    rendition.save(buffer, DERIVATIVE_FORMAT, quality=DERIVATIVE_QUALITY, method=4 if DERIVATIVE_FORMAT == 'WEBP' else 0)
+    return buffer.getvalue(), rendition.size
+
+
+def _load_source(source_sha256):
+    """Decode the source image, downscaled during decode where the format allows (JPEG)"""
+    largest = max(DERIVATIVE_SIZES.values())
+    try:
+        with get_blob_store().open(source_sha256) as f:
+            image = Image.open(f)
+            # JPEG can decode straight to a 1/2, 1/4 or 1/8 scale no smaller than requested
+            image.draft('RGB', largest)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except BlobNotFound:
+        raise DerivativeError(f"Source file {source_sha256} is missing from storage")
+    except UnidentifiedImageError:
+        raise DerivativeError("Source file is not a readable image")
+    except (OSError, Image.DecompressionBombError) as e:
+        raise DerivativeError(f"Source image could not be decoded: {e}")
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    if DERIVATIVE_FORMAT == 'JPEG' and image.mode == 'RGBA':
+        image = image.convert('RGB')
+    return image
+
+
+def generate_derivatives(source_sha256, kinds=None):
+    """
+    Render and store the missing renditions of an image; returns {kind: LabReportDerivative}.
+    Raises DerivativeError if the source can't be rendered.
+    """
+    from .models import LabReportDerivative
+
+    kinds = list(kinds or DERIVATIVE_SIZES)
+    derivatives = {
+        derivative.kind: derivative
+        for derivative in LabReportDerivative.objects.filter(source_sha256=source_sha256, kind__in=kinds)
+    }
+    missing = [kind for kind in kinds if kind not in derivatives]
+    if not missing:
+        return derivatives
+
+    image = _load_source(source_sha256)
+    blob_store = get_blob_store()
+    for kind in missing:
+        data, (width, height) = _render(image, kind)
+        writer = blob_store.write_bytes(data)
+        try:
+            with referencing_blob(writer) as file_sha256:
+                derivatives[kind] = LabReportDerivative.objects.create(
+                    source_sha256=source_sha256,
+                    kind=kind,
+                    file_sha256=file_sha256,
+                    content_type=DERIVATIVE_CONTENT_TYPE,
+                    file_size=writer.size,
+                    width=width,
+                    height=height
+                )
+        except IntegrityError:
+            # Rendered concurrently (background worker vs. on-demand request); same bytes either way
+            derivatives[kind] = LabReportDerivative.objects.get(source_sha256=source_sha256, kind=kind)
+    return derivatives
+
+
+def get_derivative(source_sha256, kind):
+    """The stored rendition of an image, rendering it now if needed; raises DerivativeError"""
+    return generate_derivatives(source_sha256, [kind])[kind]
+
+
+def generate_derivatives_task(payload):
+    """
+    Job task: render the missing renditions of a stored image.
+    payload: {"source_sha256": ...}; fails the job if the source can't be rendered.
+    """
+    derivatives = generate_derivatives(payload['source_sha256'])
+    return {'renditions': {kind: derivative.file_sha256 for kind, derivative in derivatives.items()}}
+
+
+def schedule_derivatives(source_sha256):
+    """Queue rendering of an image's renditions; the job becomes runnable when the current transaction commits"""
+    enqueue(GENERATE_DERIVATIVES_TASK, {'source_sha256': source_sha256})
+
+
+def _lab_report_saved(sender, instance, created, **kwargs):
+    if created and instance.file_sha256 and instance.is_image():
+        schedule_derivatives(instance.file_sha256)
+
+
+def _release_derivatives(sender, instance, **kwargs):
+    # Renditions are shared by every report with the same file: drop them with the last one
+    from .models import LabReportDerivative
+
+    source_sha256 = instance.file_sha256
+
+    def release():
+        if sender.objects.filter(file_sha256=source_sha256).exists():
+            return
+        for derivative in LabReportDerivative.objects.filter(source_sha256=source_sha256):
+            derivative.delete()
+            release_unreferenced_blob(derivative.file_sha256)
+
+    if source_sha256:
+        transaction.on_commit(release)
+
+
+def connect_signals():
+    post_save.connect(_lab_report_saved, sender='nexusapp.LabReport', dispatch_uid='lab_report_derivatives')
+    post_delete.connect(_release_derivatives, sender='nexusapp.LabReport', dispatch_uid='lab_report_derivatives_release')
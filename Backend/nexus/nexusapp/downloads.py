@@ -0,0 +1,156 @@
+"""
+Streaming downloads of blob-store files with HTTP caching and Range support.
+
+Blobs are content-addressed, so the SHA-256 key is a strong ETag: a client
+that already has the file gets a 304 (If-None-Match), and a client resuming or
+seeking in a large PDF can ask for a byte range (Range / If-Range). Bodies are
+streamed from the blob store in chunks, so memory use doesn't grow with file
+size.
+"""
+
+import base64
+import json
+import mimetypes
+import re
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from .blobstore import BlobNotFound, get_blob_store
+
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Multiple of 3 bytes so each chunk base64-encodes without padding
+BASE64_CHUNK_SIZE = 48 * 1024
+
+
+def _etag(sha256):
+    return f'"{sha256}"'
+
+
+def _etag_matches(header, etag):
+    """If-None-Match semantics: weak comparison against a comma-separated list or *"""
+    if header is None:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(candidate.strip().removeprefix('W/') == etag for candidate in header.split(','))
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single "bytes=" range, None to serve the whole file
+    (no/unsupported/multi-range header), or raises ValueError if the range is unsatisfiable.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:
+        # An empty file has no bytes to select
+        raise ValueError(header)
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def content_type_for(file_type):
+    content_type, _ = mimetypes.guess_type(f"file.{file_type}")
+    return content_type or 'application/octet-stream'
+
+
+def blob_response(request, sha256, size, filename, content_type, as_attachment=True):
+    """Stream a blob as the response body, honouring If-None-Match, Range and If-Range"""
+    etag = _etag(sha256)
+    headers = {
+        'ETag': etag,
+        'Accept-Ranges': 'bytes',
+        # Per-user content: browsers may keep it, but must revalidate (cheap 304s)
+        'Cache-Control': 'private, no-cache',
+    }
+
+    if _etag_matches(request.headers.get('If-None-Match'), etag):
+        return HttpResponse(status=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if if_range is None or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            return HttpResponse(status=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    blob_store = get_blob_store()
+    if byte_range is None:
+        status, start, length = 200, 0, size
+    else:
+        start, end = byte_range
+        status, length = 206, end - start + 1
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    response = StreamingHttpResponse(
+        blob_store.iter_chunks(sha256, start=start, length=length),
+        status=status,
+        content_type=content_type,
+        headers=headers,
+    )
+    response['Content-Length'] = str(length)
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return response
+
+
+def _iter_base64(chunks):
+    carry = b''
+    for chunk in chunks:
+        chunk = carry + chunk
+        usable = len(chunk) - len(chunk) % 3
+        carry = chunk[usable:]
+        if usable:
+            yield base64.b64encode(chunk[:usable])
+    if carry:
+        yield base64.b64encode(carry)
+
+
+def _open_object(obj, key):
+    """JSON for the dict `obj` left open after a new `key`, so the key's value can be streamed in"""
+    text = json.dumps(obj, cls=DjangoJSONEncoder)[:-1]
+    return f'{text}{", " if obj else ""}{json.dumps(key)}: '.encode()
+
+
+def stream_json_with_files(payload, list_key, items, data_key, sha256_key='file_sha256'):
+    """
+    Stream a JSON object: `payload` plus payload[list_key] = items, where every item
+    also gets item[data_key] = base64 of the blob item[sha256_key]. Files are read and
+    encoded chunk by chunk, so only one chunk is held in memory at a time.
+
+    Raises BlobNotFound before anything is sent if a file is missing, since an error
+    can't be reported once the response has started.
+    """
+    blob_store = get_blob_store()
+    for item in items:
+        if not blob_store.exists(item[sha256_key]):
+            raise BlobNotFound(item[sha256_key])
+
+    def generate():
+        yield _open_object(payload, list_key) + b'['
+        for i, item in enumerate(items):
+            yield (b', ' if i else b'') + _open_object(item, data_key) + b'"'
+            yield from _iter_base64(blob_store.iter_chunks(item[sha256_key], chunk_size=BASE64_CHUNK_SIZE))
+            yield b'"}'
+        yield b']}'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
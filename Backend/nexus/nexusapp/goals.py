@@ -0,0 +1,86 @@
+"""
+Effective nutrition goals.
+
+A user's effective goals are their UserNutritionGoals row (or the model
+defaults if they never set one), with the calorie and protein goals taken
+from their UserHealthProfile when they have one. Resolving them is read-only:
+the goals row is kept in sync with the health profile when the profile is
+written (see sync_goals_with_health_profile), not when goals are read.
+
+Resolved goals are cached per user and invalidated whenever either model is
+saved or deleted.
+"""
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from .models import UserHealthProfile, UserNutritionGoals
+
+
+def _cache_key(user_id):
+    return f"nexusapp:nutrition_goals:{user_id}"
+
+
+def get_effective_goals(user):
+    """
+    Return the user's effective goals as a UserNutritionGoals instance (unsaved if
+    the user has no goals row). Issues at most one query, and none when cached.
+    """
+    key = _cache_key(user.pk)
+    goals = cache.get(key)
+    if goals is None:
+        goals = _resolve_goals(user.pk)
+        cache.set(key, goals, settings.NUTRITION_GOALS_CACHE_TTL)
+    goals.user = user
+    return goals
+
+
+def _resolve_goals(user_id):
+    # One query: the user joined to both one-to-one relations
+    user = User.objects.select_related('health_profile', 'nutrition_goals').get(pk=user_id)
+
+    try:
+        goals = user.nutrition_goals
+    except UserNutritionGoals.DoesNotExist:
+        goals = UserNutritionGoals(user_id=user_id)
+
+    try:
+        health_profile = user.health_profile
+    except UserHealthProfile.DoesNotExist:
+        health_profile = None
+
+    if health_profile is not None:
+        goals.daily_calories_goal = health_profile.daily_calorie_goal
+        goals.daily_protein_goal = health_profile.daily_protein_goal
+
+    # Don't cache the joined user; get_effective_goals attaches the caller's
+    goals._state.fields_cache.pop('user', None)
+    return goals
+
+
+def sync_goals_with_health_profile(health_profile):
+    """Copy the health profile's calorie and protein goals onto the user's goals row (write path)"""
+    goals, _ = UserNutritionGoals.objects.update_or_create(
+        user=health_profile.user,
+        defaults={
+            'daily_calories_goal': health_profile.daily_calorie_goal,
+            'daily_protein_goal': health_profile.daily_protein_goal,
+        }
+    )
+    return goals
+
+
+def invalidate_goals_cache(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+def _invalidate_on_change(sender, instance, **kwargs):
+    invalidate_goals_cache(instance.user_id)
+
+
+def connect_signals():
+    for model in (UserNutritionGoals, UserHealthProfile):
+        post_save.connect(_invalidate_on_change, sender=model, dispatch_uid=f"nutrition_goals_cache_{model.__name__}_save")
+        post_delete.connect(_invalidate_on_change, sender=model, dispatch_uid=f"nutrition_goals_cache_{model.__name__}_delete")
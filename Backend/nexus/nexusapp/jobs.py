@@ -0,0 +1,159 @@
+"""
+Database-backed background job queue.
+
+Slow work (e.g. OCR of a lab report image) is recorded as a Job row by
+enqueue(), and the request returns immediately with the job id. Worker
+processes started by `manage.py run_jobs --workers N` poll the table, claim
+queued jobs and run them. Clients poll the job-status endpoint for the result.
+No external broker is needed, and throughput scales with the number of worker
+processes.
+
+A job is claimed with a conditional UPDATE (status queued -> running), so
+concurrent workers never run the same job twice on any database backend. Jobs
+left running by a worker that died are requeued (or failed, once out of
+attempts) after settings.JOB_TIMEOUT seconds.
+
+job_finished is sent (with the Job as `job`) once a job has succeeded or
+failed for good, so tasks can clean up whatever their payload refers to
+without breaking retries.
+"""
+
+import logging
+import os
+import signal
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+# Job worker processes run_jobs started on this host (1 when jobs run in-process);
+# tasks that start their own process pools divide the cores among them
+worker_count = 1
+
+# Queued job ids fetched per claim attempt, so racing workers fall through to the next one
+CLAIM_BATCH = 10
+
+# Delay before retrying a failed job, multiplied by the attempt number
+RETRY_DELAY = timedelta(seconds=30)
+
+# Sent with job=<Job> when a job reaches SUCCEEDED or FAILED (not when it is requeued for a retry)
+job_finished = Signal()
+
+
+def enqueue(task, payload=None, user=None, max_attempts=1):
+    """
+    Queue `task` (dotted path of a function taking the payload dict) and return the Job.
+    The row is written in the caller's transaction, so the job only becomes visible
+    to workers if that transaction commits.
+    """
+    from .models import Job
+
+    return Job.objects.create(task=task, payload=payload or {}, user=user, max_attempts=max_attempts)
+
+
+def claim_next(worker_id):
+    """Claim the oldest runnable queued job for `worker_id`, or return None if there is none"""
+    from .models import Job
+
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+        .order_by('run_after', 'id')
+        .values_list('id', flat=True)[:CLAIM_BATCH]
+    )
+    for job_id in candidates:
+        claimed = Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            locked_by=worker_id,
+            started_at=now,
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    """Run a claimed job and record its outcome"""
+    from .models import Job
+
+    try:
+        result = import_string(job.task)(job.payload)
+    except Exception as e:
+        logger.exception("Job %s (%s) failed on attempt %s", job.id, job.task, job.attempts)
+        job.error = f"{type(e).__name__}: {e}"
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + RETRY_DELAY * job.attempts
+        else:
+            job.status = Job.FAILED
+    else:
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'run_after', 'finished_at'])
+    if job.status != Job.QUEUED:
+        job_finished.send(sender=Job, job=job)
+    return job
+
+
+def requeue_stale_jobs(timeout=None):
+    """Recover jobs whose worker died mid-run; returns the number of jobs touched"""
+    from .models import Job
+
+    timeout = timeout or getattr(settings, 'JOB_TIMEOUT', 600)
+    stale = Job.objects.filter(status=Job.RUNNING, started_at__lt=timezone.now() - timedelta(seconds=timeout))
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(status=Job.QUEUED, run_after=timezone.now())
+    failed = 0
+    # Out of attempts: fail them one by one, so job_finished only goes out for rows this call updated
+    for job in stale:
+        job.status = Job.FAILED
+        job.error = 'Worker stopped before the job finished'
+        job.finished_at = timezone.now()
+        if Job.objects.filter(id=job.id, status=Job.RUNNING, started_at=job.started_at).update(
+                status=job.status, error=job.error, finished_at=job.finished_at):
+            failed += 1
+            job_finished.send(sender=Job, job=job)
+    return requeued + failed
+
+
+def work(stop, worker_id=None, poll_interval=1.0, burst=False):
+    """
+    Claim and run jobs until `stop` (a threading or multiprocessing Event) is set.
+    With burst=True, return as soon as the queue is empty.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    while not stop.is_set():
+        close_old_connections()
+        job = claim_next(worker_id)
+        if job is None:
+            if burst:
+                break
+            stop.wait(poll_interval)
+            continue
+        run_job(job)
+    connections.close_all()
+
+
+def worker_process(stop, poll_interval=1.0, burst=False, workers=1):
+    """Entry point of a run_jobs worker process; `workers` is how many run side by side"""
+    global worker_count
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        # Started with the "spawn" method: this is a fresh interpreter
+        django.setup()
+    worker_count = workers
+    # Ctrl-C reaches the whole process group; let the parent decide when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(stop, poll_interval=poll_interval, burst=burst)
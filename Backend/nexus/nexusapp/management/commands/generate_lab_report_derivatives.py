@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from nexusapp.derivatives import DerivativeError, generate_derivatives
+from nexusapp.models import LabReport
+
+
+class Command(BaseCommand):
+    help = "Render missing thumbnails/previews for image lab reports (e.g. reports stored before renditions existed)"
+
+    def handle(self, *args, **options):
+        image_types = ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff']
+        source_hashes = (
+            LabReport.objects.filter(file_type__in=image_types)
+            .values_list('file_sha256', flat=True)
+            .distinct()
+        )
+
+        rendered = failed = 0
+        for source_sha256 in source_hashes.iterator():
+            try:
+                generate_derivatives(source_sha256)
+                rendered += 1
+            except DerivativeError as e:
+                failed += 1
+                self.stderr.write(f"{source_sha256}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Renditions ready for {rendered} image(s), {failed} failed"))
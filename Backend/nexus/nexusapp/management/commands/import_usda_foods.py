@@ -0,0 +1,125 @@
+"""
+Bulk-import USDA FoodData Central Foundation + SR Legacy foods into USDAFood.
+
+Accepts the official downloads from https://fdc.nal.usda.gov/download-datasets:
+  - JSON files (FoodData_Central_foundation_food_json_*.json,
+    FoodData_Central_sr_legacy_food_json_*.json)
+  - CSV directories containing food.csv, nutrient.csv and food_nutrient.csv
+
+    python manage.py import_usda_foods path/to/foundation.json path/to/sr_legacy_csv/
+"""
+
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nexusapp.models import USDAFood
+from nexusapp.usda import NUTRIENT_KEYS, extract_nutrients, local_food_index, normalize_food_name, nutrient_key
+
+
+# JSON top-level keys and CSV data_type values we import, mapped to a display name
+JSON_FOOD_KEYS = {'FoundationFoods': 'Foundation', 'SRLegacyFoods': 'SR Legacy'}
+CSV_DATA_TYPES = {'foundation_food': 'Foundation', 'sr_legacy_food': 'SR Legacy'}
+
+
+class Command(BaseCommand):
+    help = "Import USDA FoodData Central Foundation / SR Legacy dumps (JSON files or CSV directories)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="JSON dump files and/or CSV dump directories")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--replace', action='store_true',
+                            help="Delete all previously imported foods before importing")
+
+    def handle(self, *args, **options):
+        if options['replace']:
+            deleted, _ = USDAFood.objects.all().delete()
+            self.stdout.write(f"Deleted {deleted} previously imported food(s)")
+
+        total = 0
+        for raw_path in options['paths']:
+            path = Path(raw_path)
+            if path.is_dir():
+                foods = self._read_csv_dir(path)
+            elif path.suffix.lower() == '.json':
+                foods = self._read_json(path)
+            else:
+                raise CommandError(f"{path} is neither a CSV directory nor a .json file")
+
+            imported = self._save(foods, options['batch_size'])
+            total += imported
+            self.stdout.write(f"{path}: imported {imported} food(s)")
+
+        local_food_index.reload()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {total} food(s); local index now holds {len(local_food_index)}"
+        ))
+
+    def _read_json(self, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+
+        for key, data_type in JSON_FOOD_KEYS.items():
+            for food in data.get(key, []):
+                yield self._food(food['fdcId'], food.get('description', ''), data_type,
+                                 extract_nutrients(food.get('foodNutrients', [])))
+
+    def _read_csv_dir(self, path):
+        for name in ('food.csv', 'nutrient.csv', 'food_nutrient.csv'):
+            if not (path / name).exists():
+                raise CommandError(f"{path} is missing {name}")
+
+        foods = {}
+        for row in self._csv_rows(path / 'food.csv'):
+            data_type = CSV_DATA_TYPES.get(row['data_type'])
+            if data_type:
+                foods[int(row['fdc_id'])] = (row['description'], data_type, [])
+
+        # Only keep the nutrients we map, so food_nutrient.csv can be streamed
+        nutrients = {}
+        for row in self._csv_rows(path / 'nutrient.csv'):
+            if nutrient_key(row['name']):
+                nutrients[row['id']] = {'name': row['name'], 'unitName': row['unit_name']}
+
+        for row in self._csv_rows(path / 'food_nutrient.csv'):
+            nutrient = nutrients.get(row['nutrient_id'])
+            food = foods.get(int(row['fdc_id'])) if nutrient else None
+            if food and row['amount']:
+                food[2].append({'nutrient': nutrient, 'amount': float(row['amount'])})
+
+        for fdc_id, (description, data_type, food_nutrients) in foods.items():
+            yield self._food(fdc_id, description, data_type, extract_nutrients(food_nutrients))
+
+    def _csv_rows(self, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+
+    def _food(self, fdc_id, description, data_type, nutrients):
+        description = description[:255]
+        return USDAFood(
+            fdc_id=int(fdc_id),
+            description=description,
+            normalized_description=normalize_food_name(description),
+            data_type=data_type,
+            **nutrients
+        )
+
+    def _save(self, foods, batch_size):
+        update_fields = ['description', 'normalized_description', 'data_type', 'imported_at', *NUTRIENT_KEYS]
+        batch, imported = [], 0
+        for food in foods:
+            batch.append(food)
+            if len(batch) >= batch_size:
+                imported += self._flush(batch, update_fields)
+                batch = []
+        if batch:
+            imported += self._flush(batch, update_fields)
+        return imported
+
+    def _flush(self, batch, update_fields):
+        USDAFood.objects.bulk_create(
+            batch, update_conflicts=True, unique_fields=['fdc_id'], update_fields=update_fields
+        )
+        return len(batch)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from nexusapp.usda import usda_cache
+
+
+class Command(BaseCommand):
+    help = "Delete expired rows from the USDA lookup cache tables"
+
+    def handle(self, *args, **options):
+        deleted = usda_cache.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired USDA cache row(s)"))
@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from nexusapp.models import DailyNutritionRollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild DailyNutritionRollup rows from raw FoodNutrition entries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="Only rebuild rollups for this user")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['username']:
+            try:
+                user = User.objects.get(username=options['username'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['username']!r} does not exist")
+
+        written = DailyNutritionRollup.rebuild(user=user)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily nutrition rollup(s)"))
@@ -0,0 +1,74 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from nexusapp import jobs
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue with a pool of worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            help="Number of worker processes (default: settings.JOB_WORKERS)"
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help="Seconds an idle worker waits before checking the queue again"
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help="Exit once the queue is empty instead of waiting for new jobs"
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or getattr(settings, 'JOB_WORKERS', 2)
+        if workers < 1:
+            raise CommandError("--workers must be at least 1")
+        poll_interval = options['poll_interval']
+        burst = options['burst']
+
+        recovered = jobs.requeue_stale_jobs()
+        if recovered:
+            self.stdout.write(f"Recovered {recovered} stale job(s)")
+
+        if workers == 1:
+            stop = threading.Event()
+            self._stop_on_signals(stop)
+            self.stdout.write("Running jobs in-process (Ctrl-C to stop)")
+            jobs.work(stop, poll_interval=poll_interval, burst=burst)
+            return
+
+        # Children must not share the parent's database connection
+        connections.close_all()
+        stop = multiprocessing.Event()
+        processes = [
+            multiprocessing.Process(target=jobs.worker_process, args=(stop, poll_interval, burst, workers), name=f'job-worker-{i}')
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        self._stop_on_signals(stop)
+        self.stdout.write(f"Started {workers} job worker processes (Ctrl-C to stop)")
+
+        stale_check_interval = max(poll_interval, 60)
+        while any(process.is_alive() for process in processes):
+            for process in processes:
+                process.join(timeout=stale_check_interval / workers)
+            if not stop.is_set():
+                jobs.requeue_stale_jobs()
+
+        self.stdout.write(self.style.SUCCESS("Job workers stopped"))
+
+    def _stop_on_signals(self, stop):
+        def handler(signum, frame):
+            self.stdout.write("Stopping after the current jobs finish...")
+            stop.set()
+
+        signal.signal(signal.SIGINT, handler)
+        signal.signal(signal.SIGTERM, handler)
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nexusapp', '0019_labreport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='USDAFoodNutrientCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fdc_id', models.IntegerField(unique=True)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('calories', models.FloatField(default=0.0)),
+                ('protein', models.FloatField(default=0.0)),
+                ('carbohydrates', models.FloatField(default=0.0)),
+                ('fat', models.FloatField(default=0.0)),
+                ('fiber', models.FloatField(default=0.0)),
+                ('sugar', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='USDAFoodSearchCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_name', models.CharField(max_length=255, unique=True)),
+                ('fdc_id', models.IntegerField(help_text='FoodData Central ID of the most relevant match')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
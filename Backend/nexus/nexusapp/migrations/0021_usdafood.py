@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nexusapp', '0020_usda_lookup_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='USDAFood',
+            fields=[
+                ('fdc_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('description', models.CharField(max_length=255)),
+                ('normalized_description', models.CharField(db_index=True, max_length=255)),
+                ('data_type', models.CharField(help_text='Foundation or SR Legacy', max_length=20)),
+                ('calories', models.FloatField(default=0.0)),
+                ('protein', models.FloatField(default=0.0)),
+                ('carbohydrates', models.FloatField(default=0.0)),
+                ('fat', models.FloatField(default=0.0)),
+                ('fiber', models.FloatField(default=0.0)),
+                ('sugar', models.FloatField(default=0.0)),
+            ],
+        ),
+    ]
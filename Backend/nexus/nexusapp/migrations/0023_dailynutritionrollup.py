@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+
+TOTAL_FIELDS = ('total_calories', 'total_protein', 'total_carbs', 'total_fat', 'total_fiber', 'total_sugar')
+
+
+def backfill_rollups(apps, schema_editor):
+    FoodNutrition = apps.get_model('nexusapp', 'FoodNutrition')
+    DailyNutritionRollup = apps.get_model('nexusapp', 'DailyNutritionRollup')
+
+    rows = FoodNutrition.objects.filter(user__isnull=False).annotate(
+        day=TruncDate('created_at')
+    ).values('user_id', 'day').annotate(
+        entries_count=Count('id'),
+        **{field: Coalesce(Sum(field), Value(0.0)) for field in TOTAL_FIELDS}
+    ).order_by()
+
+    DailyNutritionRollup.objects.bulk_create(
+        [DailyNutritionRollup(user_id=row.pop('user_id'), date=row.pop('day'), **row) for row in rows],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nexusapp', '0022_foodnutrition_user_created_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyNutritionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_calories', models.FloatField(default=0.0)),
+                ('total_protein', models.FloatField(default=0.0)),
+                ('total_carbs', models.FloatField(default=0.0)),
+                ('total_fat', models.FloatField(default=0.0)),
+                ('total_fiber', models.FloatField(default=0.0)),
+                ('total_sugar', models.FloatField(default=0.0)),
+                ('entries_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_nutrition_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='unique_daily_nutrition_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nexusapp', '0023_dailynutritionrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='foodnutrition',
+            name='nexusapp_fo_user_id_5ac2e7_idx',
+        ),
+        migrations.AddIndex(
+            model_name='foodnutrition',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='nexusapp_fo_user_id_4ff5bb_idx'),
+        ),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:40
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# The blob store layout as of this migration (nexusapp.blobstore.LocalFileSystemBlobStore):
+# root/<aa>/<bb>/<sha256>, written through root/tmp. Kept here so later changes to the app's
+# blob store code can't change what this migration does.
+LOCAL_BACKEND = 'nexusapp.blobstore.LocalFileSystemBlobStore'
+CHUNK_CHARS = 256 * 1024
+
+
+def blob_root():
+    config = getattr(settings, 'BLOB_STORE', {})
+    if config.get('BACKEND', LOCAL_BACKEND) != LOCAL_BACKEND:
+        raise RuntimeError(
+            "Migration 0025 moves lab report files into the local blob store; "
+            "run it with BLOB_STORE['BACKEND'] = %r and copy the blobs afterwards" % LOCAL_BACKEND
+        )
+    return Path(config.get('OPTIONS', {}).get('root', Path(settings.BASE_DIR) / 'blobs'))
+
+
+def blob_path(root, sha256):
+    return root / sha256[:2] / sha256[2:4] / sha256
+
+
+def iter_base64_decode(text):
+    """Decode base64 text in chunks, tolerating a data: prefix, whitespace and URL-safe characters"""
+    if text.startswith('data:') and ',' in text[:256]:
+        text = text.split(',', 1)[1]
+    carry = ''
+    for start in range(0, len(text), CHUNK_CHARS):
+        chunk = carry + re.sub(r'\s+', '', text[start:start + CHUNK_CHARS])
+        usable = len(chunk) - len(chunk) % 4
+        carry = chunk[usable:]
+        if usable:
+            yield b64decode(chunk[:usable])
+    if carry:
+        yield b64decode(carry + '=' * (-len(carry) % 4))
+
+
+def b64decode(text):
+    try:
+        return base64.b64decode(text.replace('-', '+').replace('_', '/'), validate=True)
+    except binascii.Error as e:
+        raise ValueError(f"Invalid base64 data: {e}")
+
+
+def save_base64(root, text):
+    """Store decoded base64 text as a blob; returns (sha256, size)"""
+    temp_dir = root / 'tmp'
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    digest, size = hashlib.sha256(), 0
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter_base64_decode(text):
+                digest.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+        sha256 = digest.hexdigest()
+        path = blob_path(root, sha256)
+        if path.exists():
+            os.unlink(temp_path)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return sha256, size
+
+
+def move_files_to_blob_store(apps, schema_editor):
+    """Decode each report's base64 text straight into the blob store, one row at a time"""
+    LabReport = apps.get_model('nexusapp', 'LabReport')
+    root = blob_root()
+    report_ids = list(LabReport.objects.values_list('id', flat=True))
+    for report_id in report_ids:
+        text = LabReport.objects.filter(id=report_id).values_list('report_file_base64', flat=True).get()
+        file_sha256, file_size = save_base64(root, text or '')
+        LabReport.objects.filter(id=report_id).update(file_sha256=file_sha256, file_size=file_size)
+
+
+def restore_base64_files(apps, schema_editor):
+    LabReport = apps.get_model('nexusapp', 'LabReport')
+    root = blob_root()
+    for report in LabReport.objects.only('id', 'file_sha256').iterator(chunk_size=100):
+        text = base64.b64encode(blob_path(root, report.file_sha256).read_bytes()).decode()
+        LabReport.objects.filter(id=report.id).update(report_file_base64=text)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nexusapp', '0024_foodnutrition_history_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labreport',
+            name='file_sha256',
+            field=models.CharField(db_index=True, default='', help_text='SHA-256 of the file contents; key of the file in the blob store', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='labreport',
+            name='report_file_base64',
+            field=models.TextField(blank=True, default='', help_text='Lab report file stored as base64 string'),
+        ),
+        migrations.RunPython(move_files_to_blob_store, restore_base64_files),
+        migrations.RemoveField(
+            model_name='labreport',
+            name='report_file_base64',
+        ),
+    ]
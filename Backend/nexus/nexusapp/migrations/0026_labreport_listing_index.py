@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nexusapp', '0025_labreport_file_sha256'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='labreport',
+            index=models.Index(fields=['user', 'report_date', 'created_at', 'id'], name='nexusapp_la_user_id_79b1c2_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nexusapp', '0026_labreport_listing_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabReportDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_sha256', models.CharField(help_text='SHA-256 of the original lab report file', max_length=64)),
+                ('kind', models.CharField(choices=[('thumbnail', 'Thumbnail'), ('preview', 'Preview')], max_length=20)),
+                ('file_sha256', models.CharField(help_text='SHA-256 of the rendered image; key in the blob store', max_length=64)),
+                ('content_type', models.CharField(max_length=50)),
+                ('file_size', models.IntegerField(help_text='Rendered image size in bytes')),
+                ('width', models.IntegerField()),
+                ('height', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('source_sha256', 'kind'), name='unique_lab_report_derivative')],
+            },
+        ),
+    ]
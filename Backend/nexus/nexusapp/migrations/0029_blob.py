@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nexusapp', '0028_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='labreportderivative',
+            name='file_sha256',
+            field=models.CharField(db_index=True, help_text='SHA-256 of the rendered image; key in the blob store', max_length=64),
+        ),
+    ]
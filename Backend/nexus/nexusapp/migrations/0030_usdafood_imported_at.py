@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nexusapp', '0029_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usdafood',
+            name='imported_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
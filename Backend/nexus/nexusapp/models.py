@@ -1,5 +1,6 @@
 
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 class UserBasicData(models.Model):
@@ -201,6 +202,15 @@ class FoodNutrition(models.Model):
 	
 	created_at = models.DateTimeField(auto_now_add=True)
 	
+	# Fields summed by get_daily_totals and kept per day in DailyNutritionRollup
+	TOTAL_FIELDS = ('total_calories', 'total_protein', 'total_carbs', 'total_fat', 'total_fiber', 'total_sugar')
+	
+	class Meta:
+		indexes = [
+			# Serves per-day totals and (created_at, id) keyset pagination of a user's history
+			models.Index(fields=['user', 'created_at', 'id']),
+		]
+	
 	def __str__(self):
 		return f"{self.food_name} - {self.quantity}{self.unit}"
 	
@@ -217,8 +227,8 @@ class FoodNutrition(models.Model):
 		}
 		return self.quantity * conversion_factors.get(self.unit, 1.0)
 	
-	def save(self, *args, **kwargs):
-		# Calculate total values based on quantity converted to grams
+	def calculate_totals(self):
+		"""Derive the total_* fields from the per-100g values and the quantity"""
 		if self.quantity and self.calories_per_100g:
 			quantity_in_grams = self.convert_to_grams()
 			multiplier = quantity_in_grams / 100
@@ -228,33 +238,226 @@ class FoodNutrition(models.Model):
 			self.total_fat = (self.fat_per_100g or 0) * multiplier
 			self.total_fiber = (self.fiber_per_100g or 0) * multiplier
 			self.total_sugar = (self.sugar_per_100g or 0) * multiplier
+	
+	def totals(self):
+		"""This entry's total_* values, with missing values as 0"""
+		return {field: getattr(self, field) or 0.0 for field in self.TOTAL_FIELDS}
+	
+	def log_date(self):
+		"""Local calendar day this entry counts towards"""
+		return timezone.localdate(self.created_at)
+	
+	def save(self, *args, **kwargs):
+		# Calculate total values based on quantity converted to grams
+		self.calculate_totals()
 		super().save(*args, **kwargs)
 	
+	@classmethod
+	def day_bounds(cls, start_date, end_date):
+		"""Aware datetimes spanning start_date..end_date inclusive, so filters stay index-friendly"""
+		from datetime import datetime, time, timedelta
+		start = timezone.make_aware(datetime.combine(start_date, time.min))
+		end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+		return start, end
+	
+	@classmethod
+	def _totals_aggregates(cls):
+		from django.db.models import Count, Sum, Value
+		from django.db.models.functions import Coalesce
+		aggregates = {field: Coalesce(Sum(field), Value(0.0)) for field in cls.TOTAL_FIELDS}
+		aggregates['entries_count'] = Count('id')
+		return aggregates
+	
 	@classmethod
 	def get_daily_totals(cls, user, date=None):
-		"""Calculate total nutrition for a user on a specific date"""
+		"""Calculate total nutrition for a user on a specific date (single aggregate query)"""
 		from datetime import date as dt_date
 		if date is None:
 			date = dt_date.today()
 		
-		# Get all food entries for the user on the specified date
-		entries = cls.objects.filter(
+		start, end = cls.day_bounds(date, date)
+		return cls.objects.filter(
 			user=user,
-			created_at__date=date
-		)
+			created_at__gte=start,
+			created_at__lt=end
+		).aggregate(**cls._totals_aggregates())
+
+
+class DailyNutritionRollup(models.Model):
+	"""
+	Per-user, per-day nutrition totals, maintained incrementally as FoodNutrition entries are
+	added, edited and deleted. Rebuild with `manage.py rebuild_nutrition_rollups` if it drifts.
+	"""
+	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_nutrition_rollups')
+	date = models.DateField()
+	total_calories = models.FloatField(default=0.0)
+	total_protein = models.FloatField(default=0.0)
+	total_carbs = models.FloatField(default=0.0)
+	total_fat = models.FloatField(default=0.0)
+	total_fiber = models.FloatField(default=0.0)
+	total_sugar = models.FloatField(default=0.0)
+	entries_count = models.IntegerField(default=0)
+	updated_at = models.DateTimeField(auto_now=True)
+	
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_nutrition_rollup'),
+		]
+	
+	def __str__(self):
+		return f"{self.user.username} - {self.date}"
+	
+	def as_totals(self):
+		"""Same shape as FoodNutrition.get_daily_totals"""
+		totals = {field: getattr(self, field) for field in FoodNutrition.TOTAL_FIELDS}
+		totals['entries_count'] = self.entries_count
+		return totals
+	
+	@classmethod
+	def get_totals(cls, user, date):
+		"""Totals for a user on a date, read from the single rollup row (zeros if nothing was logged)"""
+		rollup = cls.objects.filter(user=user, date=date).first()
+		if rollup is None:
+			rollup = cls(user=user, date=date)
+		return rollup.as_totals()
+	
+	@classmethod
+	def apply_delta(cls, user_id, date, totals, entries_count):
+		"""
+		Add totals (a dict keyed by FoodNutrition.TOTAL_FIELDS) and entries_count to a day's rollup.
+		Negative values subtract. Call inside the transaction that changes the entries.
+		"""
+		from django.db.models import F
+		rollup, _ = cls.objects.get_or_create(user_id=user_id, date=date)
+		updates = {field: F(field) + totals.get(field, 0.0) for field in FoodNutrition.TOTAL_FIELDS}
+		cls.objects.filter(pk=rollup.pk).update(entries_count=F('entries_count') + entries_count, **updates)
 		
-		totals = {
-			'total_calories': sum(entry.total_calories or 0 for entry in entries),
-			'total_protein': sum(entry.total_protein or 0 for entry in entries),
-			'total_carbs': sum(entry.total_carbs or 0 for entry in entries),
-			'total_fat': sum(entry.total_fat or 0 for entry in entries),
-			'total_fiber': sum(entry.total_fiber or 0 for entry in entries),
-			'total_sugar': sum(entry.total_sugar or 0 for entry in entries),
-			'entries_count': entries.count()
-		}
+		# Snap an emptied day back to exact zeros rather than leaving float residue
+		if entries_count < 0:
+			cls.objects.filter(pk=rollup.pk, entries_count__lte=0).update(
+				entries_count=0, **dict.fromkeys(FoodNutrition.TOTAL_FIELDS, 0.0)
+			)
+	
+	@classmethod
+	def add_entries(cls, entries):
+		"""Add newly saved FoodNutrition entries, one update per affected (user, day)"""
+		deltas = {}
+		for entry in entries:
+			if entry.user_id is None:
+				continue
+			key = (entry.user_id, entry.log_date())
+			totals, count = deltas.get(key, (dict.fromkeys(FoodNutrition.TOTAL_FIELDS, 0.0), 0))
+			for field, value in entry.totals().items():
+				totals[field] += value
+			deltas[key] = (totals, count + 1)
 		
-		return totals
+		for (user_id, date), (totals, count) in deltas.items():
+			cls.apply_delta(user_id, date, totals, count)
+	
+	@classmethod
+	def remove_entry(cls, entry):
+		"""Subtract a FoodNutrition entry that is being deleted"""
+		if entry.user_id is None:
+			return
+		totals = {field: -value for field, value in entry.totals().items()}
+		cls.apply_delta(entry.user_id, entry.log_date(), totals, -1)
+	
+	@classmethod
+	def update_entry(cls, entry, old_totals):
+		"""Apply the change in an edited entry's totals (its day does not change)"""
+		if entry.user_id is None:
+			return
+		totals = {field: value - old_totals[field] for field, value in entry.totals().items()}
+		cls.apply_delta(entry.user_id, entry.log_date(), totals, 0)
+	
+	@classmethod
+	def rebuild(cls, user=None):
+		"""Recompute rollups from raw FoodNutrition entries (all users, or just one). Returns rows written."""
+		from django.db import transaction
+		from django.db.models import Count, Sum, Value
+		from django.db.models.functions import Coalesce, TruncDate
+		
+		entries = FoodNutrition.objects.filter(user__isnull=False)
+		rollups = cls.objects.all()
+		if user is not None:
+			entries = entries.filter(user=user)
+			rollups = rollups.filter(user=user)
+		
+		rows = entries.annotate(day=TruncDate('created_at')).values('user_id', 'day').annotate(
+			entries_count=Count('id'),
+			**{field: Coalesce(Sum(field), Value(0.0)) for field in FoodNutrition.TOTAL_FIELDS}
+		).order_by()
+		
+		with transaction.atomic():
+			rollups.delete()
+			created = cls.objects.bulk_create(
+				[cls(user_id=row.pop('user_id'), date=row.pop('day'), **row) for row in rows],
+				batch_size=1000
+			)
+		return len(created)
+
+
+class USDAFoodSearchCache(models.Model):
+	"""Cached USDA search result: normalized food name -> FoodData Central ID"""
+	normalized_name = models.CharField(max_length=255, unique=True)
+	fdc_id = models.IntegerField(help_text="FoodData Central ID of the most relevant match")
+	updated_at = models.DateTimeField(auto_now=True, db_index=True)
+	
+	def __str__(self):
+		return f"{self.normalized_name} -> {self.fdc_id}"
+
 
+class USDAFoodNutrientCache(models.Model):
+	"""Cached per-100g nutrient record for a FoodData Central food"""
+	fdc_id = models.IntegerField(unique=True)
+	description = models.CharField(max_length=255, blank=True)
+	calories = models.FloatField(default=0.0)
+	protein = models.FloatField(default=0.0)
+	carbohydrates = models.FloatField(default=0.0)
+	fat = models.FloatField(default=0.0)
+	fiber = models.FloatField(default=0.0)
+	sugar = models.FloatField(default=0.0)
+	updated_at = models.DateTimeField(auto_now=True, db_index=True)
+	
+	def __str__(self):
+		return f"{self.fdc_id} - {self.description}"
+	
+	def as_food_record(self):
+		"""Return the record in the shape used by nexusapp.usda"""
+		return {
+			'fdc_id': self.fdc_id,
+			'description': self.description,
+			'nutrients': {
+				'calories': self.calories,
+				'protein': self.protein,
+				'carbohydrates': self.carbohydrates,
+				'fat': self.fat,
+				'fiber': self.fiber,
+				'sugar': self.sugar
+			}
+		}
+
+
+class USDAFood(models.Model):
+	"""
+	Local copy of a USDA FoodData Central food (Foundation / SR Legacy), imported
+	with `manage.py import_usda_foods`. Nutrient values are per 100g.
+	"""
+	fdc_id = models.IntegerField(primary_key=True)
+	description = models.CharField(max_length=255)
+	normalized_description = models.CharField(max_length=255, db_index=True)
+	data_type = models.CharField(max_length=20, help_text="Foundation or SR Legacy")
+	calories = models.FloatField(default=0.0)
+	protein = models.FloatField(default=0.0)
+	carbohydrates = models.FloatField(default=0.0)
+	fat = models.FloatField(default=0.0)
+	fiber = models.FloatField(default=0.0)
+	sugar = models.FloatField(default=0.0)
+	# Set on every import; with the row count, tells each process's LocalFoodIndex the table changed
+	imported_at = models.DateTimeField(auto_now=True, db_index=True)
+	
+	def __str__(self):
+		return f"{self.fdc_id} - {self.description}"
 
 class Appointment(models.Model):
 	APPOINTMENT_TYPE_CHOICES = [
@@ -306,7 +509,7 @@ class LabReport(models.Model):
 	lab_name = models.CharField(max_length=255, blank=True, help_text="Name of the laboratory")
 	doctor_name = models.CharField(max_length=255, blank=True, help_text="Name of the requesting doctor")
 	report_date = models.DateField(help_text="Date when the lab report was conducted")
-	report_file_base64 = models.TextField(help_text="Lab report file stored as base64 string")
+	file_sha256 = models.CharField(max_length=64, db_index=True, help_text="SHA-256 of the file contents; key of the file in the blob store")
 	file_name = models.CharField(max_length=255, help_text="Original filename of the uploaded report")
 	file_type = models.CharField(max_length=10, help_text="File extension (e.g., pdf, jpg, png)")
 	file_size = models.IntegerField(help_text="File size in bytes")
@@ -316,6 +519,10 @@ class LabReport(models.Model):
 	
 	class Meta:
 		ordering = ['-report_date', '-created_at']  # Most recent reports first
+		indexes = [
+			# Serves the per-user listing and its (report_date, created_at, id) keyset pagination
+			models.Index(fields=['user', 'report_date', 'created_at', 'id']),
+		]
 	
 	def __str__(self):
 		return f"{self.user.username} - {self.report_name} ({self.report_date})"
@@ -332,3 +539,97 @@ class LabReport(models.Model):
 	def is_pdf(self):
 		"""Check if the file is a PDF"""
 		return self.file_type.lower() == 'pdf'
+
+
+class Blob(models.Model):
+	"""
+	Lock row for one blob in the blob store (see nexusapp/blobstore.py). Rows that reference a blob
+	are created, and unreferenced blobs deleted, only while holding this row's lock.
+	"""
+	sha256 = models.CharField(max_length=64, unique=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	
+	def __str__(self):
+		return self.sha256
+
+
+class LabReportDerivative(models.Model):
+	"""
+	A downscaled rendition (thumbnail / preview) of a lab report image, stored in the blob store.
+	Keyed by the source file's content hash, so identical uploads share their derivatives.
+	"""
+	KIND_CHOICES = [
+		('thumbnail', 'Thumbnail'),
+		('preview', 'Preview')
+	]
+	
+	source_sha256 = models.CharField(max_length=64, help_text="SHA-256 of the original lab report file")
+	kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+	file_sha256 = models.CharField(max_length=64, db_index=True, help_text="SHA-256 of the rendered image; key in the blob store")
+	content_type = models.CharField(max_length=50)
+	file_size = models.IntegerField(help_text="Rendered image size in bytes")
+	width = models.IntegerField()
+	height = models.IntegerField()
+	created_at = models.DateTimeField(auto_now_add=True)
+	
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=['source_sha256', 'kind'], name='unique_lab_report_derivative')
+		]
+	
+	def __str__(self):
+		return f"{self.kind} of {self.source_sha256[:12]} ({self.width}x{self.height})"
+
+
+class Job(models.Model):
+	"""
+	A unit of background work in the database-backed job queue (see nexusapp/jobs.py).
+	`task` is the dotted path of a function taking the payload dict and returning a JSON-serializable result.
+	"""
+	QUEUED = 'queued'
+	RUNNING = 'running'
+	SUCCEEDED = 'succeeded'
+	FAILED = 'failed'
+	STATUS_CHOICES = [
+		(QUEUED, 'Queued'),
+		(RUNNING, 'Running'),
+		(SUCCEEDED, 'Succeeded'),
+		(FAILED, 'Failed')
+	]
+	
+	user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+	task = models.CharField(max_length=255, help_text="Dotted path of the function that runs the job")
+	payload = models.JSONField(default=dict, blank=True)
+	status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+	result = models.JSONField(null=True, blank=True)
+	error = models.TextField(blank=True)
+	attempts = models.IntegerField(default=0)
+	max_attempts = models.IntegerField(default=1)
+	run_after = models.DateTimeField(default=timezone.now, help_text="Earliest time a worker may pick the job up")
+	locked_by = models.CharField(max_length=255, blank=True, help_text="Worker running (or that last ran) the job")
+	created_at = models.DateTimeField(auto_now_add=True)
+	started_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+	
+	class Meta:
+		indexes = [
+			# Serves the workers' "next queued job" scan
+			models.Index(fields=['status', 'run_after', 'id']),
+		]
+	
+	def __str__(self):
+		return f"Job {self.id} - {self.task} ({self.status})"
+	
+	def as_status(self):
+		"""Public view of the job for status endpoints"""
+		return {
+			'job_id': self.id,
+			'task': self.task.rsplit('.', 1)[-1],
+			'status': self.status,
+			'attempts': self.attempts,
+			'result': self.result,
+			'error': self.error or None,
+			'created_at': self.created_at,
+			'started_at': self.started_at,
+			'finished_at': self.finished_at
+		}
@@ -0,0 +1,81 @@
+"""
+Keyset (cursor) pagination for newest-first listings.
+
+Pages are ordered by a tuple of keys, all descending, ending in a unique
+tie-breaker. The default is (created_at, id). A cursor encodes the key values
+of the last row on the previous page, so fetching the next page is an index
+range scan that starts after it. Its cost stays the same no matter how deep
+the client pages, unlike OFFSET.
+"""
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+NEWEST_FIRST = ('created_at', 'id')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _to_json(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def encode_cursor(obj, keys=NEWEST_FIRST):
+    payload = json.dumps([_to_json(getattr(obj, key)) for key in keys]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, keys=NEWEST_FIRST):
+    """Key values (as Python values of the model's fields) from a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw_values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(raw_values, list) or len(raw_values) != len(keys):
+            raise ValueError
+        values = [model._meta.get_field(key).to_python(value) for key, value in zip(keys, raw_values)]
+        if any(value is None for value in values):
+            raise ValueError
+        return values
+    except (TypeError, ValueError, UnicodeError, ValidationError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Page size from request data, clamped to 1..maximum"""
+    if value in (None, ''):
+        return default
+    return max(1, min(int(value), maximum))
+
+
+def _after(keys, values):
+    """Rows strictly after `values` in descending (keys) order"""
+    condition = Q()
+    for i, key in enumerate(keys):
+        condition |= Q(**{f'{key}__lt': values[i]}, **dict(zip(keys[:i], values[:i])))
+    return condition
+
+
+def paginate_newest_first(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, keys=NEWEST_FIRST):
+    """
+    One page of queryset ordered by `keys` descending, starting after `cursor`.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    queryset = queryset.order_by(*[f'-{key}' for key in keys])
+    if cursor:
+        queryset = queryset.filter(_after(keys, decode_cursor(cursor, queryset.model, keys)))
+
+    # Fetch one extra row to learn whether another page exists
+    items = list(queryset[:page_size + 1])
+    if len(items) > page_size:
+        items = items[:page_size]
+        return items, encode_cursor(items[-1], keys)
+    return items, None
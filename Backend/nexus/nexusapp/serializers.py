@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
 from .models import UserBasicData, UserHealthProfile, BloodTestReport, MetabolicPanel, LiverFunctionTest, MedicationDetails
 from .models import FoodNutrition, UserNutritionGoals, Appointment, LabReport
@@ -99,7 +100,20 @@ class MedicationDetailsSerializer(serializers.ModelSerializer):
         read_only_fields = ('user',)
 
 
-class FoodNutritionSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Lets callers limit output to a subset of fields: Serializer(obj, fields=['id', 'food_name']).
+    Unknown field names are ignored.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+class FoodNutritionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     
     class Meta:
@@ -130,6 +144,16 @@ class FoodInputSerializer(serializers.Serializer):
     ], required=False)
 
 
+class FoodBatchInputSerializer(serializers.Serializer):
+    """A meal's worth of food items logged in one request"""
+    items = FoodInputSerializer(many=True, allow_empty=False)
+    
+    def validate_items(self, value):
+        if len(value) > 50:
+            raise serializers.ValidationError("A batch cannot contain more than 50 items")
+        return value
+
+
 class NutritionResponseSerializer(serializers.Serializer):
     food_name = serializers.CharField()
     quantity = serializers.FloatField()
@@ -181,10 +205,10 @@ class LabReportSerializer(serializers.ModelSerializer):
         model = LabReport
         fields = [
             'id', 'username', 'report_name', 'report_type', 'lab_name', 'doctor_name',
-            'report_date', 'report_file_base64', 'file_name', 'file_type', 'file_size',
+            'report_date', 'file_sha256', 'file_name', 'file_type', 'file_size',
             'file_size_mb', 'is_image', 'is_pdf', 'notes', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'username', 'file_size_mb', 'is_image', 'is_pdf', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'username', 'file_sha256', 'file_size', 'file_size_mb', 'is_image', 'is_pdf', 'created_at', 'updated_at']
     
     def get_file_size_mb(self, obj):
         return obj.get_file_size_mb()
@@ -196,30 +220,82 @@ class LabReportSerializer(serializers.ModelSerializer):
         return obj.is_pdf()
 
 
-class LabReportUploadSerializer(serializers.Serializer):
-    """Serializer for lab report file upload with base64 data"""
+class LabReportListSerializer(serializers.ModelSerializer):
+    """Lightweight lab report listing: metadata only, with URLs to download the file (and, for images, small renditions)"""
+    file_size_mb = serializers.SerializerMethodField(read_only=True)
+    is_image = serializers.SerializerMethodField(read_only=True)
+    is_pdf = serializers.SerializerMethodField(read_only=True)
+    download_url = serializers.SerializerMethodField(read_only=True)
+    thumbnail_url = serializers.SerializerMethodField(read_only=True)
+    preview_url = serializers.SerializerMethodField(read_only=True)
+    
+    # Model columns the listing needs, for .only()
+    MODEL_FIELDS = (
+        'id', 'report_name', 'report_type', 'lab_name', 'doctor_name', 'report_date',
+        'file_sha256', 'file_name', 'file_type', 'file_size', 'notes', 'created_at'
+    )
+    
+    class Meta:
+        model = LabReport
+        fields = [
+            'id', 'report_name', 'report_type', 'lab_name', 'doctor_name', 'report_date',
+            'file_sha256', 'file_name', 'file_type', 'file_size', 'file_size_mb', 'is_image', 'is_pdf',
+            'notes', 'created_at', 'download_url', 'thumbnail_url', 'preview_url'
+        ]
+        read_only_fields = fields
+    
+    def get_file_size_mb(self, obj):
+        return obj.get_file_size_mb()
+    
+    def get_is_image(self, obj):
+        return obj.is_image()
+    
+    def get_is_pdf(self, obj):
+        return obj.is_pdf()
+    
+    def _absolute_url(self, name, obj):
+        from django.urls import reverse
+        url = reverse(name, args=[obj.id])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+    
+    def get_download_url(self, obj):
+        return self._absolute_url('download_lab_report_file', obj)
+    
+    def get_thumbnail_url(self, obj):
+        return self._absolute_url('lab_report_thumbnail', obj) if obj.is_image() else None
+    
+    def get_preview_url(self, obj):
+        return self._absolute_url('lab_report_preview', obj) if obj.is_image() else None
+
+
+class LabReportMetadataSerializer(serializers.Serializer):
+    """Lab report fields sent alongside the file (JSON or multipart upload)"""
     report_name = serializers.CharField(max_length=255)
     report_type = serializers.ChoiceField(choices=LabReport.LAB_REPORT_TYPE_CHOICES)
     lab_name = serializers.CharField(max_length=255, required=False, allow_blank=True)
     doctor_name = serializers.CharField(max_length=255, required=False, allow_blank=True)
     report_date = serializers.DateField()
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class LabReportUploadSerializer(LabReportMetadataSerializer):
+    """Serializer for lab report file upload with base64 data"""
     file_data = serializers.CharField(help_text="Base64 encoded file data")
     file_name = serializers.CharField(max_length=255, help_text="Original filename")
     file_type = serializers.CharField(max_length=10, help_text="File extension (e.g., pdf, jpg, png)")
-    notes = serializers.CharField(required=False, allow_blank=True)
     
     def validate_file_data(self, value):
-        """Validate base64 data"""
-        import base64
+        """Decode the base64 data once; the validated value is the raw file bytes"""
+        from .blobstore import iter_base64_decode
         try:
-            # Try to decode the base64 data to validate it
-            decoded_data = base64.b64decode(value)
-            # Check file size (limit to 10MB)
-            if len(decoded_data) > 10 * 1024 * 1024:
-                raise serializers.ValidationError("File size cannot exceed 10MB")
-            return value
-        except Exception:
+            decoded_data = b''.join(iter_base64_decode(value))
+        except ValueError:
             raise serializers.ValidationError("Invalid base64 data")
+        # Check file size (limit to 10MB)
+        if len(decoded_data) > settings.LAB_REPORT_MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(f"File size cannot exceed {settings.LAB_REPORT_MAX_UPLOAD_SIZE // (1024 * 1024)}MB")
+        return decoded_data
     
     def validate_file_type(self, value):
         """Validate file type"""
@@ -1,3 +1,707 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import authentication, blobstore, jobs, usda
+from .derivatives import GENERATE_DERIVATIVES_TASK
+from .downloads import stream_json_with_files
+from .models import DailyNutritionRollup, FoodNutrition, Job, LabReport, LabReportDerivative, USDAFood
+from .serializers import LabReportSerializer
+from .uploads import BlobUploadHandler
+from .usda import NUTRIENT_KEYS, LocalFoodIndex, extract_nutrients, normalize_food_name
+
+
+class BlobStoreTestCase(TestCase):
+    """Runs each test against a throwaway LocalFileSystemBlobStore"""
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.blob_store = blobstore.LocalFileSystemBlobStore(root)
+        patcher = mock.patch.object(blobstore, '_store', self.blob_store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_lab_report(self, data=None, user=None, **fields):
+        """A report for `data` (stored first), or for the file_sha256/file_size given in fields"""
+        if data is not None:
+            fields['file_sha256'], fields['file_size'] = self.blob_store.save_bytes(data)
+        return LabReport.objects.create(**{
+            'user': user or self.user, 'report_name': 'CBC', 'report_type': 'blood_test',
+            'report_date': date(2024, 1, 1), 'file_name': 'cbc.png', 'file_type': 'png', **fields
+        })
+
+
+class StoreLabReportTests(BlobStoreTestCase):
+    def store(self, data):
+        return self.client.post('/api/lab-reports/store/', {
+            'report_name': 'CBC', 'report_type': 'blood_test', 'report_date': '2024-01-01',
+            'file_name': 'cbc.png', 'file_type': 'png',
+            'file_data': base64.b64encode(data).decode()
+        }, format='json')
+
+    def test_stores_file_in_blob_store(self):
+        data = b'\x89PNG\r\n\x1a\n' + b'x' * 100
+        response = self.store(data)
+        self.assertEqual(response.status_code, 201)
+        report = LabReport.objects.get()
+        self.assertEqual(self.blob_store.read_bytes(report.file_sha256), data)
+
+    def test_failed_save_removes_created_blob(self):
+        with mock.patch.object(LabReportSerializer, 'save', side_effect=RuntimeError('db down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.store(b'\x89PNG\r\n\x1a\nnew content')
+        self.assertEqual(response.status_code, 500)
+        sha256 = blobstore.hashlib.sha256(b'\x89PNG\r\n\x1a\nnew content').hexdigest()
+        self.assertFalse(self.blob_store.exists(sha256))
+
+    def test_failed_save_keeps_shared_blob(self):
+        data = b'\x89PNG\r\n\x1a\nshared content'
+        existing = self.create_lab_report(data)
+        with mock.patch.object(LabReportSerializer, 'save', side_effect=RuntimeError('db down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.store(data)
+        self.assertEqual(response.status_code, 500)
+        self.assertTrue(self.blob_store.exists(existing.file_sha256))
+
+
+class UploadLabReportTests(BlobStoreTestCase):
+    def upload(self, data, **fields):
+        return self.client.post('/api/lab-reports/upload/', {
+            'report_name': 'CBC', 'report_type': 'blood_test', 'report_date': '2024-01-01',
+            'file': SimpleUploadedFile('cbc.png', data, content_type='image/png'), **fields
+        }, format='multipart')
+
+    def test_streams_file_into_blob_store(self):
+        data = b'\x89PNG\r\n\x1a\n' + b'x' * 100
+        response = self.upload(data)
+        self.assertEqual(response.status_code, 201, response.content)
+        report = LabReport.objects.get()
+        self.assertEqual((report.file_type, report.file_size), ('png', len(data)))
+        self.assertEqual(self.blob_store.read_bytes(report.file_sha256), data)
+
+    def test_rejected_upload_stores_nothing(self):
+        response = self.upload(b'\x89PNG\r\n\x1a\nrejected', report_type='not-a-type')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(os.listdir(self.blob_store.root), ['tmp'])
+        self.assertEqual(os.listdir(self.blob_store.temp_dir), [])
+
+
+class BlobReferenceTests(BlobStoreTestCase):
+    DATA = b'\x89PNG\r\n\x1a\nshared upload'
+
+    def test_release_before_reference_stores_the_blob_again(self):
+        # A's blob is released while B, uploading the same bytes, has not saved its report yet
+        sha256, _ = self.blob_store.save_bytes(self.DATA)
+        writer = self.blob_store.write_bytes(self.DATA)
+        with self.captureOnCommitCallbacks(execute=True):
+            blobstore.release_unreferenced_blob(sha256)
+        self.assertFalse(self.blob_store.exists(sha256))
+
+        with blobstore.referencing_blob(writer) as file_sha256:
+            report = self.create_lab_report(file_sha256=file_sha256, file_size=writer.size)
+        self.assertEqual(self.blob_store.read_bytes(report.file_sha256), self.DATA)
+
+    def test_release_after_reference_keeps_the_blob(self):
+        sha256, _ = self.blob_store.save_bytes(self.DATA)
+        writer = self.blob_store.write_bytes(self.DATA)
+        with blobstore.referencing_blob(writer) as file_sha256:
+            self.create_lab_report(file_sha256=file_sha256, file_size=writer.size)
+        self.assertFalse(writer.created)
+        with self.captureOnCommitCallbacks(execute=True):
+            blobstore.release_unreferenced_blob(sha256)
+        self.assertTrue(self.blob_store.exists(sha256))
+
+    def test_failed_reference_releases_the_created_blob(self):
+        writer = self.blob_store.write_bytes(self.DATA)
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+            with blobstore.referencing_blob(writer):
+                raise RuntimeError('insert failed')
+        self.assertFalse(self.blob_store.exists(writer.sha256))
+
+
+class BlobUploadDiscardTests(BlobStoreTestCase):
+    def upload(self, data):
+        handler = BlobUploadHandler()
+        handler.writer = self.blob_store.open_writer()
+        handler.writer.write(data)
+        handler.writer.close()
+        return handler
+
+    def test_discard_deletes_blob_created_by_upload(self):
+        handler = self.upload(b'rejected upload')
+        self.assertTrue(handler.writer.created)
+        with self.captureOnCommitCallbacks(execute=True):
+            handler.discard()
+        self.assertFalse(self.blob_store.exists(handler.writer.sha256))
+
+    def test_discard_keeps_blob_another_request_saved_a_report_for(self):
+        # Request A creates the blob; request B stores the same bytes and commits its report; then A fails
+        handler = self.upload(b'same content')
+        self.assertTrue(handler.writer.created)
+        report = self.create_lab_report(b'same content')
+        with self.captureOnCommitCallbacks(execute=True):
+            handler.discard()
+        self.assertTrue(self.blob_store.exists(report.file_sha256))
+
+
+class LabReportListingTests(BlobStoreTestCase):
+    def list_reports(self, **data):
+        response = self.client.post('/api/lab-reports/get/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_cursor_pages_cover_every_report_once_in_order(self):
+        # Several reports share a report_date, so created_at and id have to break ties
+        for i, day in enumerate([3, 1, 3, 2, 3, 1, 2]):
+            self.create_lab_report(f'report {i}'.encode(), report_date=date(2024, 1, day))
+        other = User.objects.create_user('bob', password='pw')
+        self.create_lab_report(b'not alice', user=other)
+
+        seen, cursor = [], None
+        while True:
+            page = self.list_reports(page_size=3, cursor=cursor)
+            self.assertEqual(page['count'], 7)
+            self.assertEqual(page['page_count'], len(page['reports']))
+            seen.extend(page['reports'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+
+        expected = list(LabReport.objects.filter(user=self.user)
+                        .order_by('-report_date', '-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual([report['id'] for report in seen], expected)
+
+    def test_count_applies_filters(self):
+        self.create_lab_report(b'one', report_type='x_ray')
+        self.create_lab_report(b'two')
+        page = self.list_reports(report_type='x_ray')
+        self.assertEqual((page['count'], page['page_count']), (1, 1))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.post('/api/lab-reports/get/', {'cursor': 'garbage'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+def response_body(response):
+    return b''.join(response.streaming_content) if response.streaming else response.content
+
+
+class LabReportDownloadTests(BlobStoreTestCase):
+    DATA = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        self.report = self.create_lab_report(self.DATA, file_type='pdf')
+
+    def download(self, report=None, **headers):
+        response = self.client.get(f'/api/lab-reports/{(report or self.report).id}/download/', headers=headers)
+        return response, response_body(response)
+
+    def test_full_download(self):
+        response, body = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.DATA)
+        self.assertEqual(response['Content-Length'], str(len(self.DATA)))
+        self.assertEqual(response['ETag'], f'"{self.report.file_sha256}"')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_partial_download(self):
+        response, body = self.download(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, self.DATA[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.DATA)}')
+
+    def test_open_ended_range_is_clamped_to_the_file(self):
+        response, body = self.download(Range='bytes=1000-5000')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, self.DATA[1000:])
+
+    def test_suffix_range(self):
+        response, body = self.download(Range='bytes=-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, self.DATA[-5:])
+        self.assertEqual(response['Content-Range'], f'bytes {len(self.DATA) - 5}-{len(self.DATA) - 1}/{len(self.DATA)}')
+
+    def test_unsatisfiable_range(self):
+        for header in [f'bytes={len(self.DATA)}-', 'bytes=-0', 'bytes=20-10']:
+            response, _ = self.download(Range=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], f'bytes */{len(self.DATA)}')
+
+    def test_any_range_of_an_empty_file_is_unsatisfiable(self):
+        empty = self.create_lab_report(b'', file_type='pdf')
+        for header in ['bytes=0-', 'bytes=0-0', 'bytes=-5']:
+            response, _ = self.download(empty, Range=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], 'bytes */0')
+        response, body = self.download(empty)
+        self.assertEqual((response.status_code, body), (200, b''))
+
+    def test_matching_etag_is_not_modified(self):
+        response, body = self.download(If_None_Match=f'W/"{self.report.file_sha256}"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(body, b'')
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        response, body = self.download(Range='bytes=10-19', If_Range='"something-else"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.DATA)
+
+    def test_missing_file_is_not_found(self):
+        self.blob_store.delete(self.report.file_sha256)
+        response, _ = self.download()
+        self.assertEqual(response.status_code, 404)
+
+
+class LabReportFileDataListingTests(BlobStoreTestCase):
+    def list_with_files(self):
+        response = self.client.post('/api/lab-reports/get/', {'include_file_data': True}, format='json')
+        return response, response_body(response)
+
+    def test_streams_each_file_as_base64(self):
+        reports = [self.create_lab_report(data) for data in [b'first report', b'', bytes(range(256)) * 500]]
+        response, body = self.list_with_files()
+        self.assertEqual(response.status_code, 200)
+        listed = {report['id']: report['report_file_base64'] for report in json.loads(body)['reports']}
+        self.assertEqual(listed, {
+            report.id: base64.b64encode(self.blob_store.read_bytes(report.file_sha256)).decode() for report in reports
+        })
+
+    def test_missing_file_fails_before_streaming(self):
+        self.create_lab_report(b'first report')
+        self.blob_store.delete(self.create_lab_report(b'gone').file_sha256)
+        response, body = self.list_with_files()
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('missing from storage', json.loads(body)['error'])
+
+    def test_empty_payload_and_items(self):
+        sha256, _ = self.blob_store.save_bytes(b'abc')
+        items = [{'sha': sha256}, {'sha': sha256, 'name': 'a'}]
+        response = stream_json_with_files({}, 'files', items, 'data', sha256_key='sha')
+        self.assertEqual(json.loads(response_body(response)), {'files': [
+            {'sha': sha256, 'data': 'YWJj'}, {'sha': sha256, 'name': 'a', 'data': 'YWJj'}
+        ]})
+        response = stream_json_with_files({}, 'files', [], 'data')
+        self.assertEqual(json.loads(response_body(response)), {'files': []})
+
+
+class TokenAuthenticationTests(TestCase):
+    def setUp(self):
+        authentication.user_cache.clear()
+        self.addCleanup(authentication.user_cache.clear)
+        self.user = User.objects.create_user('alice', password='pw')
+        self.token = str(AccessToken.for_user(self.user))
+
+    def list_reports(self, via):
+        """POST to a token_required view with the token in the Authorization header or the body"""
+        if via == 'header':
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+            return client.post('/api/lab-reports/get/', {}, format='json')
+        return APIClient().post('/api/lab-reports/get/', {'token': self.token}, format='json')
+
+    def test_header_and_body_token_authenticate_the_same_user(self):
+        for via in ['header', 'body']:
+            response = self.list_reports(via)
+            self.assertEqual(response.status_code, 200, via)
+            self.assertEqual(response.json()['user'], 'alice', via)
+
+    def test_missing_and_invalid_tokens_are_rejected(self):
+        self.assertEqual(APIClient().post('/api/lab-reports/get/', {}, format='json').json(), {'error': 'Token is required'})
+        self.token = 'not-a-jwt'
+        self.assertEqual(self.list_reports('body').status_code, 401)
+        self.assertEqual(self.list_reports('header').status_code, 401)
+
+    def test_deactivated_user_is_rejected_on_the_next_request(self):
+        for via in ['header', 'body']:
+            self.assertEqual(self.list_reports(via).status_code, 200)
+        self.assertIsNotNone(authentication.user_cache.get(str(self.user.pk)))
+
+        self.user.is_active = False
+        self.user.save()
+        for via in ['header', 'body']:
+            self.assertEqual(self.list_reports(via).status_code, 401, via)
+
+    def test_deleted_user_is_rejected_on_the_next_request(self):
+        self.assertEqual(self.list_reports('header').status_code, 200)
+        self.user.delete()
+        for via in ['header', 'body']:
+            self.assertEqual(self.list_reports(via).status_code, 401, via)
+
+    def test_changing_a_request_user_does_not_change_the_cached_user(self):
+        first = authentication.authenticate_token(self.token)
+        first.username = 'mallory'
+        first.is_superuser = True
+
+        with self.assertNumQueries(0):
+            second = authentication.authenticate_token(self.token)
+        self.assertIsNot(second, first)
+        self.assertEqual((second.username, second.is_superuser), ('alice', False))
+
+        second.username = 'eve'
+        self.assertEqual(authentication.authenticate_token(self.token).username, 'alice')
+
+
+class ExtractNutrientsTests(SimpleTestCase):
+    def nutrient(self, name, amount, unit='g'):
+        return {'nutrient': {'name': name, 'unitName': unit}, 'amount': amount}
+
+    def test_sugar_names_of_both_datasets(self):
+        for name in ['Sugars, total including NLEA', 'Sugars, Total', 'SUGARS, TOTAL']:
+            self.assertEqual(extract_nutrients([self.nutrient(name, 10.4)])['sugar'], 10.4, name)
+
+    def test_energy_prefers_kcal_and_converts_kj(self):
+        kcal, kj = self.nutrient('Energy', 52, 'kcal'), self.nutrient('Energy', 218, 'kJ')
+        self.assertEqual(extract_nutrients([kj, kcal])['calories'], 52)
+        self.assertEqual(extract_nutrients([kcal, kj])['calories'], 52)
+        self.assertEqual(extract_nutrients([kj])['calories'], 52.1)
+
+    def test_missing_nutrients_default_to_zero(self):
+        nutrients = extract_nutrients([self.nutrient('Protein', 3.456), self.nutrient('Vitamin C', 50)])
+        self.assertEqual(nutrients, {
+            'calories': 0.0, 'protein': 3.46, 'carbohydrates': 0.0, 'fat': 0.0, 'fiber': 0.0, 'sugar': 0.0
+        })
+
+
+class USDALookupStatsTests(TestCase):
+    @override_settings(USDA_OFFLINE=False)
+    def test_api_tier_lookups_log_cache_stats(self):
+        with mock.patch.object(usda.usda_cache, 'lookup', return_value=None), \
+                self.assertLogs('nexusapp.usda', 'DEBUG') as logs:
+            usda.lookup_foods(['dragonfruit', 'Dragonfruit ', 'rambutan'])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("'api_calls'", logs.output[0])
+
+
+class LocalFoodIndexTests(TestCase):
+    def import_food(self, fdc_id, description, **nutrients):
+        USDAFood.objects.bulk_create([USDAFood(
+            fdc_id=fdc_id, description=description, normalized_description=normalize_food_name(description),
+            data_type='Foundation', **nutrients
+        )], update_conflicts=True, unique_fields=['fdc_id'],
+            update_fields=['description', 'normalized_description', 'imported_at', *NUTRIENT_KEYS])
+
+    def test_reloads_when_another_process_imports(self):
+        self.import_food(1, 'Apples, raw', calories=52)
+        index = LocalFoodIndex()
+        self.assertEqual(index.resolve('apple')['description'], 'Apples, raw')
+
+        self.import_food(2, 'Bananas, raw', calories=89)
+        self.assertIsNone(index.resolve('banana'))
+        index._checked_at -= index.CHECK_SECONDS
+        self.assertEqual(index.resolve('banana')['nutrients']['calories'], 89)
+
+    def test_reimported_values_are_picked_up(self):
+        self.import_food(1, 'Apples, raw', calories=52)
+        index = LocalFoodIndex()
+        index.resolve('apple')
+
+        # Same rows, new values: only imported_at moves
+        USDAFood.objects.filter(fdc_id=1).update(imported_at=timezone.now() - timedelta(days=1))
+        index.reload()
+        self.import_food(1, 'Apples, raw', calories=60)
+        index._checked_at -= index.CHECK_SECONDS
+        self.assertEqual(index.resolve('apple')['nutrients']['calories'], 60)
+
+    def test_unchanged_table_is_checked_with_one_query(self):
+        self.import_food(1, 'Apples, raw', calories=52)
+        index = LocalFoodIndex()
+        index.resolve('apple')
+        with self.assertNumQueries(0):
+            index.resolve('apple')
+        index._checked_at -= index.CHECK_SECONDS
+        with self.assertNumQueries(1):
+            index.resolve('apple')
+
+
+class LabReportDerivativeJobTests(BlobStoreTestCase):
+    def png(self, size=(2000, 1000)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_storing_an_image_queues_its_renditions(self):
+        report = self.create_lab_report(self.png())
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.payload), (GENERATE_DERIVATIVES_TASK, {'source_sha256': report.file_sha256}))
+
+        job = jobs.run_job(jobs.claim_next('worker'))
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        sizes = dict(LabReportDerivative.objects.values_list('kind', 'width'))
+        self.assertEqual(sizes, {'thumbnail': 256, 'preview': 1024})
+        self.assertEqual(job.result['renditions'], dict(LabReportDerivative.objects.values_list('kind', 'file_sha256')))
+
+        response = self.client.get(f'/api/lab-reports/{report.id}/thumbnail/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"{job.result["renditions"]["thumbnail"]}"')
+
+    def test_pdf_queues_nothing(self):
+        self.create_lab_report(b'%PDF-1.4', file_type='pdf')
+        self.assertFalse(Job.objects.exists())
+
+    def test_unreadable_image_fails_the_job(self):
+        self.create_lab_report(b'not a png')
+        with self.assertLogs('nexusapp.jobs', 'ERROR'):
+            job = jobs.run_job(jobs.claim_next('worker'))
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('not a readable image', job.error)
+        self.assertFalse(LabReportDerivative.objects.exists())
+
+
+class DailyNutritionRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def log_food(self, food_name, quantity, calories_per_100g, protein_per_100g, user=None):
+        multiplier = quantity / 100
+        entry = FoodNutrition.objects.create(
+            user=user or self.user, food_name=food_name, quantity=quantity, unit='g',
+            calories_per_100g=calories_per_100g, protein_per_100g=protein_per_100g,
+            total_calories=calories_per_100g * multiplier, total_protein=protein_per_100g * multiplier,
+            total_carbs=0.0, total_fat=0.0, total_fiber=0.0, total_sugar=0.0
+        )
+        DailyNutritionRollup.add_entries([entry])
+        return entry
+
+    def rollups(self):
+        return {
+            (row.user_id, row.date): row.as_totals()
+            for row in DailyNutritionRollup.objects.filter(entries_count__gt=0)
+        }
+
+    def assertMatchesRebuild(self):
+        maintained = self.rollups()
+        DailyNutritionRollup.rebuild()
+        rebuilt = self.rollups()
+        self.assertEqual(maintained.keys(), rebuilt.keys())
+        for key, totals in rebuilt.items():
+            for field, value in totals.items():
+                self.assertAlmostEqual(maintained[key][field], value, places=6, msg=f"{key} {field}")
+
+    def test_create_update_delete_match_rebuild(self):
+        apple = self.log_food('Apple', 150, 52, 0.3)
+        rice = self.log_food('Rice', 200, 130, 2.7)
+        self.log_food('Bread', 50, 265, 9, user=User.objects.create_user('bob', password='pw'))
+        self.assertMatchesRebuild()
+
+        response = self.client.post('/api/nutrition/edit/', {
+            'item_id': apple.id, 'food_name': 'Apple', 'quantity': 300, 'unit': 'g'
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        totals = DailyNutritionRollup.get_totals(self.user, apple.log_date())
+        self.assertAlmostEqual(totals['total_calories'], 52 * 3 + 130 * 2)
+        self.assertEqual(totals['entries_count'], 2)
+        self.assertMatchesRebuild()
+
+        response = self.client.post('/api/nutrition/delete/', {'item_id': rice.id}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertAlmostEqual(DailyNutritionRollup.get_totals(self.user, apple.log_date())['total_calories'], 52 * 3)
+        self.assertMatchesRebuild()
+
+    def test_deleting_last_entry_zeroes_the_day(self):
+        entry = self.log_food('Apple', 33.3, 52, 0.3)
+        self.client.post('/api/nutrition/delete/', {'item_id': entry.id}, format='json')
+        totals = DailyNutritionRollup.get_totals(self.user, entry.log_date())
+        self.assertEqual(totals, dict.fromkeys(FoodNutrition.TOTAL_FIELDS, 0.0) | {'entries_count': 0})
+        self.assertMatchesRebuild()
+
+
+def failing_task(payload):
+    raise RuntimeError(payload.get('message', 'boom'))
+
+
+def echo_task(payload):
+    return payload
+
+
+class JobQueueTests(TestCase):
+    FAILING_TASK = 'nexusapp.tests.failing_task'
+    ECHO_TASK = 'nexusapp.tests.echo_task'
+
+    def setUp(self):
+        self.finished = []
+        jobs.job_finished.connect(self.record_finished)
+        self.addCleanup(jobs.job_finished.disconnect, self.record_finished)
+
+    def record_finished(self, sender, job, **kwargs):
+        self.finished.append((job.id, job.status))
+
+    def test_each_job_is_claimed_once(self):
+        first = jobs.enqueue(self.ECHO_TASK, {'n': 1})
+        second = jobs.enqueue(self.ECHO_TASK, {'n': 2})
+
+        claimed = [jobs.claim_next('worker-a'), jobs.claim_next('worker-b'), jobs.claim_next('worker-a')]
+
+        self.assertEqual([job and job.id for job in claimed], [first.id, second.id, None])
+        self.assertEqual((claimed[0].status, claimed[0].locked_by, claimed[0].attempts), (Job.RUNNING, 'worker-a', 1))
+
+    def test_claim_skips_job_taken_by_another_worker(self):
+        # Both workers read the same candidate ids; the conditional UPDATE lets only one of them win
+        first = jobs.enqueue(self.ECHO_TASK)
+        second = jobs.enqueue(self.ECHO_TASK)
+        real_filter = Job.objects.filter
+
+        def filter_after_race(*args, **kwargs):
+            if kwargs.get('id') == first.id:
+                real_filter(id=first.id).update(status=Job.RUNNING, locked_by='worker-b')
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(Job.objects, 'filter', side_effect=filter_after_race):
+            claimed = jobs.claim_next('worker-a')
+
+        self.assertEqual(claimed.id, second.id)
+        self.assertEqual(Job.objects.get(id=first.id).locked_by, 'worker-b')
+
+    def test_job_that_is_not_due_is_not_claimed(self):
+        jobs.enqueue(self.ECHO_TASK)
+        Job.objects.update(run_after=timezone.now() + timedelta(minutes=1))
+        self.assertIsNone(jobs.claim_next('worker-a'))
+
+    def test_success_records_result(self):
+        jobs.enqueue(self.ECHO_TASK, {'n': 1})
+        job = jobs.run_job(jobs.claim_next('worker-a'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (Job.SUCCEEDED, {'n': 1}))
+        self.assertEqual(self.finished, [(job.id, Job.SUCCEEDED)])
+
+    def test_failed_job_is_retried_until_out_of_attempts(self):
+        job = jobs.enqueue(self.FAILING_TASK, max_attempts=2)
+
+        with self.assertLogs('nexusapp.jobs', 'ERROR'):
+            jobs.run_job(jobs.claim_next('worker-a'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(self.finished, [])
+
+        Job.objects.update(run_after=timezone.now())
+        with self.assertLogs('nexusapp.jobs', 'ERROR'):
+            jobs.run_job(jobs.claim_next('worker-a'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(job.error, 'RuntimeError: boom')
+        self.assertEqual(self.finished, [(job.id, Job.FAILED)])
+
+    def test_stale_jobs_are_requeued_or_failed(self):
+        retryable = jobs.enqueue(self.ECHO_TASK, max_attempts=2)
+        exhausted = jobs.enqueue(self.ECHO_TASK, max_attempts=1)
+        fresh = jobs.enqueue(self.ECHO_TASK, max_attempts=1)
+        for _ in range(3):
+            jobs.claim_next('dead-worker')
+        Job.objects.exclude(id=fresh.id).update(started_at=timezone.now() - timedelta(seconds=120))
+
+        self.assertEqual(jobs.requeue_stale_jobs(timeout=60), 2)
+
+        statuses = dict(Job.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {retryable.id: Job.QUEUED, exhausted.id: Job.FAILED, fresh.id: Job.RUNNING})
+        self.assertEqual(self.finished, [(exhausted.id, Job.FAILED)])
+        self.assertEqual(jobs.claim_next('worker-a').id, retryable.id)
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Migrates `app` back to `migrate_from`, lets setUpBeforeMigration add rows, then runs `migrate_to`"""
+
+    app = 'nexusapp'
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        super().setUp()
+        MigrationExecutor(connection).migrate([(self.app, self.migrate_from)])
+        self.setUpBeforeMigration(self.migrated_apps())
+
+        MigrationExecutor(connection).migrate([(self.app, self.migrate_to)])
+        self.apps = self.migrated_apps()
+
+    def migrated_apps(self):
+        """Models as of the migrations currently applied to the test database"""
+        loader = MigrationExecutor(connection).loader
+        return loader.project_state(list(loader.applied_migrations)).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def setUpBeforeMigration(self, apps):
+        pass
+
+
+class RollupBackfillMigrationTests(MigrationTestCase):
+    migrate_from = '0022_foodnutrition_user_created_at_index'
+    migrate_to = '0023_dailynutritionrollup'
+
+    def setUpBeforeMigration(self, apps):
+        User = apps.get_model('auth', 'User')
+        FoodNutrition = apps.get_model('nexusapp', 'FoodNutrition')
+        self.user_id = User.objects.create(username='alice').id
+        for calories in (100.0, 250.0):
+            FoodNutrition.objects.create(user_id=self.user_id, food_name='Apple', quantity=100, total_calories=calories)
+        FoodNutrition.objects.create(food_name='Anonymous', quantity=100, total_calories=999.0)
+
+    def test_backfills_one_row_per_user_and_day(self):
+        DailyNutritionRollup = self.apps.get_model('nexusapp', 'DailyNutritionRollup')
+        rollup = DailyNutritionRollup.objects.get()
+        self.assertEqual((rollup.user_id, rollup.entries_count, rollup.total_calories), (self.user_id, 2, 350.0))
+        self.assertEqual(rollup.total_sugar, 0.0)
+
+
+class BlobStoreMigrationTests(MigrationTestCase):
+    migrate_from = '0024_foodnutrition_history_index'
+    migrate_to = '0025_labreport_file_sha256'
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = override_settings(BLOB_STORE={
+            'BACKEND': 'nexusapp.blobstore.LocalFileSystemBlobStore', 'OPTIONS': {'root': root}
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.blob_store = blobstore.LocalFileSystemBlobStore(root)
+        super().setUp()
+
+    def setUpBeforeMigration(self, apps):
+        User = apps.get_model('auth', 'User')
+        LabReport = apps.get_model('nexusapp', 'LabReport')
+        user_id = User.objects.create(username='alice').id
+        self.contents = [b'\x89PNG first report', b'%PDF second report', b'\x89PNG first report']
+        for i, data in enumerate(self.contents):
+            LabReport.objects.create(
+                user_id=user_id, report_name=f'Report {i}', report_type='blood_test', report_date=date(2024, 1, 1),
+                # Clients sent data: URLs and line-wrapped base64 too
+                report_file_base64=('data:image/png;base64,' if i == 0 else '') + base64.encodebytes(data).decode(),
+                file_name=f'report{i}', file_type='png', file_size=0
+            )
+
+    def test_moves_files_into_blob_store(self):
+        LabReport = self.apps.get_model('nexusapp', 'LabReport')
+        reports = list(LabReport.objects.order_by('id'))
+        self.assertEqual([self.blob_store.read_bytes(report.file_sha256) for report in reports], self.contents)
+        self.assertEqual([report.file_size for report in reports], [len(data) for data in self.contents])
+        # Identical files share one blob
+        self.assertEqual(reports[0].file_sha256, reports[2].file_sha256)
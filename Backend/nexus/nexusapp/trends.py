@@ -0,0 +1,132 @@
+"""
+Multi-day nutrition trends.
+
+Per-day totals come from DailyNutritionRollup in a single query and are laid
+out as a (days x nutrients) NumPy array, so progress, rolling averages and
+goal-adherence streaks are computed column-wise instead of looping per day.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+
+from .models import DailyNutritionRollup, FoodNutrition
+
+
+# Longest range a single trends request may cover
+MAX_TREND_DAYS = 366
+
+# A day counts towards a streak when its calories are within this fraction of the goal
+ADHERENCE_TOLERANCE = 0.10
+
+ROLLING_WINDOWS = (7, 30)
+
+# API nutrient name -> (rollup total field, UserNutritionGoals field), in TOTAL_FIELDS order
+NUTRIENTS = {
+    'calories': ('total_calories', 'daily_calories_goal'),
+    'protein': ('total_protein', 'daily_protein_goal'),
+    'carbohydrates': ('total_carbs', 'daily_carbs_goal'),
+    'fat': ('total_fat', 'daily_fat_goal'),
+    'fiber': ('total_fiber', 'daily_fiber_goal'),
+    'sugar': ('total_sugar', 'daily_sugar_goal'),
+}
+
+
+def _load_days(user, first_day, last_day):
+    """(totals, entries_count) arrays with one row per day from first_day to last_day"""
+    n_days = (last_day - first_day).days + 1
+    totals = np.zeros((n_days, len(FoodNutrition.TOTAL_FIELDS)))
+    counts = np.zeros(n_days, dtype=np.int64)
+
+    rows = list(DailyNutritionRollup.objects.filter(
+        user=user, date__gte=first_day, date__lte=last_day
+    ).values_list('date', 'entries_count', *FoodNutrition.TOTAL_FIELDS))
+    if rows:
+        index = np.fromiter(((row[0] - first_day).days for row in rows), dtype=np.int64, count=len(rows))
+        counts[index] = [row[1] for row in rows]
+        totals[index] = [row[2:] for row in rows]
+    return totals, counts
+
+
+def _rolling_mean(totals, logged, window):
+    """Mean over the logged days in each trailing window; NaN where the window has none"""
+    zero_row = np.zeros((1, totals.shape[1]))
+    summed = np.concatenate([zero_row, np.cumsum(totals, axis=0)])
+    days = np.concatenate([[0], np.cumsum(logged)])
+    window_sums = summed[window:] - summed[:-window]
+    window_days = (days[window:] - days[:-window])[:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_days > 0, window_sums / window_days, np.nan)
+
+
+def _streaks(mask):
+    """(current, longest) run of True values; the current run must end on the last day"""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if not starts.size:
+        return 0, 0
+    lengths = ends - starts
+    current = int(lengths[-1]) if ends[-1] == len(mask) else 0
+    return current, int(lengths.max())
+
+
+def _nutrient_dict(row):
+    return {
+        name: None if np.isnan(value) else round(float(value), 2)
+        for name, value in zip(NUTRIENTS, row)
+    }
+
+
+def compute_nutrition_trends(user, start_date, end_date, goals):
+    """
+    Per-day consumed vs goals for start_date..end_date, with trailing 7/30-day averages
+    (over logged days) and calorie-adherence streaks. `goals` is a UserNutritionGoals.
+    """
+    # Load enough history before start_date that every requested day has full windows
+    lookback = max(ROLLING_WINDOWS) - 1
+    first_day = start_date - timedelta(days=lookback)
+    totals, counts = _load_days(user, first_day, end_date)
+    logged = counts > 0
+
+    averages = {
+        window: _rolling_mean(totals, logged, window)[lookback - window + 1:]
+        for window in ROLLING_WINDOWS
+    }
+    totals, counts, logged = totals[lookback:], counts[lookback:], logged[lookback:]
+
+    goal_values = np.array([getattr(goals, goal_field) for _, goal_field in NUTRIENTS.values()])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        percentages = np.where(goal_values > 0, totals / goal_values * 100, 0.0)
+    remaining = np.maximum(goal_values - totals, 0)
+
+    calorie_goal = goal_values[0]
+    adherent = logged & (np.abs(totals[:, 0] - calorie_goal) <= ADHERENCE_TOLERANCE * calorie_goal)
+    current_streak, longest_streak = _streaks(adherent)
+
+    days = []
+    for i in range(len(counts)):
+        progress = {}
+        for j, name in enumerate(NUTRIENTS):
+            progress[f"{name}_percentage"] = round(float(percentages[i, j]), 1)
+            progress[f"{name}_remaining"] = round(float(remaining[i, j]), 2)
+        days.append({
+            'date': start_date + timedelta(days=i),
+            'entries_count': int(counts[i]),
+            'consumed': _nutrient_dict(totals[i]),
+            'progress': progress,
+            'calorie_goal_met': bool(adherent[i]),
+            **{f"rolling_{window}_day_average": _nutrient_dict(averages[window][i]) for window in ROLLING_WINDOWS},
+        })
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'goals': {name: getattr(goals, goal_field) for name, (_, goal_field) in NUTRIENTS.items()},
+        'days': days,
+        'streaks': {
+            'current': current_streak,
+            'longest': longest_streak,
+            'tolerance_percentage': round(ADHERENCE_TOLERANCE * 100),
+        },
+    }
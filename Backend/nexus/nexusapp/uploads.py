@@ -0,0 +1,170 @@
+"""
+Streaming multipart uploads straight into the blob store.
+
+BlobUploadHandler replaces Django's memory/temp-file upload handlers for the
+lab report upload view. Each chunk is written to a BlobWriter as it arrives
+off the socket, which hashes it and counts its size. The file type is sniffed
+from the first bytes. The blob is only committed when the view stores the row
+that references it, with blobstore.referencing_blob(request.blob_upload.stored.writer). Limits are enforced as early as possible: on the
+request's Content-Length before parsing starts, on the sniffed magic bytes
+with the first chunk, and on the running size with every chunk after that.
+"""
+
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from rest_framework import status
+from rest_framework.response import Response
+
+from .blobstore import get_blob_store, release_unreferenced_blob
+
+
+# Leading bytes -> file type, checked in order
+MAGIC_SIGNATURES = [
+    (b'%PDF-', 'pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+    (b'BM', 'bmp'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'doc'),   # OLE2 compound file (legacy Word)
+    (b'PK\x03\x04', 'docx'),                         # ZIP container (Office Open XML)
+]
+SNIFF_BYTES = max(len(signature) for signature, _ in MAGIC_SIGNATURES)
+
+# Allowance for the non-file form fields when checking Content-Length up front
+FORM_FIELDS_ALLOWANCE = 64 * 1024
+
+
+def sniff_file_type(header):
+    for signature, file_type in MAGIC_SIGNATURES:
+        if header.startswith(signature):
+            return file_type
+    return None
+
+
+class StoredBlobFile(UploadedFile):
+    """An upload written to the blob store; carries its open writer, key, size and sniffed type"""
+
+    def __init__(self, name, content_type, writer, file_type):
+        super().__init__(file=None, name=name, content_type=content_type, size=writer.size)
+        self.writer = writer
+        self.sha256 = writer.digest()
+        self.file_type = file_type
+
+
+class BlobUploadHandler(FileUploadHandler):
+    """
+    Stream the multipart file field `field_name` into the blob store.
+    Other file fields are skipped. After parsing, `error` is None or an
+    (HTTP status, message) pair describing why the upload was rejected.
+    """
+
+    def __init__(self, request=None, field_name='file', max_size=None):
+        super().__init__(request)
+        self.accepted_field = field_name
+        self.max_size = max_size or settings.LAB_REPORT_MAX_UPLOAD_SIZE
+        self.error = None
+        self.writer = None
+        self.stored = None
+        self._header = b''
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length and content_length > self.max_size + FORM_FIELDS_ALLOWANCE:
+            self.error = self._too_large()
+            # Skip parsing entirely; the body is never read
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        if field_name != self.accepted_field or self.writer is not None:
+            raise SkipFile()
+        self.writer = get_blob_store().open_writer()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.writer.size + len(raw_data) > self.max_size:
+            self._reject(self._too_large())
+
+        if len(self._header) < SNIFF_BYTES:
+            self._header += raw_data[:SNIFF_BYTES - len(self._header)]
+            if len(self._header) >= SNIFF_BYTES and sniff_file_type(self._header) is None:
+                self._reject(self._unsupported())
+
+        self.writer.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        file_type = sniff_file_type(self._header)
+        if file_type is None:
+            self._reject(self._unsupported())
+        # Committed by the view, under the blob's lock, together with the row that references it
+        self.stored = StoredBlobFile(self.file_name, self.content_type, self.writer, file_type)
+        return self.stored
+
+    def upload_interrupted(self):
+        if self.writer is not None and self.writer.sha256 is None:
+            self.writer.abort()
+
+    def discard(self):
+        """
+        Drop the upload (e.g. the request was rejected, or the view didn't keep it).
+        An uncommitted file is just removed. A committed blob this upload created is
+        released, which keeps it if a concurrent request has referenced the same content.
+        """
+        if self.writer is not None:
+            if self.writer.sha256 is None:
+                self.writer.abort()
+            elif self.writer.created:
+                release_unreferenced_blob(self.writer.sha256)
+
+    def _reject(self, error):
+        self.error = error
+        self.writer.abort()
+        raise StopUpload(connection_reset=True)
+
+    def _too_large(self):
+        limit_mb = round(self.max_size / (1024 * 1024), 1)
+        return status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, f"File size cannot exceed {limit_mb:g}MB"
+
+    def _unsupported(self):
+        allowed = sorted({file_type for _, file_type in MAGIC_SIGNATURES})
+        return status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, f"Unsupported file content. Allowed types: {', '.join(allowed)}"
+
+
+def streaming_blob_upload(field_name='file'):
+    """
+    Install a BlobUploadHandler before the request body is parsed and reject
+    oversized / unsupported files before the view runs. The handler is available
+    as request.blob_upload. If the view fails or doesn't commit the upload, it is removed.
+    Apply above @token_required, since reading a body token parses the body.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            handler = BlobUploadHandler(request._request, field_name=field_name)
+            request._request.upload_handlers = [handler]
+            request.blob_upload = handler
+
+            request.data  # Parse the body now, streaming the file through the handler
+            if handler.error:
+                handler.discard()
+                error_status, message = handler.error
+                return Response({'error': message}, status=error_status)
+
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                handler.discard()
+                raise
+            if response.status_code >= 400 or (handler.writer is not None and handler.writer.sha256 is None):
+                handler.discard()
+            return response
+        return wrapper
+    return decorator
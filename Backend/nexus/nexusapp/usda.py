@@ -0,0 +1,456 @@
+"""
+USDA FoodData Central lookups.
+
+Food names are resolved against the locally imported USDA database first
+(`manage.py import_usda_foods`, searched through an in-memory prefix index).
+Foods that are not in the local copy fall back to the USDA API behind a
+two-tier cache: normalized food name -> FDC ID, and FDC ID -> per-100g
+nutrient record. Each mapping is served from an in-process LRU first, then
+from a database table, and only on a miss (or an expired row) from the API.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from .lru import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+USDA_SEARCH_URL = "https://api.nal.usda.gov/fdc/v1/foods/search"
+USDA_FOOD_URL = "https://api.nal.usda.gov/fdc/v1/food/{fdc_id}"
+
+# USDA nutrient name -> our nutrient key. Names are matched case-insensitively as substrings
+# of the reported name; the datasets don't agree on them (SR Legacy reports
+# "Sugars, total including NLEA", Foundation foods "Sugars, Total").
+NUTRIENT_MAPPING = {
+    'Energy': 'calories',
+    'Protein': 'protein',
+    'Carbohydrate, by difference': 'carbohydrates',
+    'Total lipid (fat)': 'fat',
+    'Fiber, total dietary': 'fiber',
+    'Sugars, total including NLEA': 'sugar',
+    'Sugars, Total': 'sugar'
+}
+# kJ per kcal, for foods that only report Energy in kJ
+KJ_PER_KCAL = 4.184
+# Our nutrient keys, in USDAFood column order
+NUTRIENT_KEYS = tuple(dict.fromkeys(NUTRIENT_MAPPING.values()))
+
+
+def normalize_food_name(food_name):
+    """Normalize a food name for cache lookups ("  Green  Apple" -> "green apple")"""
+    return ' '.join(food_name.lower().split())
+
+
+def nutrient_key(nutrient_name):
+    """Our key for a USDA nutrient name, or None if we don't track it"""
+    nutrient_name = nutrient_name.lower()
+    for usda_name, our_name in NUTRIENT_MAPPING.items():
+        if usda_name.lower() in nutrient_name:
+            return our_name
+    return None
+
+
+def extract_nutrients(food_nutrients):
+    """
+    Map a USDA `foodNutrients` list onto our per-100g nutrient keys.
+    Energy in kcal is preferred; a food that only reports kJ is converted.
+    Missing nutrients default to 0.0.
+    """
+    nutrients = {}
+    energy_kj = None
+    for nutrient in food_nutrients:
+        nutrient_info = nutrient.get('nutrient', {})
+        nutrient_value = nutrient.get('amount', 0)
+
+        our_name = nutrient_key(nutrient_info.get('name', ''))
+        if our_name is None:
+            continue
+        # Energy is reported in kcal, kJ or both
+        if our_name == 'calories' and nutrient_info.get('unitName', 'kcal').lower() == 'kj':
+            energy_kj = nutrient_value or 0
+            continue
+        nutrients[our_name] = round(nutrient_value or 0, 2)
+
+    if 'calories' not in nutrients and energy_kj is not None:
+        nutrients['calories'] = round(energy_kj / KJ_PER_KCAL, 2)
+
+    for nutrient in NUTRIENT_KEYS:
+        if nutrient not in nutrients:
+            nutrients[nutrient] = 0.0
+
+    return nutrients
+
+
+class USDAFoodCache:
+    """
+    Resolve food names to USDA nutrient records.
+    Lookup order per mapping: in-process LRU -> database cache table -> USDA API.
+    """
+
+    def __init__(self, ttl_seconds=None, max_entries=None):
+        self.ttl_seconds = ttl_seconds or getattr(settings, 'USDA_CACHE_TTL_SECONDS', 30 * 24 * 60 * 60)
+        max_entries = max_entries or getattr(settings, 'USDA_CACHE_MAX_ENTRIES', 1024)
+        self.names = LRUCache(max_entries)
+        self.foods = LRUCache(max_entries)
+        self.db_hits = 0
+        self.api_calls = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, food_name):
+        """
+        Return {'fdc_id', 'description', 'nutrients'} for a food name,
+        or None when USDA has no match. Raises requests.RequestException on API failure.
+        """
+        fdc_id = self.resolve_fdc_id(food_name)
+        if fdc_id is None:
+            return None
+        return self.get_food(fdc_id)
+
+    def resolve_fdc_id(self, food_name):
+        """Map a food name to its most relevant FoodData Central ID"""
+        from .models import USDAFoodSearchCache
+
+        key = normalize_food_name(food_name)
+        fdc_id = self.names.get(key)
+        if fdc_id is not None:
+            return fdc_id
+
+        row = USDAFoodSearchCache.objects.filter(
+            normalized_name=key, updated_at__gte=self._fresh_since()
+        ).first()
+        if row:
+            self._count_db_hit()
+            self.names.set(key, row.fdc_id, self._remaining_ttl(row.updated_at))
+            return row.fdc_id
+
+        fdc_id = self._search_usda(food_name)
+        if fdc_id is None:
+            return None
+
+        self._store(USDAFoodSearchCache, {'normalized_name': key}, {'fdc_id': fdc_id})
+        self.names.set(key, fdc_id, self.ttl_seconds)
+        return fdc_id
+
+    def get_food(self, fdc_id):
+        """Return the cached per-100g nutrient record for an FDC ID"""
+        from .models import USDAFoodNutrientCache
+
+        food = self.foods.get(fdc_id)
+        if food is not None:
+            return food
+
+        row = USDAFoodNutrientCache.objects.filter(
+            fdc_id=fdc_id, updated_at__gte=self._fresh_since()
+        ).first()
+        if row:
+            self._count_db_hit()
+            food = row.as_food_record()
+            self.foods.set(fdc_id, food, self._remaining_ttl(row.updated_at))
+            return food
+
+        food = self._fetch_usda_food(fdc_id)
+        self._store(
+            USDAFoodNutrientCache,
+            {'fdc_id': fdc_id},
+            {'description': food['description'][:255], **food['nutrients']}
+        )
+        self.foods.set(fdc_id, food, self.ttl_seconds)
+        return food
+
+    def purge_expired(self):
+        """Delete expired rows from the database tier. Returns the number of rows deleted."""
+        from .models import USDAFoodSearchCache, USDAFoodNutrientCache
+
+        cutoff = self._fresh_since()
+        deleted, _ = USDAFoodSearchCache.objects.filter(updated_at__lt=cutoff).delete()
+        deleted_foods, _ = USDAFoodNutrientCache.objects.filter(updated_at__lt=cutoff).delete()
+        return deleted + deleted_foods
+
+    def clear(self):
+        """Drop the in-process tier (the database tier is left untouched)"""
+        self.names.clear()
+        self.foods.clear()
+
+    def stats(self):
+        """This process's hit/miss counters; logged (DEBUG, logger nexusapp.usda) after lookups that miss the local database"""
+        return {
+            'name_hits': self.names.hits,
+            'name_misses': self.names.misses,
+            'food_hits': self.foods.hits,
+            'food_misses': self.foods.misses,
+            'db_hits': self.db_hits,
+            'api_calls': self.api_calls,
+            'names_cached': len(self.names),
+            'foods_cached': len(self.foods),
+        }
+
+    def _search_usda(self, food_name):
+        self._count_api_call()
+        response = requests.get(USDA_SEARCH_URL, params={
+            'api_key': settings.USDA_API_KEY,
+            'query': food_name,
+            'dataType': ['Foundation', 'SR Legacy'],
+            'pageSize': 1
+        }, timeout=getattr(settings, 'USDA_API_TIMEOUT', 10))
+        response.raise_for_status()
+        foods = response.json().get('foods')
+        if not foods:
+            return None
+        # The first result is the most relevant one
+        return int(foods[0]['fdcId'])
+
+    def _fetch_usda_food(self, fdc_id):
+        self._count_api_call()
+        response = requests.get(
+            USDA_FOOD_URL.format(fdc_id=fdc_id),
+            params={'api_key': settings.USDA_API_KEY},
+            timeout=getattr(settings, 'USDA_API_TIMEOUT', 10)
+        )
+        response.raise_for_status()
+        nutrition_data = response.json()
+        return {
+            'fdc_id': fdc_id,
+            'description': nutrition_data.get('description', ''),
+            'nutrients': extract_nutrients(nutrition_data.get('foodNutrients', []))
+        }
+
+    def _store(self, model, lookup, values):
+        # The database tier is best-effort: a concurrent writer or a locked
+        # SQLite file must not fail the food log itself.
+        try:
+            with transaction.atomic():
+                model.objects.update_or_create(defaults=values, **lookup)
+        except DatabaseError:
+            pass
+
+    def _fresh_since(self):
+        return timezone.now() - timedelta(seconds=self.ttl_seconds)
+
+    def _remaining_ttl(self, updated_at):
+        age = (timezone.now() - updated_at).total_seconds()
+        return max(1, self.ttl_seconds - age)
+
+    def _count_db_hit(self):
+        with self._lock:
+            self.db_hits += 1
+
+    def _count_api_call(self):
+        with self._lock:
+            self.api_calls += 1
+
+
+class LocalFoodIndex:
+    """
+    In-memory search index over the imported USDAFood table.
+
+    Built lazily in each process: an exact-name map plus a sorted token list
+    for prefix matching, so resolving a food name needs no query at all. Every
+    CHECK_SECONDS one cheap query compares the table's version (row count and
+    latest imported_at) with the one indexed, and the index is rebuilt if an
+    import in another process changed it.
+    """
+
+    # How often a lookup checks whether the USDAFood table changed
+    CHECK_SECONDS = 60
+
+    def __init__(self):
+        self._state = _IndexState()
+        self._version = None
+        self._checked_at = None
+
+    def resolve(self, food_name):
+        """Return the best matching food record, or None"""
+        results = self.search(food_name, limit=1)
+        return results[0] if results else None
+
+    def search(self, query, limit=10):
+        """Return up to `limit` food records matching every word prefix in `query`"""
+        self._ensure_loaded()
+        state = self._state
+        key = normalize_food_name(query)
+        if not key or not state.records:
+            return []
+
+        exact = state.exact.get(key)
+        query_tokens = _tokenize(key)
+        candidates = set()
+        if query_tokens:
+            # Seed from the most selective word, then filter by the rest
+            seed = min(query_tokens, key=state.prefix_count)
+            candidates = {
+                fdc_id for fdc_id in state.prefix_matches(seed)
+                if all(state.has_prefix(fdc_id, token) for token in query_tokens)
+            }
+
+        ranked = sorted(candidates, key=lambda fdc_id: state.rank(fdc_id, query_tokens))
+        if exact is not None:
+            ranked = [exact] + [fdc_id for fdc_id in ranked if fdc_id != exact]
+        return [state.records[fdc_id] for fdc_id in ranked[:limit]]
+
+    def reload(self):
+        """Rebuild the index from the USDAFood table"""
+        from .models import USDAFood
+
+        version = self._table_version()
+        state = _IndexState()
+        rows = USDAFood.objects.values_list(
+            'fdc_id', 'description', 'normalized_description', *NUTRIENT_KEYS
+        ).order_by('fdc_id')
+        for fdc_id, description, normalized, *values in rows.iterator(chunk_size=2000):
+            state.add(fdc_id, description, normalized, dict(zip(NUTRIENT_KEYS, values)))
+        state.sorted_tokens = sorted(state.postings)
+
+        # Swap in the finished index in one assignment so readers never see a partial build
+        self._state = state
+        self._version = version
+        self._checked_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._state.records)
+
+    def _ensure_loaded(self):
+        checked_at = self._checked_at
+        if checked_at is not None and time.monotonic() - checked_at < self.CHECK_SECONDS:
+            return
+        try:
+            if self._version is None or self._table_version() != self._version:
+                self.reload()
+        except DatabaseError:
+            # Table missing (migrations not applied yet): behave as an empty index
+            pass
+        self._checked_at = time.monotonic()
+
+    def _table_version(self):
+        from django.db.models import Count, Max
+        from .models import USDAFood
+
+        version = USDAFood.objects.aggregate(count=Count('fdc_id'), imported_at=Max('imported_at'))
+        return version['count'], version['imported_at']
+
+
+class _IndexState:
+    """The data behind one build of LocalFoodIndex"""
+
+    def __init__(self):
+        self.records = {}
+        self.exact = {}
+        self.postings = {}
+        self.sorted_tokens = []
+        self.tokens = {}
+
+    def add(self, fdc_id, description, normalized, nutrients):
+        self.records[fdc_id] = {'fdc_id': fdc_id, 'description': description, 'nutrients': nutrients}
+        self.exact.setdefault(normalized, fdc_id)
+        tokens = tuple(_tokenize(normalized))
+        self.tokens[fdc_id] = tokens
+        for token in tokens:
+            self.postings.setdefault(token, set()).add(fdc_id)
+
+    def prefix_range(self, token):
+        return (
+            bisect.bisect_left(self.sorted_tokens, token),
+            bisect.bisect_left(self.sorted_tokens, token + '\U0010ffff')
+        )
+
+    def prefix_count(self, token):
+        start, end = self.prefix_range(token)
+        return sum(len(self.postings[self.sorted_tokens[index]]) for index in range(start, end))
+
+    def prefix_matches(self, token):
+        matches = set()
+        start, end = self.prefix_range(token)
+        for index in range(start, end):
+            matches |= self.postings[self.sorted_tokens[index]]
+        return matches
+
+    def has_prefix(self, fdc_id, token):
+        return any(indexed_token.startswith(token) for indexed_token in self.tokens[fdc_id])
+
+    def rank(self, fdc_id, query_tokens):
+        # Prefer foods named after the first query word ("apple" -> "Apples, raw"
+        # before "Pie, apple"), then the plain raw form, then the fewest extra
+        # words, then the lowest ID.
+        tokens = self.tokens[fdc_id]
+        leads = bool(tokens) and tokens[0].startswith(query_tokens[0])
+        raw = 'raw' in tokens and 'raw' not in query_tokens
+        return (not leads, not raw, len(tokens) - len(query_tokens), fdc_id)
+
+
+def _tokenize(text):
+    return [token for token in ''.join(ch if ch.isalnum() else ' ' for ch in text).split() if token]
+
+
+usda_cache = USDAFoodCache()
+local_food_index = LocalFoodIndex()
+
+
+def lookup_food(food_name):
+    """
+    Resolve a food name: local USDA database first, then the cached USDA API
+    (skipped entirely when settings.USDA_OFFLINE is set).
+    """
+    food = local_food_index.resolve(food_name)
+    if food is not None:
+        return food
+    if getattr(settings, 'USDA_OFFLINE', False):
+        return None
+    try:
+        return usda_cache.lookup(food_name)
+    finally:
+        _log_stats()
+
+
+def lookup_foods(food_names):
+    """
+    Resolve several food names at once. Each distinct (normalized) name is
+    looked up once; names missing from the local database go to the USDA API
+    concurrently on a bounded thread pool, so a whole meal costs about as much
+    as its slowest lookup.
+
+    Returns {normalized food name: food record or None}. Raises
+    requests.RequestException if any API lookup fails.
+    """
+    results = {}
+    pending = {}
+    for food_name in food_names:
+        key = normalize_food_name(food_name)
+        if key in results or key in pending:
+            continue
+        food = local_food_index.resolve(food_name)
+        if food is not None or getattr(settings, 'USDA_OFFLINE', False):
+            results[key] = food
+        else:
+            pending[key] = food_name
+
+    if pending:
+        max_workers = min(len(pending), getattr(settings, 'USDA_MAX_CONCURRENCY', 4))
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results.update(zip(pending, pool.map(_lookup_in_thread, pending.values())))
+        finally:
+            _log_stats()
+
+    return results
+
+
+def _log_stats():
+    logger.debug("USDA cache stats: %s", usda_cache.stats())
+
+
+def _lookup_in_thread(food_name):
+    try:
+        return usda_cache.lookup(food_name)
+    finally:
+        # Worker threads get their own DB connections; don't leak them
+        connections.close_all()
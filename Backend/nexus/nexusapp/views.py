@@ -6,14 +6,23 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from .models import UserBasicData, UserHealthProfile, BloodTestReport, MetabolicPanel, LiverFunctionTest, MedicationDetails, Appointment, LabReport
-from .serializers import UserSerializer, UserBasicDataSerializer, UserHealthProfileSerializer, BloodTestReportSerializer, MetabolicPanelSerializer, LiverFunctionTestSerializer, MedicationDetailsSerializer, AppointmentSerializer, LabReportSerializer, LabReportUploadSerializer
+from .serializers import UserSerializer, UserBasicDataSerializer, UserHealthProfileSerializer, BloodTestReportSerializer, MetabolicPanelSerializer, LiverFunctionTestSerializer, MedicationDetailsSerializer, AppointmentSerializer, LabReportSerializer, LabReportUploadSerializer, LabReportMetadataSerializer, LabReportListSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from .authentication import token_required
 from django.conf import settings
-from .serializers import UserSerializer, FoodInputSerializer, FoodNutritionSerializer, UserNutritionGoalsSerializer, DailyNutritionSummarySerializer
-from .models import FoodNutrition, UserNutritionGoals
+from django.db import transaction
+from .serializers import UserSerializer, FoodInputSerializer, FoodBatchInputSerializer, FoodNutritionSerializer, UserNutritionGoalsSerializer, DailyNutritionSummarySerializer
+from .models import FoodNutrition, UserNutritionGoals, DailyNutritionRollup, Job
+from .usda import lookup_food, lookup_foods, normalize_food_name
+from .trends import MAX_TREND_DAYS, compute_nutrition_trends
+from .goals import get_effective_goals, sync_goals_with_health_profile
+from .pagination import InvalidCursor, paginate_newest_first, parse_page_size
+from .blobstore import BlobNotFound, get_blob_store, referencing_blob
+from .downloads import blob_response, content_type_for, stream_json_with_files
+from .uploads import streaming_blob_upload
+from .derivatives import DerivativeError, get_derivative
 from rest_framework_simplejwt.tokens import RefreshToken
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 import requests
 import json
 import base64
@@ -69,32 +78,9 @@ def register_user(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def store_user_basic_data(request):
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     # Check if user already has basic data
     try:
@@ -112,32 +98,9 @@ def store_user_basic_data(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def get_user_basic_data(request):
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     try:
         basic_data = UserBasicData.objects.get(user=user)
@@ -150,32 +113,9 @@ def get_user_basic_data(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def store_user_health_profile(request):
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     # Handle emergency_contact nested data
     request_data = request.data.copy()
@@ -198,24 +138,7 @@ def store_user_health_profile(request):
         # Sync nutrition goals with health profile calorie and protein goals
         if hasattr(health_profile, 'daily_calorie_goal') and hasattr(health_profile, 'daily_protein_goal'):
             try:
-                nutrition_goals, created = UserNutritionGoals.objects.get_or_create(
-                    user=user,
-                    defaults={
-                        'daily_calories_goal': health_profile.daily_calorie_goal,
-                        'daily_protein_goal': health_profile.daily_protein_goal,
-                        'daily_carbs_goal': 250.0,
-                        'daily_fat_goal': 65.0,
-                        'daily_fiber_goal': 25.0,
-                        'daily_sugar_goal': 50.0
-                    }
-                )
-                
-                if not created:
-                    # Update existing nutrition goals with health profile values
-                    nutrition_goals.daily_calories_goal = health_profile.daily_calorie_goal
-                    nutrition_goals.daily_protein_goal = health_profile.daily_protein_goal
-                    nutrition_goals.save()
-                    
+                sync_goals_with_health_profile(health_profile)
             except Exception as e:
                 # Continue even if nutrition goals sync fails
                 pass
@@ -227,32 +150,9 @@ def store_user_health_profile(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def get_user_health_profile(request):
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     try:
         health_profile = UserHealthProfile.objects.get(user=user)
@@ -265,32 +165,9 @@ def get_user_health_profile(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def store_blood_test_report(request):
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     # Map the input field names to database field names
     field_mapping = {
@@ -331,32 +208,9 @@ def store_blood_test_report(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def get_blood_test_report(request):
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     try:
         blood_report = BloodTestReport.objects.get(user=user)
@@ -369,32 +223,9 @@ def get_blood_test_report(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def store_metabolic_panel(request):
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     # Map the input field names to database field names
     field_mapping = {
@@ -430,32 +261,9 @@ def store_metabolic_panel(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def get_metabolic_panel(request):
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     try:
         metabolic_panel = MetabolicPanel.objects.get(user=user)
@@ -468,32 +276,9 @@ def get_metabolic_panel(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def store_liver_function_test(request):
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     # Map the input field names to database field names
     field_mapping = {
@@ -532,32 +317,9 @@ def store_liver_function_test(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def get_liver_function_test(request):
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     try:
         liver_test = LiverFunctionTest.objects.get(user=user)
@@ -570,32 +332,9 @@ def get_liver_function_test(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def store_medication_details(request):
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     # Map the input field names to database field names
     field_mapping = {
@@ -629,32 +368,9 @@ def store_medication_details(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def get_medication_details(request):
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     try:
         medication = MedicationDetails.objects.get(user=user)
@@ -667,6 +383,7 @@ def get_medication_details(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def get_food_nutrition(request):
     """
     Get nutrition information for a food item from USDA API and store it for the authenticated user
@@ -681,151 +398,148 @@ def get_food_nutrition(request):
     Available units: g (grams), kg (kilograms), oz (ounces), lb (pounds), cup (cups), ml (milliliters), l (liters)
     Available meal types: breakfast, lunch, dinner, snack
     """
-    # Get token from request body
-    token = request.data.get('token')
+    user = request.user
     
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    serializer = FoodInputSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    food_name = serializer.validated_data['food_name']
     
     try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
+        # Step 1: Resolve the food and its per-100g nutrients (cached, see usda.py)
+        food = lookup_food(food_name)
         
-        if not user:
+        if food is None:
             return Response({
-                'error': 'User not found'
+                'error': f'No nutrition data found for "{food_name}"'
             }, status=status.HTTP_404_NOT_FOUND)
         
+        # Step 2: Store in database for the authenticated user
+        food_nutrition = _build_food_entry(user, serializer.validated_data, food)
+        with transaction.atomic():
+            food_nutrition.save()
+            DailyNutritionRollup.add_entries([food_nutrition])
+        
+        # Step 3: Return response
+        response_data = _food_log_response(food_nutrition, food)
+        
+        return Response(response_data, status=status.HTTP_200_OK)
+        
+    except requests.RequestException as e:
+        return Response({
+            'error': 'Failed to fetch nutrition data from USDA API',
+            'details': str(e)
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    
     except Exception as e:
         return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+            'error': 'An unexpected error occurred',
+            'details': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _build_food_entry(user, item, food):
+    """Build an unsaved FoodNutrition entry from validated FoodInputSerializer data and a USDA food record"""
+    nutrients = food['nutrients']
+    return FoodNutrition(
+        user=user,  # Associate with the authenticated user
+        food_name=item['food_name'],
+        quantity=item['quantity'],
+        unit=item.get('unit', 'g'),
+        time=item.get('time'),
+        meal_type=item.get('meal_type'),
+        usda_food_id=str(food['fdc_id']),
+        calories_per_100g=nutrients['calories'],
+        protein_per_100g=nutrients['protein'],
+        carbs_per_100g=nutrients['carbohydrates'],
+        fat_per_100g=nutrients['fat'],
+        fiber_per_100g=nutrients['fiber'],
+        sugar_per_100g=nutrients['sugar']
+    )
+
+
+def _food_log_response(food_nutrition, food):
+    """Response payload for a logged food entry"""
+    nutrients = dict(food['nutrients'])
+    quantity_in_grams = food_nutrition.convert_to_grams()
+    multiplier = quantity_in_grams / 100  # USDA data is per 100g
+    total_nutrition = {
+        nutrient: round(value * multiplier, 2) for nutrient, value in nutrients.items()
+    }
+    return {
+        'food_name': food_nutrition.food_name,
+        'quantity': food_nutrition.quantity,
+        'unit': food_nutrition.unit,
+        'time': food_nutrition.time.strftime('%H:%M') if food_nutrition.time else None,
+        'meal_type': food_nutrition.meal_type,
+        'quantity_in_grams': quantity_in_grams,
+        'nutrition_per_100g': nutrients,
+        'total_nutrition': total_nutrition,
+        'usda_food_name': food['description'] or food_nutrition.food_name,
+        'stored_id': food_nutrition.id
+    }
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@token_required
+def log_food_batch(request):
+    """
+    Log several food items (e.g. a whole meal) for the authenticated user in one request.
+    Distinct food names are resolved once, concurrently, and all entries are stored with a single insert.
+    Expected input: {
+        "token": "jwt_token",
+        "items": [
+            {"food_name": "Apple", "quantity": 100, "unit": "g", "time": "08:30", "meal_type": "breakfast"},
+            {"food_name": "Banana", "quantity": 1, "unit": "cup", "meal_type": "breakfast"}
+        ]
+    }
+    Nothing is stored if any item cannot be resolved.
+    """
+    user = request.user
     
-    serializer = FoodInputSerializer(data=request.data)
+    serializer = FoodBatchInputSerializer(data=request.data)
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    food_name = serializer.validated_data['food_name']
-    quantity = serializer.validated_data['quantity']
-    unit = serializer.validated_data.get('unit', 'g')
-    time = serializer.validated_data.get('time')
-    meal_type = serializer.validated_data.get('meal_type')
+    items = serializer.validated_data['items']
     
     try:
-        # Step 1: Search for the food item in USDA database
-        search_url = "https://api.nal.usda.gov/fdc/v1/foods/search"
-        search_params = {
-            'api_key': settings.USDA_API_KEY,
-            'query': food_name,
-            'dataType': ['Foundation', 'SR Legacy'],
-            'pageSize': 1
-        }
-        
-        search_response = requests.get(search_url, params=search_params)
-        search_response.raise_for_status()
-        search_data = search_response.json()
-        
-        if not search_data.get('foods'):
+        # Step 1: Resolve every distinct food name once, concurrently
+        foods = lookup_foods(item['food_name'] for item in items)
+        
+        not_found = [
+            item['food_name'] for item in items
+            if foods[normalize_food_name(item['food_name'])] is None
+        ]
+        if not_found:
             return Response({
-                'error': f'No nutrition data found for "{food_name}"'
+                'error': 'No nutrition data found for some items',
+                'not_found': not_found
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Get the first (most relevant) food item
-        food_item = search_data['foods'][0]
-        fdc_id = food_item['fdcId']
-        
-        # Step 2: Get detailed nutrition information
-        detail_url = f"https://api.nal.usda.gov/fdc/v1/food/{fdc_id}"
-        detail_params = {'api_key': settings.USDA_API_KEY}
-        
-        detail_response = requests.get(detail_url, params=detail_params)
-        detail_response.raise_for_status()
-        nutrition_data = detail_response.json()
-        
-        # Step 3: Extract nutrient information
-        nutrients = {}
-        nutrient_mapping = {
-            'Energy': 'calories',
-            'Protein': 'protein',
-            'Carbohydrate, by difference': 'carbohydrates',
-            'Total lipid (fat)': 'fat',
-            'Fiber, total dietary': 'fiber',
-            'Sugars, total including NLEA': 'sugar'
-        }
-        
-        for nutrient in nutrition_data.get('foodNutrients', []):
-            nutrient_name = nutrient.get('nutrient', {}).get('name', '')
-            nutrient_value = nutrient.get('amount', 0)
-            
-            for usda_name, our_name in nutrient_mapping.items():
-                if usda_name in nutrient_name:
-                    nutrients[our_name] = round(nutrient_value, 2)
-                    break
-        
-        # Ensure all nutrients have values (default to 0 if missing)
-        for nutrient in nutrient_mapping.values():
-            if nutrient not in nutrients:
-                nutrients[nutrient] = 0.0
-        
-        # Step 4: Calculate nutrition for the specified quantity (convert to grams first)
-        conversion_factors = {
-            'g': 1.0,
-            'kg': 1000.0,
-            'oz': 28.3495,
-            'lb': 453.592,
-            'cup': 240.0,  # Approximate for liquid
-            'ml': 1.0,     # Approximate for liquid foods
-            'l': 1000.0    # Approximate for liquid foods
-        }
-        quantity_in_grams = quantity * conversion_factors.get(unit, 1.0)
-        multiplier = quantity_in_grams / 100  # USDA data is per 100g
-        total_nutrition = {
-            'calories': round(nutrients['calories'] * multiplier, 2),
-            'protein': round(nutrients['protein'] * multiplier, 2),
-            'carbohydrates': round(nutrients['carbohydrates'] * multiplier, 2),
-            'fat': round(nutrients['fat'] * multiplier, 2),
-            'fiber': round(nutrients['fiber'] * multiplier, 2),
-            'sugar': round(nutrients['sugar'] * multiplier, 2)
-        }
-        
-        # Step 5: Store in database for the authenticated user
-        food_nutrition = FoodNutrition.objects.create(
-            user=user,  # Associate with the authenticated user
-            food_name=food_name,
-            quantity=quantity,
-            unit=unit,
-            time=time,
-            meal_type=meal_type,
-            usda_food_id=str(fdc_id),
-            calories_per_100g=nutrients['calories'],
-            protein_per_100g=nutrients['protein'],
-            carbs_per_100g=nutrients['carbohydrates'],
-            fat_per_100g=nutrients['fat'],
-            fiber_per_100g=nutrients['fiber'],
-            sugar_per_100g=nutrients['sugar']
-        )
-        
-        # Step 6: Return response
-        response_data = {
-            'food_name': food_name,
-            'quantity': quantity,
-            'unit': unit,
-            'time': time.strftime('%H:%M') if time else None,
-            'meal_type': meal_type,
-            'quantity_in_grams': quantity_in_grams,
-            'nutrition_per_100g': nutrients,
-            'total_nutrition': total_nutrition,
-            'usda_food_name': nutrition_data.get('description', food_name),
-            'stored_id': food_nutrition.id
-        }
-        
-        return Response(response_data, status=status.HTTP_200_OK)
+        # Step 2: Store all entries with a single insert (totals are derived up front,
+        # since bulk_create bypasses FoodNutrition.save)
+        entries = []
+        for item in items:
+            entry = _build_food_entry(user, item, foods[normalize_food_name(item['food_name'])])
+            entry.calculate_totals()
+            entries.append(entry)
+        with transaction.atomic():
+            FoodNutrition.objects.bulk_create(entries)
+            DailyNutritionRollup.add_entries(entries)
+        
+        # Step 3: Return response
+        results = [
+            _food_log_response(entry, foods[normalize_food_name(entry.food_name)])
+            for entry in entries
+        ]
+        
+        return Response({
+            'count': len(results),
+            'results': results
+        }, status=status.HTTP_200_OK)
         
     except requests.RequestException as e:
         return Response({
@@ -842,6 +556,7 @@ def get_food_nutrition(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def edit_nutrition_item(request):
     """
     Edit a saved nutrition item for the authenticated user
@@ -855,37 +570,14 @@ def edit_nutrition_item(request):
         "meal_type": "breakfast"
     }
     """
-    # Get token from request body
-    token = request.data.get('token')
     item_id = request.data.get('item_id')
     
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
     if not item_id:
         return Response({
             'error': 'item_id is required'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     try:
         # Get the nutrition item to edit (ensure it belongs to the user)
@@ -900,6 +592,9 @@ def edit_nutrition_item(request):
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    # Keep the previous totals so the daily rollup can be adjusted by the difference
+    old_totals = nutrition_item.totals()
+    
     # Extract validated data
     food_name = serializer.validated_data['food_name']
     quantity = serializer.validated_data['quantity']
@@ -926,7 +621,9 @@ def edit_nutrition_item(request):
         nutrition_item.total_fiber = (nutrition_item.fiber_per_100g or 0) * multiplier
         nutrition_item.total_sugar = (nutrition_item.sugar_per_100g or 0) * multiplier
     
-    nutrition_item.save()
+    with transaction.atomic():
+        nutrition_item.save()
+        DailyNutritionRollup.update_entry(nutrition_item, old_totals)
     
     # Return updated data
     response_data = {
@@ -952,6 +649,7 @@ def edit_nutrition_item(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def delete_nutrition_item(request):
     """
     Delete a saved nutrition item for the authenticated user
@@ -960,37 +658,14 @@ def delete_nutrition_item(request):
         "item_id": 123
     }
     """
-    # Get token from request body
-    token = request.data.get('token')
     item_id = request.data.get('item_id')
     
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
     if not item_id:
         return Response({
             'error': 'item_id is required'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     try:
         # Get the nutrition item to delete (ensure it belongs to the user)
@@ -1009,7 +684,9 @@ def delete_nutrition_item(request):
     }
     
     # Delete the item
-    nutrition_item.delete()
+    with transaction.atomic():
+        DailyNutritionRollup.remove_entry(nutrition_item)
+        nutrition_item.delete()
     
     return Response({
         'message': 'Nutrition item deleted successfully',
@@ -1019,45 +696,72 @@ def delete_nutrition_item(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def get_nutrition_history(request):
     """
-    Get the history of stored nutrition data for the authenticated user
-    Expected input: {"token": "jwt_token"}
+    Get the history of stored nutrition data for the authenticated user, newest first, one page at a time
+    Expected input: {
+        "token": "jwt_token",
+        "cursor": "...",                    # Optional, next_cursor from the previous page
+        "page_size": 50,                    # Optional, 1-200 (default 50)
+        "start_date": "2024-01-01",         # Optional, inclusive
+        "end_date": "2024-01-31",           # Optional, inclusive
+        "meal_type": "breakfast",           # Optional
+        "food_name": "app",                 # Optional, case-insensitive prefix
+        "fields": ["id", "food_name", "total_calories", "created_at"]  # Optional, only return these fields
+    }
     """
-    # Get token from request body
-    token = request.data.get('token')
+    user = request.user
     
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    nutrition_records = FoodNutrition.objects.filter(user=user)
     
     try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+        page_size = parse_page_size(request.data.get('page_size'))
+        start_param = request.data.get('start_date')
+        end_param = request.data.get('end_date')
+        start_date = datetime.strptime(start_param, '%Y-%m-%d').date() if start_param else None
+        end_date = datetime.strptime(end_param, '%Y-%m-%d').date() if end_param else None
+    except (TypeError, ValueError):
+        return Response({
+            'error': 'Invalid page_size or date (dates use YYYY-MM-DD)'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if start_date:
+        nutrition_records = nutrition_records.filter(created_at__gte=FoodNutrition.day_bounds(start_date, start_date)[0])
+    if end_date:
+        nutrition_records = nutrition_records.filter(created_at__lt=FoodNutrition.day_bounds(end_date, end_date)[1])
+    if request.data.get('meal_type'):
+        nutrition_records = nutrition_records.filter(meal_type=request.data['meal_type'])
+    if request.data.get('food_name'):
+        nutrition_records = nutrition_records.filter(food_name__istartswith=request.data['food_name'])
+    
+    # Sparse fieldset: only load and serialize the requested columns
+    fields = request.data.get('fields')
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    if fields:
+        model_fields = {field.name for field in FoodNutrition._meta.concrete_fields}
+        columns = [field for field in fields if field in model_fields]
+        if 'username' in fields:
+            nutrition_records = nutrition_records.select_related('user')
+            columns.append('user__username')
+        nutrition_records = nutrition_records.only('id', 'created_at', *columns)
+    else:
+        nutrition_records = nutrition_records.select_related('user')
     
     try:
-        nutrition_records = FoodNutrition.objects.filter(user=user).order_by('-created_at')[:50]  # Latest 50 records for this user
-        serializer = FoodNutritionSerializer(nutrition_records, many=True)
+        page, next_cursor = paginate_newest_first(nutrition_records, request.data.get('cursor'), page_size)
+        serializer = FoodNutritionSerializer(page, many=True, fields=fields)
         return Response({
             'user': user.username,
-            'count': nutrition_records.count(),
-            'results': serializer.data
+            'count': len(page),
+            'results': serializer.data,
+            'next_cursor': next_cursor
         }, status=status.HTTP_200_OK)
+    except InvalidCursor as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
             'error': 'Failed to retrieve nutrition history',
@@ -1067,6 +771,7 @@ def get_nutrition_history(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def nutrition_goals(request):
     """
     POST: Get or set/update user's nutrition goals
@@ -1074,64 +779,13 @@ def nutrition_goals(request):
     - To get goals: {"token": "jwt_token", "action": "get"}
     - To set/update goals: {"token": "jwt_token", "action": "set", "daily_calories_goal": 2500, "daily_protein_goal": 100, ...}
     """
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     action = request.data.get('action', 'get')
     
     if action == 'get':
         try:
-            # First try to get goals from health profile
-            try:
-                health_profile = UserHealthProfile.objects.get(user=user)
-                calorie_goal = health_profile.daily_calorie_goal
-                protein_goal = health_profile.daily_protein_goal
-            except UserHealthProfile.DoesNotExist:
-                # Fallback to default values if no health profile
-                calorie_goal = 2000.0
-                protein_goal = 50.0
-            
-            # Get or create nutrition goals, using health profile values for calories and protein
-            goals, created = UserNutritionGoals.objects.get_or_create(
-                user=user,
-                defaults={
-                    'daily_calories_goal': calorie_goal,
-                    'daily_protein_goal': protein_goal,
-                    'daily_carbs_goal': 250.0,
-                    'daily_fat_goal': 65.0,
-                    'daily_fiber_goal': 25.0,
-                    'daily_sugar_goal': 50.0
-                }
-            )
-            
-            # If nutrition goals exist but health profile has different values, update them
-            if not created and hasattr(user, 'health_profile'):
-                if goals.daily_calories_goal != calorie_goal or goals.daily_protein_goal != protein_goal:
-                    goals.daily_calories_goal = calorie_goal
-                    goals.daily_protein_goal = protein_goal
-                    goals.save()
+            # Calories and protein follow the health profile when there is one
+            goals = get_effective_goals(user)
             
             serializer = UserNutritionGoalsSerializer(goals)
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -1170,36 +824,13 @@ def nutrition_goals(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def daily_nutrition_summary(request):
     """
     Get daily nutrition summary with goals comparison
     Expected input: {"token": "jwt_token", "date": "YYYY-MM-DD"} (date is optional, defaults to today if not provided)
     """
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     try:
         # Parse date parameter or use today
@@ -1214,36 +845,11 @@ def daily_nutrition_summary(request):
         else:
             target_date = date.today()
         
-        # Get daily totals
-        daily_totals = FoodNutrition.get_daily_totals(user, target_date)
-        
-        # Get user's goals, prioritizing health profile values
-        try:
-            health_profile = UserHealthProfile.objects.get(user=user)
-            calorie_goal = health_profile.daily_calorie_goal
-            protein_goal = health_profile.daily_protein_goal
-        except UserHealthProfile.DoesNotExist:
-            calorie_goal = 2000.0
-            protein_goal = 50.0
-        
-        goals, created = UserNutritionGoals.objects.get_or_create(
-            user=user,
-            defaults={
-                'daily_calories_goal': calorie_goal,
-                'daily_protein_goal': protein_goal,
-                'daily_carbs_goal': 250.0,
-                'daily_fat_goal': 65.0,
-                'daily_fiber_goal': 25.0,
-                'daily_sugar_goal': 50.0
-            }
-        )
+        # Get daily totals from the maintained rollup row
+        daily_totals = DailyNutritionRollup.get_totals(user, target_date)
         
-        # Update goals if health profile values are different
-        if not created and hasattr(user, 'health_profile'):
-            if goals.daily_calories_goal != calorie_goal or goals.daily_protein_goal != protein_goal:
-                goals.daily_calories_goal = calorie_goal
-                goals.daily_protein_goal = protein_goal
-                goals.save()
+        # Get user's goals, prioritizing health profile values (read-only, cached)
+        goals = get_effective_goals(user)
         
         # Calculate progress percentages
         consumed = {
@@ -1297,32 +903,60 @@ def daily_nutrition_summary(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
-def store_appointment(request):
-    # Get token from request body
-    token = request.data.get('token')
+@token_required
+def nutrition_trends(request):
+    """
+    Get per-day nutrition progress over a date range, with rolling 7/30-day averages and calorie goal streaks
+    Expected input: {
+        "token": "jwt_token",
+        "start_date": "2024-01-01",  # Optional, defaults to 29 days before end_date
+        "end_date": "2024-01-30"     # Optional, defaults to today
+    }
+    The range may cover at most 366 days.
+    """
+    user = request.user
+    
+    try:
+        end_param = request.data.get('end_date')
+        start_param = request.data.get('start_date')
+        end_date = datetime.strptime(end_param, '%Y-%m-%d').date() if end_param else date.today()
+        start_date = datetime.strptime(start_param, '%Y-%m-%d').date() if start_param else end_date - timedelta(days=29)
+    except (TypeError, ValueError):
+        return Response({
+            'error': 'Invalid date format. Use YYYY-MM-DD'
+        }, status=status.HTTP_400_BAD_REQUEST)
     
-    if not token:
+    if start_date > end_date:
         return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+            'error': 'start_date must not be after end_date'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if (end_date - start_date).days + 1 > MAX_TREND_DAYS:
+        return Response({
+            'error': f'Date range cannot exceed {MAX_TREND_DAYS} days'
+        }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
+        goals = get_effective_goals(user)
+        trends = compute_nutrition_trends(user, start_date, end_date, goals)
         
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'user': user.username,
+            'trends': trends
+        }, status=status.HTTP_200_OK)
         
     except Exception as e:
         return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+            'error': 'Failed to generate nutrition trends',
+            'details': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@token_required
+def store_appointment(request):
+    user = request.user
     
     # Create appointment data without token
     appointment_data = request.data.copy()
@@ -1346,32 +980,9 @@ def store_appointment(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def get_appointments(request):
-    # Get token from request body
-    token = request.data.get('token')
-    
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     try:
         # Get all appointments for the user
@@ -1393,33 +1004,11 @@ def get_appointments(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def store_lab_report(request):
     """Store lab report with base64 file data"""
-    # Get token from request body
-    token = request.data.get('token')
     
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     try:
         # Create lab report data without token
@@ -1437,26 +1026,15 @@ def store_lab_report(request):
         
         validated_data = upload_serializer.validated_data
         
-        # Calculate file size from base64 data
-        try:
-            decoded_data = base64.b64decode(validated_data['file_data'])
-            file_size = len(decoded_data)
-        except Exception:
-            return Response({
-                'error': 'Invalid base64 file data'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Store the lab report with base64 data
+        # Lab report metadata; the file itself goes to the blob store
         lab_report_data = {
             'report_name': validated_data['report_name'],
             'report_type': validated_data['report_type'],
             'lab_name': validated_data.get('lab_name', ''),
             'doctor_name': validated_data.get('doctor_name', ''),
             'report_date': validated_data['report_date'],
-            'report_file_base64': validated_data['file_data'],  # Store the base64 string
             'file_name': validated_data['file_name'],
             'file_type': validated_data['file_type'],
-            'file_size': file_size,
             'notes': validated_data.get('notes', '')
         }
         
@@ -1464,20 +1042,16 @@ def store_lab_report(request):
         serializer = LabReportSerializer(data=lab_report_data)
         
         if serializer.is_valid():
-            lab_report = serializer.save(user=user)
-            
-            # Store base64 data in a variable for processing (if needed)
-            base64_file_data = validated_data['file_data']
-            
-            # Return response without the base64 data (for security/size reasons)
-            response_data = LabReportSerializer(lab_report).data
-            response_data.pop('report_file_base64', None)  # Remove base64 from response
+            # file_data is already decoded to bytes by the upload serializer. The report row is
+            # inserted under the blob's lock; if saving fails, a blob this request created is released
+            writer = get_blob_store().write_bytes(validated_data['file_data'])
+            with referencing_blob(writer) as file_sha256:
+                lab_report = serializer.save(user=user, file_sha256=file_sha256, file_size=writer.size)
             
             return Response({
                 'message': 'Lab report stored successfully',
-                'data': response_data,
-                'file_stored': True,
-                'base64_length': len(base64_file_data)  # Just show the length for confirmation
+                'data': LabReportSerializer(lab_report).data,
+                'file_stored': True
             }, status=status.HTTP_201_CREATED)
         else:
             return Response({
@@ -1494,56 +1068,133 @@ def store_lab_report(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
-def get_lab_reports(request):
-    """Get all lab reports for the authenticated user"""
-    # Get token from request body
-    token = request.data.get('token')
+@streaming_blob_upload('file')
+@token_required
+def upload_lab_report(request):
+    """
+    Store a lab report uploaded as multipart/form-data. The file is streamed straight to the blob store
+    (hashed, size-checked and type-sniffed as it arrives) instead of being sent as base64 JSON.
+    Expected form fields: token (or an Authorization header), report_name, report_type, report_date,
+    lab_name, doctor_name, notes (optional) and file.
+    """
+    user = request.user
+    stored_file = request.blob_upload.stored
     
-    if not token:
+    if stored_file is None:
         return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+            'error': 'A file field named "file" is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    metadata_serializer = LabReportMetadataSerializer(data=request.data)
+    if not metadata_serializer.is_valid():
+        return Response({
+            'error': 'Invalid data provided',
+            'details': metadata_serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
+        # The stored file's type comes from its magic bytes, not the client
+        serializer = LabReportSerializer(data={
+            **metadata_serializer.validated_data,
+            'file_name': (stored_file.name or f'report.{stored_file.file_type}')[:255],
+            'file_type': stored_file.file_type
+        })
         
-        if not user:
+        if serializer.is_valid():
+            with referencing_blob(stored_file.writer) as file_sha256:
+                lab_report = serializer.save(user=user, file_sha256=file_sha256, file_size=stored_file.size)
+            
             return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
+                'message': 'Lab report stored successfully',
+                'data': LabReportSerializer(lab_report).data,
+                'file_stored': True
+            }, status=status.HTTP_201_CREATED)
+        else:
+            return Response({
+                'error': 'Failed to create lab report',
+                'details': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+            
     except Exception as e:
         return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+            'error': 'Failed to store lab report',
+            'details': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@token_required
+def get_lab_reports(request):
+    """
+    Get the authenticated user's lab reports (metadata only), most recent report_date first, one page at a time
+    Expected input: {
+        "token": "jwt_token",
+        "cursor": "...",               # Optional, next_cursor from the previous page
+        "page_size": 50,               # Optional, 1-200 (default 50)
+        "report_type": "blood_test",   # Optional
+        "start_date": "2024-01-01",    # Optional, inclusive, on report_date
+        "end_date": "2024-12-31",      # Optional, inclusive, on report_date
+        "include_file_data": false     # Optional, embed each file as base64 (streamed response)
+    }
+    "count" is the number of the user's reports matching the filters (all pages), "page_count"
+    the number in this page. Each report has a download_url for fetching the file itself.
+    """
+    user = request.user
     
     try:
-        # Get include_file_data parameter to optionally include base64 data
-        include_file_data = request.data.get('include_file_data', False)
-        
-        # Get all lab reports for the user
-        lab_reports = LabReport.objects.filter(user=user)
-        serializer = LabReportSerializer(lab_reports, many=True)
+        page_size = parse_page_size(request.data.get('page_size'))
+        start_param = request.data.get('start_date')
+        end_param = request.data.get('end_date')
+        start_date = datetime.strptime(start_param, '%Y-%m-%d').date() if start_param else None
+        end_date = datetime.strptime(end_param, '%Y-%m-%d').date() if end_param else None
+    except (TypeError, ValueError):
+        return Response({
+            'error': 'Invalid page_size or date (dates use YYYY-MM-DD)'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    include_file_data = str(request.data.get('include_file_data', False)).lower() in ('1', 'true', 'yes')
+    
+    try:
+        # Metadata columns only; file bytes live in the blob store
+        lab_reports = LabReport.objects.filter(user=user).only(*LabReportListSerializer.MODEL_FIELDS)
+        if request.data.get('report_type'):
+            lab_reports = lab_reports.filter(report_type=request.data['report_type'])
+        if start_date:
+            lab_reports = lab_reports.filter(report_date__gte=start_date)
+        if end_date:
+            lab_reports = lab_reports.filter(report_date__lte=end_date)
+        
+        page, next_cursor = paginate_newest_first(
+            lab_reports, request.data.get('cursor'), page_size, keys=('report_date', 'created_at', 'id')
+        )
+        reports = LabReportListSerializer(page, many=True, context={'request': request}).data
         
-        response_data = serializer.data
+        response_data = {
+            'user': user.username,
+            'count': lab_reports.count(),
+            'page_count': len(reports),
+            'next_cursor': next_cursor
+        }
         
-        # Remove base64 data from response unless specifically requested
-        if not include_file_data:
-            for report in response_data:
-                report.pop('report_file_base64', None)
+        if include_file_data:
+            # Stream each file's base64 straight from the blob store into the response
+            return stream_json_with_files(response_data, 'reports', reports, 'report_file_base64')
         
         return Response({
-            'user': user.username,
-            'count': lab_reports.count(),
-            'reports': response_data,
-            'note': 'File data excluded for performance. Set include_file_data=true to include base64 data.'
+            **response_data,
+            'reports': reports,
+            'note': 'File data excluded for performance. Use each report\'s download_url, or set include_file_data=true to include base64 data.'
         }, status=status.HTTP_200_OK)
         
+    except InvalidCursor as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except BlobNotFound:
+        return Response({
+            'error': 'A lab report file is missing from storage'
+        }, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({
             'error': 'Failed to retrieve lab reports',
@@ -1553,46 +1204,24 @@ def get_lab_reports(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@token_required
 def get_lab_report_file(request):
     """Get base64 file data for a specific lab report"""
-    # Get token from request body
-    token = request.data.get('token')
     report_id = request.data.get('report_id')
     
-    if not token:
-        return Response({
-            'error': 'Token is required'
-        }, status=status.HTTP_401_UNAUTHORIZED)
-    
     if not report_id:
         return Response({
             'error': 'Report ID is required'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        # Validate JWT token
-        jwt_auth = JWTAuthentication()
-        validated_token = jwt_auth.get_validated_token(token)
-        
-        # Get user from token using Django's built-in method
-        user = jwt_auth.get_user(validated_token)
-        
-        if not user:
-            return Response({
-                'error': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-    except Exception as e:
-        return Response({
-            'error': 'Invalid token provided'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = request.user
     
     try:
         # Get the specific lab report
         lab_report = LabReport.objects.get(id=report_id, user=user)
         
-        # Store base64 data in a variable for processing
-        base64_file_data = lab_report.report_file_base64
+        # Read the file from the blob store
+        base64_file_data = base64.b64encode(get_blob_store().read_bytes(lab_report.file_sha256)).decode()
         
         return Response({
             'report_id': lab_report.id,
@@ -1610,9 +1239,116 @@ def get_lab_report_file(request):
         return Response({
             'error': 'Lab report not found or you do not have permission to access it'
         }, status=status.HTTP_404_NOT_FOUND)
+    except BlobNotFound:
+        return Response({
+            'error': 'Lab report file is missing from storage'
+        }, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({
             'error': 'Failed to retrieve lab report file',
             'details': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+@token_required
+def download_lab_report_file(request, report_id):
+    """
+    Download a lab report file as raw bytes (streamed)
+    GET with an "Authorization: Bearer <token>" header, or POST {"token": "jwt_token"}.
+    Supports Range requests and ETag / If-None-Match revalidation.
+    Add ?inline=true to display the file in the browser instead of downloading it.
+    """
+    user = request.user
+    
+    try:
+        lab_report = LabReport.objects.only(
+            'id', 'user_id', 'file_sha256', 'file_name', 'file_type', 'file_size'
+        ).get(id=report_id, user=user)
+    except LabReport.DoesNotExist:
+        return Response({
+            'error': 'Lab report not found or you do not have permission to access it'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    if not get_blob_store().exists(lab_report.file_sha256):
+        return Response({
+            'error': 'Lab report file is missing from storage'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    inline = str(request.query_params.get('inline', '')).lower() in ('1', 'true', 'yes')
+    return blob_response(
+        request,
+        lab_report.file_sha256,
+        lab_report.file_size,
+        lab_report.file_name,
+        content_type_for(lab_report.file_type),
+        as_attachment=not inline
+    )
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+@token_required
+def download_lab_report_derivative(request, report_id, kind):
+    """
+    Download a small rendition of an image lab report: kind is "thumbnail" (256px) or "preview" (1024px)
+    GET with an "Authorization: Bearer <token>" header, or POST {"token": "jwt_token"}.
+    Renditions are rendered in the background when the report is stored (on demand if not ready yet)
+    and support ETag / If-None-Match revalidation.
+    """
+    user = request.user
+    
+    try:
+        lab_report = LabReport.objects.only(
+            'id', 'user_id', 'file_sha256', 'file_name', 'file_type'
+        ).get(id=report_id, user=user)
+    except LabReport.DoesNotExist:
+        return Response({
+            'error': 'Lab report not found or you do not have permission to access it'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    if not lab_report.is_image():
+        return Response({
+            'error': f'No {kind} available: only image lab reports have renditions'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        derivative = get_derivative(lab_report.file_sha256, kind)
+    except DerivativeError as e:
+        return Response({
+            'error': f'Failed to render lab report {kind}',
+            'details': str(e)
+        }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    
+    stem = lab_report.file_name.rsplit('.', 1)[0] or 'lab_report'
+    extension = derivative.content_type.split('/')[-1]
+    return blob_response(
+        request,
+        derivative.file_sha256,
+        derivative.file_size,
+        f"{stem}_{kind}.{extension}",
+        derivative.content_type,
+        as_attachment=False
+    )
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+@token_required
+def get_job_status(request, job_id):
+    """
+    Status of a background job started by one of the user's requests
+    GET with an "Authorization: Bearer <token>" header, or POST {"token": "jwt_token"}.
+    status is queued, running, succeeded (result is set) or failed (error is set).
+    """
+    user = request.user
+    
+    try:
+        job = Job.objects.get(id=job_id, user=user)
+    except Job.DoesNotExist:
+        return Response({
+            'error': 'Job not found or you do not have permission to access it'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(job.as_status(), status=status.HTTP_200_OK)
@@ -108,7 +108,9 @@ def test_lab_report_api():
         
         if response.status_code == 200:
             data = response.json()
-            print(f"✅ Retrieved {data['count']} lab report(s) for user: {data['user']}")
+            print(f"✅ Retrieved {data['page_count']} of {data['count']} lab report(s) for user: {data['user']}")
+            if data['next_cursor']:
+                print(f"   More reports available: pass cursor={data['next_cursor']} for the next page")
             
             if data['reports']:
                 print("\nLab report summaries:")
@@ -122,6 +124,8 @@ def test_lab_report_api():
                     print(f"      📅 Date: {report_date}")
                     print(f"      📄 File: {report['file_name']} ({report['file_size_mb']} MB)")
                     print(f"      📝 Notes: {report['notes']}")
+                    print(f"      🔑 SHA-256: {report['file_sha256']}")
+                    print(f"      ⬇️  Download: {report['download_url']}")
                     print(f"      🆔 ID: {report['id']}")
             else:
                 print("No lab reports found.")
@@ -200,6 +204,8 @@ def print_api_documentation():
     print("\nRequest Body:")
     example_get_all = {
         "token": "your_jwt_token_here",
+        "page_size": 50,  # Optional: 1-200
+        "cursor": None,  # Optional: next_cursor from the previous page
         "include_file_data": False  # Optional: set to true to include base64 data
     }
     print(json.dumps(example_get_all, indent=2))